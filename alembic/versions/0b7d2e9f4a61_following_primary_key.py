@@ -0,0 +1,41 @@
+"""following primary key
+
+Revision ID: 0b7d2e9f4a61
+Revises: f4a6c8e0b2d3
+Create Date: 2026-10-18 16:05:27.694130
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b7d2e9f4a61'
+down_revision = 'f4a6c8e0b2d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # перед созданием первичного ключа удаляем неполные строки и дубликаты подписок
+    op.execute("DELETE FROM following WHERE follower_id IS NULL OR followed_id IS NULL")
+    op.execute(
+        "DELETE FROM following a USING following b "
+        "WHERE a.follower_id = b.follower_id AND a.followed_id = b.followed_id AND a.ctid > b.ctid"
+    )
+    op.alter_column('following', 'follower_id', existing_type=sa.Integer(), nullable=False)
+    op.alter_column('following', 'followed_id', existing_type=sa.Integer(), nullable=False)
+    op.create_primary_key('following_pkey', 'following', ['follower_id', 'followed_id'])
+    op.create_index(
+        'ix_following_followed_id_follower_id',
+        'following',
+        ['followed_id', 'follower_id'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_following_followed_id_follower_id', table_name='following')
+    op.drop_constraint('following_pkey', 'following', type_='primary')
+    op.alter_column('following', 'followed_id', existing_type=sa.Integer(), nullable=True)
+    op.alter_column('following', 'follower_id', existing_type=sa.Integer(), nullable=True)
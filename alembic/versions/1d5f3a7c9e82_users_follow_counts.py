@@ -0,0 +1,37 @@
+"""users follow counts
+
+Revision ID: 1d5f3a7c9e82
+Revises: 0b7d2e9f4a61
+Create Date: 2026-10-18 16:31:50.207416
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1d5f3a7c9e82'
+down_revision = '0b7d2e9f4a61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('followers_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('users', sa.Column('following_count', sa.Integer(), server_default='0', nullable=False))
+    # строка (follower_id=A, followed_id=B) означает, что B подписан на A
+    op.execute(
+        "UPDATE users SET followers_count = c.count FROM ("
+        "SELECT follower_id, count(*) AS count FROM following GROUP BY follower_id"
+        ") AS c WHERE users.id = c.follower_id"
+    )
+    op.execute(
+        "UPDATE users SET following_count = c.count FROM ("
+        "SELECT followed_id, count(*) AS count FROM following GROUP BY followed_id"
+        ") AS c WHERE users.id = c.followed_id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'following_count')
+    op.drop_column('users', 'followers_count')
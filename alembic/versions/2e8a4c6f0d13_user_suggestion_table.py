@@ -0,0 +1,38 @@
+"""user suggestion table
+
+Revision ID: 2e8a4c6f0d13
+Revises: 1d5f3a7c9e82
+Create Date: 2026-10-18 17:02:14.851937
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2e8a4c6f0d13'
+down_revision = '1d5f3a7c9e82'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('user_suggestion',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('suggested_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['suggested_id'], ['users.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'suggested_id')
+    )
+    op.create_index(
+        'ix_user_suggestion_user_id_score_suggested_id',
+        'user_suggestion',
+        ['user_id', sa.text('score DESC'), 'suggested_id'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_suggestion_user_id_score_suggested_id', table_name='user_suggestion')
+    op.drop_table('user_suggestion')
@@ -0,0 +1,24 @@
+"""like counts reconciled at
+
+Revision ID: 3a9c5e7b1d24
+Revises: 2e8a4c6f0d13
+Create Date: 2026-10-18 18:12:40.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3a9c5e7b1d24'
+down_revision = '2e8a4c6f0d13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('like_counts', sa.Column('reconciled_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('like_counts', 'reconciled_at')
@@ -0,0 +1,29 @@
+"""post feed keyset index
+
+Revision ID: 3f9b2c41d7e5
+Revises: 1c8a6d972719
+Create Date: 2026-10-18 12:04:11.218734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9b2c41d7e5'
+down_revision = '1c8a6d972719'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_post_user_id_created_at_id',
+        'post',
+        ['user_id', sa.text('created_at DESC'), sa.text('id DESC')],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_post_user_id_created_at_id', table_name='post')
@@ -0,0 +1,40 @@
+"""timeline table
+
+Revision ID: a84d0e6b3c12
+Revises: 3f9b2c41d7e5
+Create Date: 2026-10-18 13:21:46.503118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a84d0e6b3c12'
+down_revision = '3f9b2c41d7e5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('timeline',
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['post_id'], ['post.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('owner_id', 'post_id')
+    )
+    op.create_index(
+        'ix_timeline_owner_id_created_at_post_id',
+        'timeline',
+        ['owner_id', sa.text('created_at DESC'), sa.text('post_id DESC')],
+        unique=False
+    )
+    op.create_index(op.f('ix_timeline_post_id'), 'timeline', ['post_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_timeline_post_id'), table_name='timeline')
+    op.drop_index('ix_timeline_owner_id_created_at_post_id', table_name='timeline')
+    op.drop_table('timeline')
@@ -0,0 +1,33 @@
+"""like counts table
+
+Revision ID: c5e71f08a9d4
+Revises: a84d0e6b3c12
+Create Date: 2026-10-18 14:02:37.840215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e71f08a9d4'
+down_revision = 'a84d0e6b3c12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('like_counts',
+    sa.Column('entity_type', sa.String(length=50), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('entity_type', 'entity_id')
+    )
+    op.execute(
+        "INSERT INTO like_counts (entity_type, entity_id, count) "
+        "SELECT entity_type, entity_id, count(*) FROM likes GROUP BY entity_type, entity_id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('like_counts')
@@ -0,0 +1,41 @@
+"""likes unique index
+
+Revision ID: d19a4b7e6f20
+Revises: c5e71f08a9d4
+Create Date: 2026-10-18 14:48:05.117392
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd19a4b7e6f20'
+down_revision = 'c5e71f08a9d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # удаляем дубликаты лайков, оставляя самый ранний, и пересчитываем затронутые счетчики
+    op.execute(
+        "DELETE FROM likes a USING likes b "
+        "WHERE a.entity_type = b.entity_type AND a.entity_id = b.entity_id "
+        "AND a.user_id = b.user_id AND a.id > b.id"
+    )
+    op.execute(
+        "UPDATE like_counts SET count = c.count FROM ("
+        "SELECT entity_type, entity_id, count(*) AS count FROM likes GROUP BY entity_type, entity_id"
+        ") AS c WHERE like_counts.entity_type = c.entity_type AND like_counts.entity_id = c.entity_id "
+        "AND like_counts.count <> c.count"
+    )
+    op.create_index(
+        'ix_likes_entity_type_entity_id_user_id',
+        'likes',
+        ['entity_type', 'entity_id', 'user_id'],
+        unique=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_likes_entity_type_entity_id_user_id', table_name='likes')
@@ -0,0 +1,38 @@
+"""comment generic relationship indexes
+
+Revision ID: e2f83c5a1b97
+Revises: d19a4b7e6f20
+Create Date: 2026-10-18 15:20:41.503218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2f83c5a1b97'
+down_revision = 'd19a4b7e6f20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # для likes отдельный индекс не нужен: (entity_type, entity_id) - префикс
+    # уникального индекса ix_likes_entity_type_entity_id_user_id
+    op.create_index(
+        'ix_comment_commentable_type_commentable_id_parent_comment_id',
+        'comment',
+        ['commentable_type', 'commentable_id', 'parent_comment_id', 'created_at', 'id'],
+        unique=False
+    )
+    op.create_index(
+        'ix_comment_parent_comment_id_created_at_id',
+        'comment',
+        ['parent_comment_id', 'created_at', 'id'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_comment_parent_comment_id_created_at_id', table_name='comment')
+    op.drop_index('ix_comment_commentable_type_commentable_id_parent_comment_id', table_name='comment')
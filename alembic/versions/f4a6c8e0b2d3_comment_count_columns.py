@@ -0,0 +1,33 @@
+"""comment count columns
+
+Revision ID: f4a6c8e0b2d3
+Revises: e2f83c5a1b97
+Create Date: 2026-10-18 15:46:12.318044
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4a6c8e0b2d3'
+down_revision = 'e2f83c5a1b97'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('post', sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('image', sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False))
+    for table, commentable_type in (('post', 'Post'), ('image', 'Image')):
+        op.execute(
+            f"UPDATE {table} SET comment_count = c.count FROM ("
+            f"SELECT commentable_id, count(*) AS count FROM comment WHERE commentable_type = '{commentable_type}' "
+            f"GROUP BY commentable_id"
+            f") AS c WHERE {table}.id = c.commentable_id"
+        )
+
+
+def downgrade() -> None:
+    op.drop_column('image', 'comment_count')
+    op.drop_column('post', 'comment_count')
@@ -1,6 +1,7 @@
 from fastapi import APIRouter
 
-from app.api.api_v1.endpoints import user, login, search, post, image
+from app.api.api_v1.endpoints import user, login, search, post, image, async_post
+from app.core.config import settings
 
 api_router = APIRouter()
 api_router.include_router(user.router, prefix="/user", tags=["user"])
@@ -8,3 +9,5 @@ api_router.include_router(login.router, tags=["login"])
 api_router.include_router(search.router, tags=["search"])
 api_router.include_router(post.router, prefix="/post", tags=["post"])
 api_router.include_router(image.router, prefix="/image", tags=["image"])
+if settings.ASYNC_POST_ENDPOINTS:
+	api_router.include_router(async_post.router, prefix="/async/post", tags=["async post"])
@@ -0,0 +1,58 @@
+from typing import Annotated, Any
+
+from fastapi import APIRouter, Depends, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_async_db, get_current_user_async
+from app.crud.async_crud import async_post, async_likes
+from app.models.post import Post
+from app.models.users import Users
+from app.schemas.like import LikesCount
+from app.schemas.page import CursorPage
+from app.schemas.post import PostDBOut
+from app.utils.page import encode_cursor, decode_cursor
+
+router = APIRouter()
+
+
+@router.get("/feed", response_model=CursorPage[PostDBOut], status_code=status.HTTP_200_OK)
+async def get_feeds_cursor(
+		*,
+		db: Annotated[AsyncSession, Depends(get_async_db)],
+		current_user: Annotated[Users, Depends(get_current_user_async)],
+		cursor: str | None = Query(None, description="Cursor from the previous page"),
+		size: int = Query(10, ge=1, le=100, description="Page size")
+) -> Any:
+	"""Async вариант /post/feed"""
+	created_at, post_id = decode_cursor(cursor) if cursor else (None, None)
+	db_posts = await async_post.get_feed_after(
+		db, limit=size + 1, id_=current_user.id, created_at=created_at, post_id=post_id, out=PostDBOut
+	)
+	next_cursor = None
+	if len(db_posts) > size:
+		db_posts = db_posts[:size]
+		next_cursor = encode_cursor(db_posts[-1].created_at, db_posts[-1].id)
+	return CursorPage(items=db_posts, size=size, next_cursor=next_cursor)
+
+
+@router.get("/{post_id}/likes-count", response_model=LikesCount, status_code=status.HTTP_200_OK)
+async def count_likes(
+		*,
+		db: Annotated[AsyncSession, Depends(get_async_db)],
+		current_user: Annotated[Users, Depends(get_current_user_async)],
+		post_id: int
+) -> Any:
+	"""Async вариант /post/{post_id}/likes-count, без загрузки самого поста"""
+	count = await async_likes.count_likes_by_key(db, entity_type=Post.__name__, entity_id=post_id)
+	return {"count": count}
+
+
+@router.get("/{post_id}", response_model=PostDBOut, status_code=status.HTTP_200_OK)
+async def get_post(
+		*,
+		db: Annotated[AsyncSession, Depends(get_async_db)],
+		current_user: Annotated[Users, Depends(get_current_user_async)],
+		post_id: int
+) -> Any:
+	"""Async вариант /post/{post_id}"""
+	return await async_post.get(db, id_=post_id, out=PostDBOut)
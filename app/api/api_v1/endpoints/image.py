@@ -2,7 +2,7 @@ from typing import Any, Annotated, List
 from datetime import datetime
 from pathlib import Path
 
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Query
 from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import select
@@ -17,6 +17,7 @@ from app.schemas.responses import SuccessResponse
 from app.models.users import Users
 from app.models.image import Image
 from app.utils.image_processing import image_processing, image_delete, image_exist_check
+from app.utils.page import decode_cursor
 from app.core.config import settings
 
 
@@ -143,11 +144,30 @@ def get_comments(
 		*,
 		db: Annotated[Session, Depends(get_db)],
 		current_user: Annotated[Users, Depends(get_current_user)],
-		image_id: int
+		image_id: int,
+		cursor: str | None = Query(None, description="Cursor from the previous page"),
+		size: int = Query(20, ge=1, le=100, description="Page size"),
+		replies_limit: int = Query(5, ge=0, le=100, description="Max replies inlined per comment")
 ) -> Any:
+	"""Страница веток комментариев с курсорной пагинацией по (created_at, id). У каждого комментария
+	не больше replies_limit ответов, остальные догружаются по replies_cursor."""
 	db_image = db.execute(select(Image).filter_by(id=image_id)).scalar_one_or_none()
-	db_comments = comment.get_object_comments(db, obj_to_comment=db_image)
-	return {"comments": db_comments}
+	if not db_image:
+		error_response = ErrorResponse(
+			loc="image_id",
+			msg="The image with this id does not exists",
+			type="value_error"
+		)
+		raise HTTPException(
+			status_code=status.HTTP_404_NOT_FOUND,
+			detail=[error_response.model_dump()]
+		)
+	created_at, comment_id = decode_cursor(cursor) if cursor else (None, None)
+	db_comments, next_cursor = comment.get_object_comments_page(
+		db, obj_to_comment=db_image, limit=size, replies_limit=replies_limit,
+		created_at=created_at, comment_id=comment_id
+	)
+	return {"comments": db_comments, "next_cursor": next_cursor}
 
 
 @router.get("/comment/{comment_id}", response_model=CommentDBOutWithComments, status_code=status.HTTP_200_OK)
@@ -157,11 +177,30 @@ def get_comment(
 		current_user: Annotated[Users, Depends(get_current_user)],
 		comment_id: int
 ) -> Any:
-	"""Возвращает комментарий по id"""
-	db_comment = comment.get(db, id_=comment_id)
+	"""Возвращает комментарий по id вместе с веткой ответов"""
+	db_comment = comment.get_thread(db, id_=comment_id)
 	return db_comment
 
 
+@router.get("/comment/{comment_id}/replies", response_model=CommentsDBOut, status_code=status.HTTP_200_OK)
+def get_replies(
+		*,
+		db: Annotated[Session, Depends(get_db)],
+		current_user: Annotated[Users, Depends(get_current_user)],
+		comment_id: int,
+		cursor: str | None = Query(None, description="replies_cursor of the comment or next_cursor"),
+		size: int = Query(20, ge=1, le=100, description="Page size"),
+		replies_limit: int = Query(5, ge=0, le=100, description="Max replies inlined per comment")
+) -> Any:
+	"""Догрузка ответов на комментарий после курсора"""
+	comment.get(db, id_=comment_id)
+	created_at, reply_id = decode_cursor(cursor) if cursor else (None, None)
+	db_comments, next_cursor = comment.get_replies(
+		db, id_=comment_id, limit=size, replies_limit=replies_limit, created_at=created_at, comment_id=reply_id
+	)
+	return {"comments": db_comments, "next_cursor": next_cursor}
+
+
 @router.get("/{image_id}", response_model=image.ImageOut, status_code=status.HTTP_200_OK)
 def get_image(
 		*,
@@ -13,12 +13,13 @@ from app.core.security import (
 	verify_password_reset_token, create_refresh_token, verify_token
 )
 from app.utils.sendmail import send_reset_password
+from app.utils.rate_limit import limit_login, limit_password_recovery
 
 
 router = APIRouter()
 
 
-@router.post("/login", response_model=Token)
+@router.post("/login", response_model=Token, dependencies=[Depends(limit_login)])
 def login(
 		*,
 		db: Annotated[Session, Depends(get_db)],
@@ -42,7 +43,10 @@ def login(
 	}
 
 
-@router.post("/password-recovery/{email}", response_model=Message, status_code=status.HTTP_200_OK)
+@router.post(
+	"/password-recovery/{email}", response_model=Message, status_code=status.HTTP_200_OK,
+	dependencies=[Depends(limit_password_recovery)]
+)
 def recover_password(email: str, db: Annotated[Session, Depends(get_db)]) -> Any:
 	"""Функция для отправки письма с линком внутри которого токен."""
 	user_db = user.get_by_email(db, email=email)
@@ -11,16 +11,18 @@ from fastapi_pagination import Page
 from app.schemas.post import PostCreate, PostUpdate, PostDBOut, PostDBCreate, PostDBUpdate, PostsDBOut
 from app.schemas.image import ImageDB
 from app.schemas.responses import SuccessResponse
-from app.schemas.page import Page
+from app.schemas.page import Page, CursorPage, TotalMode
 from app.schemas.comment import CommentDBOut, CommentCreate, CommentDBCreate, CommentUpdate, CommentDBUpdate
 from app.schemas.comment import CommentDBOutWithComments, CommentsDBOut
-from app.schemas.like import LikeCreate, LikeDBOut, LikesCount
+from app.schemas.like import LikeCreate, LikeDBOut, LikesCount, LikesBatchIn, LikesBatchOut
 from app.api.deps import get_db, get_current_user
 from app.models.users import Users
 from app.models.image import Image
 from app.models.post import Post
 from app.utils.image_processing import image_processing, image_delete
-from app.utils.page import page_dict
+from app.utils.page import page_dict, encode_cursor, decode_cursor
+from app.utils.timeline import fan_out_post
+from app.core.config import settings
 from app.crud.crud_post import post
 from app.crud.crud_user import user
 from app.crud.crud_comment import comment
@@ -49,6 +51,8 @@ def create(
 			db.add(db_image)
 			db_post.images.append(db_image)
 	db.commit()
+	if settings.FEED_FROM_TIMELINE:
+		fan_out_post.delay(post_id=db_post.id)
 	return db_post
 
 
@@ -85,7 +89,7 @@ def delete_post(
 ) -> Any:
 	"""Удаляет пост. Также удялятся все файлы связанные с постом."""
 	db_post = post.get(db, id_=post_id)
-	for image in db_post.images.all():
+	for image in db_post.images:
 		image_delete(image.name)
 	post.remove(db, id_=post_id)
 	return {"success": "Post has been deleted."}
@@ -116,7 +120,7 @@ def get_posts(
 		current_user: Annotated[Users, Depends(get_current_user)]
 ) -> Any:
 	"""Возвращает все посты текущего пользователя"""
-	return {"posts": [p for p in current_user.posts.all()]}
+	return {"posts": post.get_user_posts(db, id_=current_user.id)}
 
 
 @router.get("/get-posts/{user_id}", response_model=Page[PostDBOut], status_code=status.HTTP_200_OK)
@@ -126,13 +130,23 @@ def get_user_posts(
 		current_user: Annotated[Users, Depends(get_current_user)],
 		user_id: int = Path(description='user id'),
 		page: int = Query(1, ge=1, description="Page number"),
-		size: int = Query(10, ge=1, le=100, description="Page size")
+		size: int = Query(10, ge=1, le=100, description="Page size"),
+		total_mode: TotalMode = Query(TotalMode.exact, description="How to compute total: exact, estimate or none")
 ) -> Any:
 	"""Возвращает посты нужного пользователя с пагинацией."""
 	db_user = user.get(db, id_=user_id)
+	if total_mode == TotalMode.none:
+		db_posts = post.get_page(db, page=page, limit=size, id_=user_id, extra=1)
+		return Page(items=db_posts[:size], **page_dict(page=page, size=size, has_next=len(db_posts) > size))
 	db_posts = post.get_page(db, page=page, limit=size, id_=user_id)
-	total_posts = post.count_posts(db, user_id)
-	return Page(items=db_posts, **page_dict(page=page, size=size, total_posts=total_posts))
+	if total_mode == TotalMode.estimate:
+		total_posts = post.estimate_posts(db, user_id)
+	else:
+		total_posts = post.count_posts(db, user_id)
+	return Page(
+		items=db_posts,
+		**page_dict(page=page, size=size, total_posts=total_posts, strict=total_mode == TotalMode.exact)
+	)
 
 
 @router.get("/get-posts", response_model=Page[PostDBOut], status_code=status.HTTP_200_OK)
@@ -141,12 +155,40 @@ def get_feeds(
 		db: Annotated[Session, Depends(get_db)],
 		current_user: Annotated[Users, Depends(get_current_user)],
 		page: int = Query(1, ge=1, description="Page number"),
-		size: int = Query(10, ge=1, le=100, description="Page size")
+		size: int = Query(10, ge=1, le=100, description="Page size"),
+		total_mode: TotalMode = Query(TotalMode.exact, description="How to compute total: exact, estimate or none")
 ) -> Any:
 	"""Возвращает посты текущего пользователя и его подписок, с пагинацией. (Лента новостей)"""
+	if total_mode == TotalMode.none:
+		db_posts = post.get_all_feed(db, page=page, limit=size, id_=current_user.id, extra=1)
+		return Page(items=db_posts[:size], **page_dict(page=page, size=size, has_next=len(db_posts) > size))
 	db_posts = post.get_all_feed(db, page=page, limit=size, id_=current_user.id)
-	total_posts = post.count_feed_posts(db, current_user.id)
-	return Page(items=db_posts, **page_dict(page=page, size=size, total_posts=total_posts))
+	if total_mode == TotalMode.estimate:
+		total_posts = post.estimate_feed_posts(db, current_user.id)
+	else:
+		total_posts = post.count_feed_posts(db, current_user.id)
+	return Page(
+		items=db_posts,
+		**page_dict(page=page, size=size, total_posts=total_posts, strict=total_mode == TotalMode.exact)
+	)
+
+
+@router.get("/feed", response_model=CursorPage[PostDBOut], status_code=status.HTTP_200_OK)
+def get_feeds_cursor(
+		*,
+		db: Annotated[Session, Depends(get_db)],
+		current_user: Annotated[Users, Depends(get_current_user)],
+		cursor: str | None = Query(None, description="Cursor from the previous page"),
+		size: int = Query(10, ge=1, le=100, description="Page size")
+) -> Any:
+	"""Лента новостей с курсорной пагинацией по (created_at, id). next_cursor передается в следующий запрос."""
+	created_at, post_id = decode_cursor(cursor) if cursor else (None, None)
+	db_posts = post.get_feed_after(db, limit=size + 1, id_=current_user.id, created_at=created_at, post_id=post_id)
+	next_cursor = None
+	if len(db_posts) > size:
+		db_posts = db_posts[:size]
+		next_cursor = encode_cursor(db_posts[-1].created_at, db_posts[-1].id)
+	return CursorPage(items=db_posts, size=size, next_cursor=next_cursor)
 
 
 @router.post("/{post_id}/comment", response_model=CommentDBOut, status_code=status.HTTP_201_CREATED)
@@ -199,11 +241,20 @@ def get_comments(
 		*,
 		db: Annotated[Session, Depends(get_db)],
 		current_user: Annotated[Users, Depends(get_current_user)],
-		post_id: int
+		post_id: int,
+		cursor: str | None = Query(None, description="Cursor from the previous page"),
+		size: int = Query(20, ge=1, le=100, description="Page size"),
+		replies_limit: int = Query(5, ge=0, le=100, description="Max replies inlined per comment")
 ) -> Any:
+	"""Страница веток комментариев с курсорной пагинацией по (created_at, id). У каждого комментария
+	не больше replies_limit ответов, остальные догружаются по replies_cursor."""
 	db_post = post.get(db, id_=post_id)
-	db_comments = comment.get_object_comments(db, obj_to_comment=db_post)
-	return {"comments": db_comments}
+	created_at, comment_id = decode_cursor(cursor) if cursor else (None, None)
+	db_comments, next_cursor = comment.get_object_comments_page(
+		db, obj_to_comment=db_post, limit=size, replies_limit=replies_limit,
+		created_at=created_at, comment_id=comment_id
+	)
+	return {"comments": db_comments, "next_cursor": next_cursor}
 
 
 @router.get("/comment/{comment_id}", response_model=CommentDBOutWithComments, status_code=status.HTTP_200_OK)
@@ -213,11 +264,30 @@ def get_comment(
 		current_user: Annotated[Users, Depends(get_current_user)],
 		comment_id: int
 ) -> Any:
-	"""Возвращает комментарий по id"""
-	db_comment = comment.get(db, id_=comment_id)
+	"""Возвращает комментарий по id вместе с веткой ответов"""
+	db_comment = comment.get_thread(db, id_=comment_id)
 	return db_comment
 
 
+@router.get("/comment/{comment_id}/replies", response_model=CommentsDBOut, status_code=status.HTTP_200_OK)
+def get_replies(
+		*,
+		db: Annotated[Session, Depends(get_db)],
+		current_user: Annotated[Users, Depends(get_current_user)],
+		comment_id: int,
+		cursor: str | None = Query(None, description="replies_cursor of the comment or next_cursor"),
+		size: int = Query(20, ge=1, le=100, description="Page size"),
+		replies_limit: int = Query(5, ge=0, le=100, description="Max replies inlined per comment")
+) -> Any:
+	"""Догрузка ответов на комментарий после курсора"""
+	comment.get(db, id_=comment_id)
+	created_at, reply_id = decode_cursor(cursor) if cursor else (None, None)
+	db_comments, next_cursor = comment.get_replies(
+		db, id_=comment_id, limit=size, replies_limit=replies_limit, created_at=created_at, comment_id=reply_id
+	)
+	return {"comments": db_comments, "next_cursor": next_cursor}
+
+
 @router.post("/{post_id}/like", response_model=LikeDBOut, status_code=status.HTTP_201_CREATED)
 def create_like(
 		*,
@@ -245,6 +315,20 @@ def delete_like(
 	return {"success": "Like has been deleted."}
 
 
+@router.post("/likes/batch", response_model=LikesBatchOut, status_code=status.HTTP_200_OK)
+def likes_batch(
+		*,
+		db: Annotated[Session, Depends(get_db)],
+		current_user: Annotated[Users, Depends(get_current_user)],
+		obj_in: LikesBatchIn
+) -> Any:
+	"""Количество лайков и отметка "лайкнул ли я" для пачки постов. Заменяет запросы на каждый пост."""
+	post_ids = list(dict.fromkeys(obj_in.post_ids))
+	counts = likes.count_likes_batch(db, entity_type=Post.__name__, entity_ids=post_ids)
+	liked = likes.liked_by_user(db, entity_type=Post.__name__, entity_ids=post_ids, user_id=current_user.id)
+	return {"items": [{"post_id": i, "count": counts[i], "liked": i in liked} for i in post_ids]}
+
+
 @router.get("/{post_id}/likes-count", response_model=LikesCount, status_code=status.HTTP_200_OK)
 def count_likes(
 		*,
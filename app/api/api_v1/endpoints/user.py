@@ -1,15 +1,21 @@
 from typing import Any, Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_db, get_current_user
-from app.schemas.users import UserCreate, UserUpdate, UserOut, UserOutWithFollowers, UserOutWithFollowed
+from app.schemas.users import UserCreate, UserUpdate, UserOut, UserOutWithFollowers, UserOutWithFollowed, \
+	UsersCursorPage
+from app.schemas.suggestion import UserSuggestionsOut
 from app.schemas.exceptions import ErrorResponse
 from app.models.users import Users
 from app.crud.crud_user import user
+from app.crud.crud_suggestion import suggestion
 from app.elastic.elastic_service import get_es, ElasticSearchService
 from app.elastic.documents import UserDoc
+from app.utils.timeline import add_author_to_timeline, remove_author_from_timeline, add_author_to_followers
+from app.utils.page import encode_id_cursor, decode_id_cursor
+from app.core.config import settings
 
 
 router = APIRouter()
@@ -70,6 +76,8 @@ def follow(
 			detail=[error_response.model_dump()]
 		)
 	user_db = user.follow(db, user_db=current_user, user_to_follow=user_to_follow)
+	if settings.FEED_FROM_TIMELINE:
+		add_author_to_timeline.delay(owner_id=current_user.id, author_id=user_to_follow.id)
 	return user_db
 
 
@@ -92,10 +100,17 @@ def unfollow(
 			detail=[error_response.model_dump()]
 		)
 	user_db = user.unfollow(db, user_db=current_user, user_to_follow=user_to_follow)
+	if settings.FEED_FROM_TIMELINE:
+		remove_author_from_timeline.delay(owner_id=current_user.id, author_id=user_to_follow.id)
+		# эта отписка опустила автора ниже порога знаменитости: его посты больше не подмешиваются при чтении
+		if user_to_follow.followers_count == settings.CELEBRITY_FOLLOWER_THRESHOLD - 1:
+			add_author_to_followers.delay(author_id=user_to_follow.id)
 	return user_db
 
 
-@router.get("/get-followers/{user_id}", response_model=UserOutWithFollowers, status_code=status.HTTP_200_OK)
+@router.get(
+	"/get-followers/{user_id}", response_model=UserOutWithFollowers, status_code=status.HTTP_200_OK, deprecated=True
+)
 def get_followers(
 		user_id: int,
 		*,
@@ -105,7 +120,9 @@ def get_followers(
 	return user.get(db, id_=user_id)
 
 
-@router.get("/get-followed/{user_id}", response_model=UserOutWithFollowed, status_code=status.HTTP_200_OK)
+@router.get(
+	"/get-followed/{user_id}", response_model=UserOutWithFollowed, status_code=status.HTTP_200_OK, deprecated=True
+)
 def get_followed(
 		user_id: int,
 		*,
@@ -115,6 +132,57 @@ def get_followed(
 	return user.get(db, id_=user_id)
 
 
+@router.get("/suggestions", response_model=UserSuggestionsOut, status_code=status.HTTP_200_OK)
+def get_suggestions(
+		*,
+		db: Annotated[Session, Depends(get_db)],
+		current_user: Annotated[Users, Depends(get_current_user)],
+		size: int = Query(10, ge=1, le=50, description="Number of suggestions")
+) -> Any:
+	"""Возможно, вы знакомы: предрассчитанные рекомендации по общим подпискам"""
+	return {"items": suggestion.get_for_user(db, user_id=current_user.id, limit=size)}
+
+
+@router.get("/{user_id}/followers", response_model=UsersCursorPage, status_code=status.HTTP_200_OK)
+def get_followers_page(
+		user_id: int,
+		*,
+		db: Annotated[Session, Depends(get_db)],
+		current_user: Annotated[Users, Depends(get_current_user)],
+		cursor: str | None = Query(None, description="Cursor from the previous page"),
+		size: int = Query(50, ge=1, le=200, description="Page size")
+) -> Any:
+	"""Подписчики пользователя с курсорной пагинацией по id. total берется из счетчика followers_count."""
+	user_db = user.get(db, id_=user_id)
+	after_id = decode_id_cursor(cursor) if cursor else None
+	items = user.get_followers(db, id_=user_id, limit=size + 1, after_id=after_id)
+	next_cursor = None
+	if len(items) > size:
+		items = items[:size]
+		next_cursor = encode_id_cursor(items[-1].id)
+	return UsersCursorPage(items=items, size=size, next_cursor=next_cursor, total=user_db.followers_count)
+
+
+@router.get("/{user_id}/following", response_model=UsersCursorPage, status_code=status.HTTP_200_OK)
+def get_following_page(
+		user_id: int,
+		*,
+		db: Annotated[Session, Depends(get_db)],
+		current_user: Annotated[Users, Depends(get_current_user)],
+		cursor: str | None = Query(None, description="Cursor from the previous page"),
+		size: int = Query(50, ge=1, le=200, description="Page size")
+) -> Any:
+	"""Пользователи, на которых подписан user_id, с курсорной пагинацией по id. total из following_count."""
+	user_db = user.get(db, id_=user_id)
+	after_id = decode_id_cursor(cursor) if cursor else None
+	items = user.get_following(db, id_=user_id, limit=size + 1, after_id=after_id)
+	next_cursor = None
+	if len(items) > size:
+		items = items[:size]
+		next_cursor = encode_id_cursor(items[-1].id)
+	return UsersCursorPage(items=items, size=size, next_cursor=next_cursor, total=user_db.following_count)
+
+
 @router.get("/{user_id}", response_model=UserOut, status_code=status.HTTP_200_OK)
 def get_user_by_id(
 		user_id: int,
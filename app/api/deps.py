@@ -1,10 +1,12 @@
-from typing import Generator, Annotated
+from typing import Generator, AsyncGenerator, Annotated
 
 from fastapi import Depends, HTTPException, status
 from jose import jwt, JWTError
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.session import SessionLocal
+from app.db import session as db_session
 from app.core.security import oauth2_scheme
 from app.core.security import verify_token
 from app.models.users import Users
@@ -21,20 +23,39 @@ def get_db() -> Generator:
 		db.close()
 
 
-def get_current_user(
-	db: Annotated[Session, Depends(get_db)], token: Annotated[str, Depends(oauth2_scheme)]
-) -> Users | None:
+def _load_current_user(db: Session, user_id: int) -> Users:
+	"""Пользователь из токена. Если его уже нет в бд, то 401, как и для невалидного токена"""
 	credentials_exception = HTTPException(
 		status_code=status.HTTP_401_UNAUTHORIZED,
 		detail="Could not validate credentials",
 		headers={"WWW-Authenticate": "Bearer"}
 	)
-	user_id = verify_token(token)
-	current_user = user.get(db, id_=user_id)
+	try:
+		current_user = user.get_cached(db, id_=user_id)
+	except HTTPException:
+		raise credentials_exception
 	if not current_user:
 		raise credentials_exception
 	return current_user
 
 
+def get_current_user(
+	db: Annotated[Session, Depends(get_db)], token: Annotated[str, Depends(oauth2_scheme)]
+) -> Users | None:
+	user_id = verify_token(token)
+	return _load_current_user(db, user_id)
 
 
+async def get_async_db() -> AsyncGenerator:
+	"""AsyncSession для async эндпоинтов, доступна только с ASYNC_POST_ENDPOINTS"""
+	if db_session.AsyncSessionLocal is None:
+		raise RuntimeError("Async engine is not configured: set ASYNC_POST_ENDPOINTS=true to use async endpoints")
+	async with db_session.AsyncSessionLocal() as db:
+		yield db
+
+
+async def get_current_user_async(
+	db: Annotated[AsyncSession, Depends(get_async_db)], token: Annotated[str, Depends(oauth2_scheme)]
+) -> Users | None:
+	user_id = verify_token(token)
+	return await db.run_sync(lambda session: _load_current_user(session, user_id))
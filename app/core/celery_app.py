@@ -1,6 +1,35 @@
 from celery import Celery
+from celery.signals import worker_process_init
 
 from .config import settings
 
-celery = Celery("celery_app", broker=settings.BROKER, backend=settings.BACKEND, include=['app.utils.sendmail'])
+celery = Celery(
+	"celery_app", broker=settings.BROKER, backend=settings.BACKEND,
+	include=[
+		'app.utils.sendmail', 'app.utils.timeline', 'app.utils.like_counter', 'app.utils.comment_counter',
+		'app.utils.suggestions'
+	]
+)
 celery.conf.acks_late = True
+celery.conf.beat_schedule = {
+	"reconcile-like-counts": {
+		"task": "app.utils.like_counter.reconcile_like_counts",
+		"schedule": settings.LIKE_COUNT_RECONCILE_INTERVAL
+	},
+	"reconcile-comment-counts": {
+		"task": "app.utils.comment_counter.reconcile_comment_counts",
+		"schedule": settings.COMMENT_COUNT_RECONCILE_INTERVAL
+	},
+	"compute-user-suggestions": {
+		"task": "app.utils.suggestions.compute_user_suggestions",
+		"schedule": settings.SUGGESTIONS_RECOMPUTE_INTERVAL
+	}
+}
+
+
+@worker_process_init.connect
+def reset_db_pool(**kwargs) -> None:
+	"""Дочерний процесс celery не должен пользоваться соединениями, открытыми в родителе до fork"""
+	from app.db.session import engine, replica_engines
+	for db_engine in (engine, *replica_engines):
+		db_engine.dispose(close=False)
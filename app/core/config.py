@@ -1,3 +1,5 @@
+from typing import List
+
 from pydantic import EmailStr
 from pydantic_settings import BaseSettings, SettingsConfigDict
 import os
@@ -34,6 +36,88 @@ class Settings(BaseSettings):
     STATIC_DIR: str
     BROKER: str
     BACKEND: str
+    # лента из материализованной таблицы timeline вместо join по following
+    FEED_FROM_TIMELINE: bool = False
+    # сколько последних постов автора добавить в ленту при подписке на него
+    TIMELINE_FOLLOW_BACKFILL_LIMIT: int = 200
+    # начиная с этого числа подписчиков посты автора не раскладываются по лентам,
+    # а подмешиваются в ленту читателя при чтении
+    CELEBRITY_FOLLOWER_THRESHOLD: int = 10000
+    # total_mode=estimate: сколько секунд держать посчитанный total и сколько ключей хранить
+    PAGE_TOTAL_CACHE_TTL: int = 60
+    PAGE_TOTAL_CACHE_SIZE: int = 10000
+    # счетчики лайков: сброс буфера дельт по размеру или по времени (сек), сверка с likes (сек)
+    LIKE_COUNT_FLUSH_SIZE: int = 100
+    LIKE_COUNT_FLUSH_INTERVAL: float = 2.0
+    LIKE_COUNT_RECONCILE_INTERVAL: int = 60 * 60
+    # максимальная глубина ветки комментариев, которая грузится за один запрос
+    COMMENT_THREAD_MAX_DEPTH: int = 50
+    # сверка comment_count у постов и изображений с таблицей comment (сек)
+    COMMENT_COUNT_RECONCILE_INTERVAL: int = 60 * 60
+    # граф подписок в памяти воркера для ленты и is_following, полная перезагрузка раз в N секунд.
+    # подписки из других процессов видны в воркере только после перезагрузки, то есть с задержкой до N секунд
+    SOCIAL_GRAPH_CACHE: bool = False
+    SOCIAL_GRAPH_REFRESH_INTERVAL: int = 300
+    # "возможно, вы знакомы": сколько рекомендаций хранить на пользователя, сколько подписок промежуточного
+    # пользователя учитывать, как часто пересчитывать (сек)
+    SUGGESTIONS_TOP_K: int = 20
+    SUGGESTIONS_MAX_FANOUT: int = 1000
+    SUGGESTIONS_RECOMPUTE_INTERVAL: int = 24 * 60 * 60
+    # кэш пользователей в get_current_user: время жизни снимка (сек) и число пользователей
+    USER_CACHE_TTL: int = 30
+    USER_CACHE_SIZE: int = 10000
+    # bcrypt в отдельных процессах: число процессов и сколько запросов могут ждать своей очереди,
+    # остальные сразу получают 503. 0 процессов - хэшировать в текущем потоке
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE: int = 16
+    # сколько уже проверенных JWT держать в памяти воркера
+    TOKEN_CACHE_SIZE: int = 10000
+    # лимиты "запросов/секунд" для token bucket на /login и /password-recovery,
+    # с RATE_LIMIT_REDIS_URL корзины общие для всех воркеров
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_REDIS_URL: str | None = None
+    # адреса/подсети reverse proxy (JSON список). Для запросов от них IP клиента берется из X-Forwarded-For:
+    # последний адрес справа, который не входит в этот список. Без списка - адрес соединения
+    RATE_LIMIT_TRUSTED_PROXIES: List[str] = []
+    RATE_LIMIT_LOGIN_IP: str = "20/60"
+    RATE_LIMIT_LOGIN_ACCOUNT: str = "5/60"
+    RATE_LIMIT_RECOVERY_IP: str = "5/300"
+    RATE_LIMIT_RECOVERY_ACCOUNT: str = "3/3600"
+    # асинхронный движок (asyncpg) и дублирующие async эндпоинты /async/post (лента, пост, счетчик лайков),
+    # нужен extra async. Остальные эндпоинты синхронные при любом значении; async CRUD выполняет те же
+    # синхронные методы через run_sync, асинхронный только ввод-вывод через asyncpg
+    ASYNC_POST_ENDPOINTS: bool = False
+    # пул соединений на процесс: постоянные соединения, сверх них временные, ожидание свободного (сек),
+    # переоткрытие старых соединений (сек), проверка соединения перед выдачей
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 30 * 60
+    DB_POOL_PRE_PING: bool = True
+    # за PgBouncer в режиме transaction: без своего пула (NullPool) и без prepared statements
+    DB_PGBOUNCER: bool = False
+    # реплики для чтения (JSON список URI); чтение уходит на primary, если отставание больше
+    # DB_REPLICA_MAX_LAG секунд
+    DB_REPLICA_URIS: List[str] = []
+    DB_REPLICA_MAX_LAG: float = 5
+    DB_REPLICA_LAG_CHECK_INTERVAL: float = 5
+    # с DEBUG число и время запросов к бд отдаются в заголовках X-DB-*, без него - в метриках
+    DEBUG: bool = False
+    QUERY_STATS_ENABLED: bool = True
+    # сколько раз один и тот же запрос может повториться за http запрос до предупреждения о N+1
+    N_PLUS_ONE_THRESHOLD: int = 10
+    # журнал запросов дольше SLOW_QUERY_THRESHOLD секунд (JSON строки), без файла выключен.
+    # для доли SLOW_QUERY_EXPLAIN_SAMPLE_RATE записей в фоне снимается EXPLAIN. ANALYZE повторно выполняет
+    # запрос, поэтому включается отдельно и только для чтения без эффектов. Параметры могут содержать
+    # пароли и email, по умолчанию не пишутся
+    SLOW_QUERY_LOG_FILE: str | None = None
+    SLOW_QUERY_THRESHOLD: float = 0.5
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATE: float = 0.1
+    SLOW_QUERY_EXPLAIN_ANALYZE: bool = False
+    SLOW_QUERY_EXPLAIN_TIMEOUT_MS: int = 10000
+    SLOW_QUERY_LOG_PARAMETERS: bool = False
+    SLOW_QUERY_LOG_MAX_BYTES: int = 10 * 1024 * 1024
+    SLOW_QUERY_LOG_BACKUP_COUNT: int = 5
 
 
 settings = Settings()
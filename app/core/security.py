@@ -1,3 +1,12 @@
+import hashlib
+import multiprocessing
+import time
+from calendar import timegm
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import BoundedSemaphore, Lock
+from typing import Any, Callable, Dict, List
+
 from passlib.context import CryptContext
 from datetime import timedelta, datetime
 from jose import jwt, JWTError
@@ -8,21 +17,103 @@ from starlette.requests import Request
 from typing import Optional
 from starlette.status import HTTP_401_UNAUTHORIZED
 from fastapi.exceptions import HTTPException
+from prometheus_client import Counter, Gauge, Histogram
 
 from app.core.config import settings
 from app.schemas.token import TokenData
+from app.utils.cache import TTLCache
 
+password_hash_seconds = Histogram(
+	"password_hash_seconds", "bcrypt hash/verify latency including wait for a free worker", ["op"]
+)
+password_hash_rejected = Counter("password_hash_rejected_total", "bcrypt calls rejected with 503", ["op"])
+password_hash_in_flight = Gauge("password_hash_in_flight", "bcrypt calls running or waiting for a worker")
 
-def get_password_hash(password: str) -> str:
-	"""С помощью метода класса CryptContext создаем хэш пароля"""
+
+# уже проверенные токены: sha256 токена -> claims. Запись живет до exp токена
+token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_SIZE, ttl=settings.REFRESH_TOKEN_EXPIRE_MINUTES * 60)
+token_cache_requests = Counter("token_cache_requests_total", "verify_token cache lookups by result", ["result"])
+# проверки отзыва токена, вызываются с claims на каждый запрос, в том числе при попадании в кэш
+revocation_checks: List[Callable[[Dict[str, Any]], bool]] = []
+
+
+def _hash(password: str) -> str:
 	return PWD_CONTEXT.hash(password)
 
 
-def verify_password(*, password: str, hashed_password: str) -> bool:
-	"""Верифицируем пароль."""
+def _verify(password: str, hashed_password: str) -> bool:
 	return PWD_CONTEXT.verify(password, hashed_password)
 
 
+class PasswordHashPool:
+	"""bcrypt в отдельном пуле процессов, чтобы хэширование не занимало CPU и GIL воркера,
+	который обслуживает остальные запросы. Одновременно в работе или в очереди не больше
+	workers + queue_size вызовов, следующие сразу получают 503 с Retry-After."""
+
+	def __init__(self, *, workers: int, queue_size: int) -> None:
+		self.workers = workers
+		self._slots = BoundedSemaphore(max(workers, 1) + queue_size)
+		self._in_flight = 0
+		self._executor: ProcessPoolExecutor | None = None
+		self._lock = Lock()
+
+	def _get_executor(self) -> ProcessPoolExecutor:
+		with self._lock:
+			if self._executor is None:
+				# spawn, а не fork: в воркере уже есть фоновые потоки
+				self._executor = ProcessPoolExecutor(
+					max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+				)
+			return self._executor
+
+	def run(self, op: str, func: Callable[..., Any], *args: Any) -> Any:
+		if not self._slots.acquire(blocking=False):
+			password_hash_rejected.labels(op=op).inc()
+			raise HTTPException(
+				status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+				detail="Too many authentication requests, try again later",
+				headers={"Retry-After": "1"}
+			)
+		start = time.perf_counter()
+		with self._lock:
+			self._in_flight += 1
+		try:
+			if self.workers <= 0:
+				return func(*args)
+			try:
+				return self._get_executor().submit(func, *args).result()
+			except BrokenProcessPool:
+				# процесс пула упал, следующий вызов создаст пул заново
+				with self._lock:
+					self._executor = None
+				raise
+		finally:
+			with self._lock:
+				self._in_flight -= 1
+			self._slots.release()
+			password_hash_seconds.labels(op=op).observe(time.perf_counter() - start)
+
+	@property
+	def in_flight(self) -> int:
+		return self._in_flight
+
+	def shutdown(self) -> None:
+		with self._lock:
+			executor, self._executor = self._executor, None
+		if executor is not None:
+			executor.shutdown(wait=False, cancel_futures=True)
+
+
+def get_password_hash(password: str) -> str:
+	"""С помощью метода класса CryptContext создаем хэш пароля. Считается в пуле процессов"""
+	return password_pool.run("hash", _hash, password)
+
+
+def verify_password(*, password: str, hashed_password: str) -> bool:
+	"""Верифицируем пароль. Считается в пуле процессов"""
+	return password_pool.run("verify", _verify, password, hashed_password)
+
+
 def create_access_token(subject: int) -> str:
 	"""Создание токена доступа. В тело токена зашивается user_id"""
 	now = datetime.utcnow()
@@ -59,6 +150,37 @@ def verify_password_reset_token(token: str) -> str | None:
 		return None
 
 
+def _token_digest(token: str) -> bytes:
+	return hashlib.sha256(token.encode()).digest()
+
+
+def _decode_token(token: str) -> Dict[str, Any]:
+	"""jwt.decode с кэшем. При попадании подпись не проверяется повторно, exp сверяется так же, как в jose
+	(токен действителен, пока текущая секунда UTC не больше exp)."""
+	digest = _token_digest(token)
+	payload = token_cache.get(digest)
+	now = timegm(datetime.utcnow().utctimetuple())
+	if payload is not None and payload["exp"] < now:
+		token_cache.pop(digest)
+		raise JWTError("Signature has expired.")
+	if payload is None:
+		token_cache_requests.labels(result="miss").inc()
+		payload = jwt.decode(token, settings.JWT_SECRET, settings.JWT_ALGORITHM)
+		if isinstance(payload.get("exp"), int):
+			token_cache.set(digest, payload, ttl=payload["exp"] - now + 1)
+	else:
+		token_cache_requests.labels(result="hit").inc()
+	if any(check(payload) for check in revocation_checks):
+		raise JWTError("Token has been revoked.")
+	return payload
+
+
+def revoke_token(token: str) -> None:
+	"""Убираем токен из кэша проверенных. Чтобы токен не принимался и после повторной проверки подписи,
+	нужна еще проверка в revocation_checks"""
+	token_cache.pop(_token_digest(token))
+
+
 def verify_token(token: str) -> int:
 	"""Проверяем токен. На выходе получаем либо id который был зашит в токен либо raise"""
 	credentials_exception = HTTPException(
@@ -66,8 +188,10 @@ def verify_token(token: str) -> int:
 		detail="Could not validate credentials",
 		headers={"WWW-Authenticate": "Bearer"}
 	)
+	if not token:
+		raise credentials_exception
 	try:
-		payload = jwt.decode(token, settings.JWT_SECRET, settings.JWT_ALGORITHM)
+		payload = _decode_token(token)
 		user_id: str = payload.get("sub")
 		if not user_id:
 			raise credentials_exception
@@ -92,4 +216,6 @@ class OAuth2PasswordCookieBearer(OAuth2PasswordBearer):
 
 
 PWD_CONTEXT = CryptContext(schemes=["bcrypt"], deprecated="auto")
+password_pool = PasswordHashPool(workers=settings.PASSWORD_HASH_WORKERS, queue_size=settings.PASSWORD_HASH_QUEUE)
+password_hash_in_flight.set_function(lambda: password_pool.in_flight)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/login")
@@ -0,0 +1,50 @@
+from typing import Any, Generic, Type, TypeVar
+
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.crud.crud_comment import comment
+from app.crud.crud_like import likes
+from app.crud.crud_post import post
+from app.crud.crud_timeline import timeline
+from app.crud.crud_user import user
+
+CRUDType = TypeVar("CRUDType")
+
+
+def serialize(result: Any, out: Type[BaseModel]) -> Any:
+	"""ORM объект или список объектов -> pydantic модель(и)"""
+	if isinstance(result, (list, tuple)):
+		return [out.model_validate(item) for item in result]
+	return out.model_validate(result)
+
+
+class AsyncCRUD(Generic[CRUDType]):
+	"""Асинхронная обертка CRUD класса. Любой метод обернутого CRUD вызывается как
+	await async_crud.method(db, ...) с AsyncSession: сам метод синхронный и выполняется в
+	AsyncSession.run_sync, асинхронный только ввод-вывод через asyncpg. Логика запросов не дублируется.
+
+	Ленивые связи вне run_sync не грузятся, поэтому результат, который будет сериализоваться,
+	нужно превращать в pydantic модель внутри run_sync - для этого параметр out."""
+
+	def __init__(self, crud: CRUDType) -> None:
+		self.crud = crud
+
+	def __getattr__(self, name: str):
+		method = getattr(self.crud, name)
+
+		async def call(db: AsyncSession, *args: Any, out: Type[BaseModel] | None = None, **kwargs: Any) -> Any:
+			def run(session: Session) -> Any:
+				result = method(session, *args, **kwargs)
+				return serialize(result, out) if out is not None and result is not None else result
+			return await db.run_sync(run)
+
+		return call
+
+
+async_post = AsyncCRUD(post)
+async_user = AsyncCRUD(user)
+async_comment = AsyncCRUD(comment)
+async_likes = AsyncCRUD(likes)
+async_timeline = AsyncCRUD(timeline)
@@ -1,4 +1,4 @@
-from typing import Any, Dict, List, TypeVar, Generic, Type, Sequence
+from typing import Any, Dict, List, TypeVar, Generic, Type, Sequence, Tuple
 
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
@@ -6,12 +6,18 @@ from sqlalchemy.orm import Session
 from sqlalchemy import select, Row, RowMapping
 
 from app.db.base_class import Base
+from app.db.routing import read_only
 
 ModelType = TypeVar('ModelType', bound=Base)
 CreateSchemaType = TypeVar('CreateSchemaType', bound=BaseModel)
 UpdateSchemaType = TypeVar('UpdateSchemaType', bound=BaseModel)
 
 
+def entity_key(obj: Base) -> Tuple[str, int]:
+	"""Ключ сущности в том виде, в котором его записывает generic_relationship: (имя класса, id)"""
+	return type(obj).__name__, obj.id
+
+
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
 	def __init__(self, model: Type[ModelType]) -> None:
 		"""
@@ -21,10 +27,12 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
 		"""
 		self.model = model
 
+	@read_only
 	def get(self, db: Session, *, id_: Any) -> ModelType | None:
 		"""Возвращает объект по id"""
 		return db.get(self.model, id_)
 
+	@read_only
 	def get_multi(self, db: Session, *, skip: int = 0, limit: int = 100) -> Sequence[Row | RowMapping | Any]:
 		"""Возвращает коллекцию объектов. skip - номер записи с которой начать выгрузку. limit - лимит"""
 		stmt = select(self.model).offset(skip).limit(limit)
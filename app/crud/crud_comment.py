@@ -1,22 +1,32 @@
-from typing import TypeVar, List
+from datetime import datetime
+from typing import TypeVar, List, Dict, Set, Tuple
 
-from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy.orm import Session, joinedload, noload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import select, update, union, literal, func, tuple_, true, cast, Integer
 
 from fastapi import HTTPException, status
 
-from app.crud.base import CRUDBase
+from app.crud.base import CRUDBase, entity_key
+from app.db.routing import read_only
+from app.core.config import settings
 from app.schemas.comment import CommentDBCreate, CommentDBUpdate
 from app.schemas.exceptions import ErrorResponse
 from app.models.comment import Comment
 from app.models.users import Users
 from app.models.post import Post
+from app.models.image import Image
 from app.db.base_class import Base
+from app.utils.page import encode_cursor
 
 T = TypeVar("T", bound=Base)
 
+# сущности, которые можно комментировать и у которых есть счетчик comment_count
+COMMENTABLE_MODELS = {model.__name__: model for model in (Post, Image)}
+
 
 class CRUDComment(CRUDBase[Comment, CommentDBCreate, CommentDBUpdate]):
+	@read_only
 	def get(self, db: Session, *, id_: int) -> Comment | None:
 		"""Возвращает комментарий по его ID. После выполняет проверку, существует ли такой комментарий.
 		Если db_comment is None, то будет исключение."""
@@ -43,18 +53,260 @@ class CRUDComment(CRUDBase[Comment, CommentDBCreate, CommentDBUpdate]):
 		db_comment = self.model(**obj_in.model_dump())
 		db_comment.commentable = obj_to_comment
 		db.add(db_comment)
+		self._change_comment_count(db, *entity_key(obj_to_comment), delta=1)
+		db.commit()
+		return db_comment
+
+	def remove(self, db: Session, *, id_: int) -> Comment:
+		"""Удаляем комментарий и уменьшаем счетчик сущности в той же транзакции"""
+		db_comment = self.get(db, id_=id_)
+		db.delete(db_comment)
+		self._change_comment_count(db, db_comment.commentable_type, db_comment.commentable_id, delta=-1)
 		db.commit()
 		return db_comment
 
+	@staticmethod
+	def _change_comment_count(db: Session, commentable_type: str, commentable_id: int, delta: int) -> None:
+		"""Атомарно меняем comment_count сущности на delta (UPDATE ... SET comment_count = comment_count + delta).
+		Коммит делает вызывающий метод, поэтому счетчик и комментарий меняются в одной транзакции."""
+		model = COMMENTABLE_MODELS.get(commentable_type)
+		if model is None:
+			return
+		db.execute(
+			update(model).where(model.id == commentable_id).
+			values(comment_count=model.comment_count + delta).
+			execution_options(synchronize_session=False)
+		)
+
+	def _thread_cte(self, name: str, roots, max_depth: int, replies_limit: int | None = None):
+		"""WITH RECURSIVE от корней roots (условия where) вниз по ответам. Узлы на глубине max_depth дальше
+		не раскрываются, но их ответы читаются одним уровнем, чтобы было видно, что ветка продолжается.
+		Если задан replies_limit, то на каждом шаге у узла берутся только первые replies_limit + 1 ответов
+		(LATERAL ... LIMIT по индексу ix_comment_parent_comment_id_created_at_id). Лишний ответ нужен, чтобы
+		понять, что ответы обрезаны, сам он дальше не обходится, поэтому ветки под обрезанными ответами
+		не читаются вовсе. Корни раскрываются всегда, в том числе при replies_limit=0."""
+		thread = select(
+			self.model.id, self.model.parent_comment_id, self.model.created_at, literal(0).label("depth"),
+			literal(0).label("position")
+		).where(*roots).cte(name, recursive=True)
+		if replies_limit is None:
+			return thread.union_all(
+				select(
+					self.model.id, self.model.parent_comment_id, self.model.created_at, thread.c.depth + 1,
+					literal(1)
+				).where(self.model.parent_comment_id == thread.c.id, thread.c.depth <= max_depth)
+			)
+		order = (self.model.created_at, self.model.id)
+		replies = select(
+			self.model.id, self.model.parent_comment_id, self.model.created_at,
+			cast(func.row_number().over(order_by=order), Integer).label("position")
+		).where(self.model.parent_comment_id == thread.c.id).order_by(*order).limit(replies_limit + 1).\
+			lateral("replies")
+		return thread.union_all(
+			select(
+				replies.c.id, replies.c.parent_comment_id, replies.c.created_at, thread.c.depth + 1,
+				replies.c.position
+			).select_from(thread.join(replies, true())).
+			where(thread.c.depth <= max_depth, thread.c.position <= replies_limit)
+		)
+
+	def _load_comments(self, db: Session, ids) -> List[Comment]:
+		"""Один запрос: комментарии с id из подзапроса ids вместе с авторами. child_comments и parent_comment
+		не грузятся, их проставляет _build_tree."""
+		stmt = select(self.model).where(self.model.id.in_(ids)).options(
+			joinedload(self.model.author), noload(self.model.child_comments), noload(self.model.parent_comment)
+		).order_by(self.model.created_at, self.model.id)
+		return db.execute(stmt).unique().scalars().all()
+
+	@staticmethod
+	def _build_tree(
+			comments: List[Comment],
+			*,
+			root_ids: Set[int],
+			max_depth: int,
+			replies_limit: int | None = None
+	) -> Dict[int, Comment]:
+		"""Собираем дерево в памяти за O(n): раскладываем комментарии по родителям и записываем
+		child_comments и parent_comment как уже загруженные, чтобы при сериализации не было lazy load.
+		Глубина считается от root_ids. Узлы на глубине max_depth получают пустой child_comments. Если ответы
+		обрезаны по глубине или их больше replies_limit, то в replies_cursor узла пишем курсор для догрузки
+		остальных, при replies_limit оставляем первые replies_limit ответов."""
+		by_id = {c.id: c for c in comments}
+		children: Dict[int, List[Comment]] = {c.id: [] for c in comments}
+		for c in comments:
+			parent = by_id.get(c.parent_comment_id)
+			if parent is not None:
+				children[parent.id].append(c)
+			if parent is not None or c.parent_comment_id is None:
+				set_committed_value(c, "parent_comment", parent)
+		depths: Dict[int, int] = {}
+		level = [c for c in comments if c.id in root_ids]
+		depth = 0
+		while level:
+			depths.update((c.id, depth) for c in level)
+			level = [reply for c in level for reply in children[c.id]]
+			depth += 1
+		for c in comments:
+			replies = children[c.id]
+			c.replies_cursor = None
+			truncated = False
+			if depths.get(c.id, 0) >= max_depth:
+				truncated, replies = bool(replies), []
+			elif replies_limit is not None and len(replies) > replies_limit:
+				truncated, replies = True, replies[:replies_limit]
+			if truncated:
+				c.replies_cursor = encode_cursor(replies[-1].created_at, replies[-1].id) if replies else \
+					encode_cursor(datetime.min, 0)
+			set_committed_value(c, "child_comments", replies)
+		return by_id
+
+	def _get_page(
+			self,
+			db: Session,
+			*,
+			roots: list,
+			root_parent_id: int | None,
+			limit: int | None,
+			replies_limit: int | None,
+			max_depth: int | None,
+			created_at: datetime | None,
+			comment_id: int | None
+	) -> Tuple[List[Comment], str | None]:
+		"""Страница корневых комментариев (по возрастанию created_at, id после курсора) вместе с ветками
+		одним WITH RECURSIVE запросом. Возвращает корни и курсор следующей страницы."""
+		max_depth = settings.COMMENT_THREAD_MAX_DEPTH if max_depth is None else max_depth
+		if created_at is not None and comment_id is not None:
+			roots = [*roots, tuple_(self.model.created_at, self.model.id) > tuple_(created_at, comment_id)]
+		root_ids = select(self.model.id).where(*roots).order_by(self.model.created_at, self.model.id)
+		if limit is None:
+			thread = self._thread_cte("thread", [self.model.id.in_(root_ids)], max_depth, replies_limit)
+			ids = select(thread.c.id)
+		else:
+			# корень после страницы только показывает, что есть следующая страница, его ветка не читается
+			thread = self._thread_cte("thread", [self.model.id.in_(root_ids.limit(limit))], max_depth, replies_limit)
+			ids = union(select(thread.c.id), root_ids.offset(limit).limit(1))
+		comments = self._load_comments(db, ids)
+		page = [c for c in comments if c.parent_comment_id == root_parent_id]
+		self._build_tree(
+			comments, root_ids={c.id for c in page}, max_depth=max_depth, replies_limit=replies_limit
+		)
+		next_cursor = None
+		if limit is not None and len(page) > limit:
+			page = page[:limit]
+			next_cursor = encode_cursor(page[-1].created_at, page[-1].id)
+		return page, next_cursor
+
+	@read_only
+	def get_comments_by_key(
+			self,
+			db: Session,
+			*,
+			commentable_type: str,
+			commentable_id: int,
+			limit: int | None = None,
+			replies_limit: int | None = None,
+			max_depth: int | None = None,
+			created_at: datetime | None = None,
+			comment_id: int | None = None
+	) -> Tuple[List[Comment], str | None]:
+		"""То же, что get_object_comments_page, но по сырым commentable_type/commentable_id, без загрузки
+		самой сущности. Фильтр идет по колонкам, а не через generic_relationship, поэтому корни берутся
+		по индексу ix_comment_commentable_type_commentable_id_parent_comment_id."""
+		roots = [
+			self.model.commentable_type == commentable_type,
+			self.model.commentable_id == commentable_id,
+			self.model.parent_comment_id.is_(None)
+		]
+		return self._get_page(
+			db, roots=roots, root_parent_id=None, limit=limit, replies_limit=replies_limit, max_depth=max_depth,
+			created_at=created_at, comment_id=comment_id
+		)
+
+	@read_only
+	def get_object_comments_page(
+			self,
+			db: Session,
+			*,
+			obj_to_comment: T,
+			limit: int | None = None,
+			replies_limit: int | None = None,
+			max_depth: int | None = None,
+			created_at: datetime | None = None,
+			comment_id: int | None = None
+	) -> Tuple[List[Comment], str | None]:
+		"""Страница веток комментариев к сущности после курсора (created_at, comment_id).
+		У каждого узла не больше replies_limit ответов, обрезанные узлы получают replies_cursor."""
+		commentable_type, commentable_id = entity_key(obj_to_comment)
+		return self.get_comments_by_key(
+			db, commentable_type=commentable_type, commentable_id=commentable_id, limit=limit,
+			replies_limit=replies_limit, max_depth=max_depth, created_at=created_at, comment_id=comment_id
+		)
+
+	@read_only
 	def get_object_comments(
 			self,
 			db: Session,
 			*,
-			obj_to_comment: T
+			obj_to_comment: T,
+			max_depth: int | None = None
 	) -> List[Comment] | None:
-		stmt = select(self.model).where(
-			self.model.commentable == obj_to_comment, self.model.parent_comment_id.is_(None))
-		return db.execute(stmt).scalars().all()
+		"""Все ветки комментариев к сущности одним WITH RECURSIVE запросом, дерево собирается в памяти.
+		Ветки глубже max_depth (по умолчанию COMMENT_THREAD_MAX_DEPTH) обрезаются."""
+		comments, _ = self.get_object_comments_page(db, obj_to_comment=obj_to_comment, max_depth=max_depth)
+		return comments
+
+	@read_only
+	def get_replies(
+			self,
+			db: Session,
+			*,
+			id_: int,
+			limit: int,
+			replies_limit: int | None = None,
+			max_depth: int | None = None,
+			created_at: datetime | None = None,
+			comment_id: int | None = None
+	) -> Tuple[List[Comment], str | None]:
+		"""Догрузка ответов на комментарий id_ после курсора из replies_cursor, вместе с их ветками"""
+		return self._get_page(
+			db, roots=[self.model.parent_comment_id == id_], root_parent_id=id_, limit=limit,
+			replies_limit=replies_limit, max_depth=max_depth, created_at=created_at, comment_id=comment_id
+		)
+
+	@read_only
+	def get_thread(
+			self,
+			db: Session,
+			*,
+			id_: int,
+			replies_limit: int | None = None,
+			max_depth: int | None = None
+	) -> Comment:
+		"""Комментарий с его веткой ответов (до max_depth) и цепочкой родителей одним WITH RECURSIVE запросом.
+		Если комментария нет, то будет исключение."""
+		max_depth = settings.COMMENT_THREAD_MAX_DEPTH if max_depth is None else max_depth
+		replies = self._thread_cte("replies", [self.model.id == id_], max_depth, replies_limit)
+		parents = select(self.model.id, self.model.parent_comment_id).where(self.model.id == id_).\
+			cte("parents", recursive=True)
+		parents = parents.union_all(
+			select(self.model.id, self.model.parent_comment_id).where(self.model.id == parents.c.parent_comment_id)
+		)
+		ids = union(select(replies.c.id), select(parents.c.id))
+		comments = self._load_comments(db, ids)
+		db_comment = self._build_tree(
+			comments, root_ids={id_}, max_depth=max_depth, replies_limit=replies_limit
+		).get(id_)
+		if not db_comment:
+			error_response = ErrorResponse(
+				loc="comment_id",
+				msg="The comment with this id does not exists",
+				type="value_error"
+			)
+			raise HTTPException(
+				status_code=status.HTTP_404_NOT_FOUND,
+				detail=[error_response.model_dump()]
+			)
+		return db_comment
 
 
 comment = CRUDComment(Comment)
@@ -1,27 +1,39 @@
-from typing import TypeVar
+from typing import TypeVar, List, Dict, Set
 
 from fastapi import HTTPException, status
 
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.postgresql import insert
 
-from app.crud.base import CRUDBase
+from app.crud.base import CRUDBase, entity_key
+from app.db.routing import read_only
 from app.models.likes import Likes
 from app.schemas.like import LikeCreate, LikeUpdate
 from app.db.base_class import Base
 from app.schemas.exceptions import ErrorResponse
+from app.models.likes import LikeCount
+from app.utils.like_counter import like_counts_buffer, db_utcnow, hold_change_lock
 
 T = TypeVar('T', bound=Base)
 
 
 class CRUDLikes(CRUDBase[Likes, LikeCreate, LikeUpdate]):
-	def get_before_create(self, db: Session, *, obj_to_like: T, user_id: int) -> Likes | None:
-		"""Делаем запрос на наличие лайка по сущности и user_id"""
+	def get_by_key(self, db: Session, *, entity_type: str, entity_id: int, user_id: int) -> Likes | None:
+		"""Лайк пользователя по сырым entity_type/entity_id. Фильтр по колонкам, а не через
+		generic_relationship, чтобы запрос шел по индексу ix_likes_entity_type_entity_id_user_id."""
 		stmt = select(self.model).where(
-			self.model.entity == obj_to_like, self.model.user_id == user_id
+			self.model.entity_type == entity_type,
+			self.model.entity_id == entity_id,
+			self.model.user_id == user_id
 		)
 		return db.execute(stmt).scalar_one_or_none()
 
+	def get_before_create(self, db: Session, *, obj_to_like: T, user_id: int) -> Likes | None:
+		"""Делаем запрос на наличие лайка по сущности и user_id"""
+		entity_type, entity_id = entity_key(obj_to_like)
+		return self.get_by_key(db, entity_type=entity_type, entity_id=entity_id, user_id=user_id)
+
 	def create(
 			self,
 			db: Session,
@@ -29,8 +41,18 @@ class CRUDLikes(CRUDBase[Likes, LikeCreate, LikeUpdate]):
 			obj_in: LikeCreate,
 			obj_to_like: T = None
 	) -> Likes | None:
-		"""Проверяю нет ли такого лайка, если нет то создаю запись"""
-		if self.get_before_create(db, obj_to_like=obj_to_like, user_id=obj_in.user_id):
+		"""Создаю лайк одним INSERT ... ON CONFLICT DO NOTHING RETURNING. Если лайк уже есть, то insert
+		ничего не вернет (уникальный индекс по entity_type, entity_id, user_id) и будет исключение."""
+		entity_type, entity_id = entity_key(obj_to_like)
+		hold_change_lock(db)
+		stmt = insert(self.model).values(
+			**obj_in.model_dump(), entity_type=entity_type, entity_id=entity_id
+		).on_conflict_do_nothing(
+			index_elements=[self.model.entity_type, self.model.entity_id, self.model.user_id]
+		).returning(self.model, db_utcnow())
+		row = db.execute(stmt).one_or_none()
+		if not row:
+			db.rollback()
 			error_response = ErrorResponse(
 				loc="obj_to_like",
 				msg="You are already liked this entity",
@@ -40,10 +62,9 @@ class CRUDLikes(CRUDBase[Likes, LikeCreate, LikeUpdate]):
 				status_code=status.HTTP_400_BAD_REQUEST,
 				detail=[error_response.model_dump()]
 			)
-		db_like = self.model(**obj_in.model_dump())
-		db_like.entity = obj_to_like
-		db.add(db_like)
+		db_like, changed_at = row
 		db.commit()
+		like_counts_buffer.add((entity_type, entity_id), 1, changed_at)
 		return db_like
 
 	def remove_like(
@@ -53,9 +74,17 @@ class CRUDLikes(CRUDBase[Likes, LikeCreate, LikeUpdate]):
 			obj_to_like: T,
 			user_id: int
 	) -> dict | None:
-		"""проверяю есть ли такой лайк, если есть то удаляю"""
-		db_like = self.get_before_create(db, obj_to_like=obj_to_like, user_id=user_id)
-		if not db_like:
+		"""Удаляю лайк одним DELETE ... RETURNING, если ничего не удалилось - лайка не было"""
+		entity_type, entity_id = entity_key(obj_to_like)
+		hold_change_lock(db)
+		stmt = delete(self.model).where(
+			self.model.entity_type == entity_type,
+			self.model.entity_id == entity_id,
+			self.model.user_id == user_id
+		).returning(self.model.id, db_utcnow()).execution_options(synchronize_session=False)
+		row = db.execute(stmt).one_or_none()
+		if not row:
+			db.rollback()
 			error_response = ErrorResponse(
 				loc="obj_to_like",
 				msg="The like with this id does not exists",
@@ -65,19 +94,54 @@ class CRUDLikes(CRUDBase[Likes, LikeCreate, LikeUpdate]):
 				status_code=status.HTTP_400_BAD_REQUEST,
 				detail=[error_response.model_dump()]
 			)
-		db.delete(db_like)
+		changed_at = row[1]
 		db.commit()
+		like_counts_buffer.add((entity_type, entity_id), -1, changed_at)
 		return {"status": "Deleted"}
 
+	@read_only
 	def count_likes(
 			self,
 			db: Session,
 			*,
 			obj_to_like: T
 	) -> int:
-		"""Делаем подсчет лайков у сущности"""
-		stmt = select(func.count("*")).select_from(self.model).where(self.model.entity == obj_to_like)
-		return db.execute(stmt).scalar_one()
+		"""Количество лайков у сущности из денормализованного счетчика like_counts плюс еще не сброшенная
+		дельта из буфера. Чтение по первичному ключу, не зависит от числа лайков."""
+		entity_type, entity_id = entity_key(obj_to_like)
+		return self.count_likes_by_key(db, entity_type=entity_type, entity_id=entity_id)
+
+	@read_only
+	def count_likes_by_key(self, db: Session, *, entity_type: str, entity_id: int) -> int:
+		"""count_likes по сырым entity_type/entity_id, без загрузки самой сущности. Изменения из буфера,
+		сделанные до reconciled_at, не добавляются: reconcile их уже посчитал"""
+		stmt = select(LikeCount.count, LikeCount.reconciled_at).\
+			where(LikeCount.entity_type == entity_type, LikeCount.entity_id == entity_id)
+		count, reconciled_at = db.execute(stmt).one_or_none() or (0, None)
+		return count + like_counts_buffer.pending((entity_type, entity_id), reconciled_at)
+
+	@read_only
+	def count_likes_batch(self, db: Session, *, entity_type: str, entity_ids: List[int]) -> Dict[int, int]:
+		"""Счетчики лайков для пачки сущностей одного типа одним запросом к like_counts"""
+		stmt = select(LikeCount.entity_id, LikeCount.count, LikeCount.reconciled_at).where(
+			LikeCount.entity_type == entity_type, LikeCount.entity_id.in_(entity_ids)
+		)
+		counts = {entity_id: (count, reconciled_at) for entity_id, count, reconciled_at in db.execute(stmt)}
+		result = {}
+		for entity_id in entity_ids:
+			count, reconciled_at = counts.get(entity_id, (0, None))
+			result[entity_id] = count + like_counts_buffer.pending((entity_type, entity_id), reconciled_at)
+		return result
+
+	@read_only
+	def liked_by_user(self, db: Session, *, entity_type: str, entity_ids: List[int], user_id: int) -> Set[int]:
+		"""id сущностей из пачки, которые лайкнул user_id, одним запросом"""
+		stmt = select(self.model.entity_id).where(
+			self.model.entity_type == entity_type,
+			self.model.entity_id.in_(entity_ids),
+			self.model.user_id == user_id
+		)
+		return set(db.execute(stmt).scalars().all())
 
 
 likes = CRUDLikes(Likes)
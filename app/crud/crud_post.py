@@ -1,18 +1,28 @@
+from datetime import datetime
 from typing import Any, List
 
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func, union, desc
+from sqlalchemy import select, func, union, desc, tuple_
 
 from fastapi import HTTPException, status
 
 from app.crud.base import CRUDBase
-from app.models.post import Post
+from app.db.routing import read_only
+from app.crud.crud_timeline import timeline
+from app.core.config import settings
+from app.models.post import Post, post_load_options
 from app.models.users import Users, following
 from app.schemas.post import PostDBCreate, PostUpdate
 from app.schemas.exceptions import ErrorResponse
+from app.utils.cache import TTLCache
+from app.utils.social_graph import social_graph
+
+# закэшированные total для total_mode=estimate, ключ - (вид счетчика, id пользователя)
+totals_cache = TTLCache(maxsize=settings.PAGE_TOTAL_CACHE_SIZE, ttl=settings.PAGE_TOTAL_CACHE_TTL)
 
 
 class CRUDPost(CRUDBase[Post, PostDBCreate, PostUpdate]):
+	@read_only
 	def get(self, db: Session, *, id_: Any) -> Post | None:
 		"""Возвращает пост по его ID. После выполняет проверку, существует ли такой пост.
 		Если db_post is None, то будет исключение."""
@@ -29,37 +39,98 @@ class CRUDPost(CRUDBase[Post, PostDBCreate, PostUpdate]):
 			)
 		return db_post
 
-	def get_page(self, db: Session, *, page: int, limit: int, id_: int) -> List[Post]:
-		"""Функция возвращает посты пользователя, разбитые на страницы"""
-		stmt = select(self.model).where(self.model.user_id == id_).offset((page - 1) * limit).limit(limit)
+	@read_only
+	def get_page(self, db: Session, *, page: int, limit: int, id_: int, extra: int = 0) -> List[Post]:
+		"""Функция возвращает посты пользователя, разбитые на страницы.
+		extra - сколько записей взять сверх limit (extra=1 позволяет узнать, есть ли следующая страница)"""
+		stmt = select(self.model).where(self.model.user_id == id_).options(*post_load_options()).\
+			offset((page - 1) * limit).limit(limit + extra)
+		return db.execute(stmt).scalars().all()
+
+	@read_only
+	def get_user_posts(self, db: Session, *, id_: int) -> List[Post]:
+		"""Функция возвращает все посты пользователя"""
+		stmt = select(self.model).where(self.model.user_id == id_).options(*post_load_options())
 		return db.execute(stmt).scalars().all()
 
+	@read_only
 	def count_posts(self, db: Session, id_: int) -> int:
 		"""Функция считает общее количество постов пользователя"""
 		stmt = select(func.count("*")).select_from(self.model).where(self.model.user_id == id_)
 		return db.execute(stmt).scalar_one()
 
-	def get_all_feed(self, db: Session, *, page: int, limit: int, id_: int) -> List[Post]:
-		"""Функция возвращает посты основываясь на подписках пользователя, а также его собственные посты,
-		разбитые на страницы"""
-		_subquery = union(
+	@read_only
+	def estimate_posts(self, db: Session, id_: int) -> int:
+		"""Количество постов пользователя, закэшированное на PAGE_TOTAL_CACHE_TTL секунд"""
+		total = totals_cache.get(("posts", id_))
+		if total is None:
+			total = self.count_posts(db, id_)
+			totals_cache.set(("posts", id_), total)
+		return total
+
+	@staticmethod
+	def _feed_authors(id_: int):
+		"""Подзапрос из id пользователей, на которых подписан пользователь, плюс он сам.
+		С SOCIAL_GRAPH_CACHE подписки берутся из графа в памяти, без join по following."""
+		if settings.SOCIAL_GRAPH_CACHE:
+			return select(Users.id.label("id")).where(Users.id.in_([id_, *social_graph.following(id_)])).subquery()
+		return union(
 			select(following.c.follower_id.label("id")).where(following.c.followed_id == id_),
 			select(Users.id.label("id")).where(Users.id == id_)
 		).subquery()
+
+	@read_only
+	def get_all_feed(self, db: Session, *, page: int, limit: int, id_: int, extra: int = 0) -> List[Post]:
+		"""Функция возвращает посты основываясь на подписках пользователя, а также его собственные посты,
+		разбитые на страницы"""
+		if settings.FEED_FROM_TIMELINE:
+			return timeline.get_page(db, owner_id=id_, page=page, limit=limit, extra=extra)
+		_subquery = self._feed_authors(id_)
 		stmt = select(self.model).join(_subquery, self.model.user_id == _subquery.c.id).\
-			order_by(Post.created_at.desc()).offset((page - 1) * limit).limit(limit)
+			options(*post_load_options()).order_by(Post.created_at.desc(), Post.id.desc()).\
+			offset((page - 1) * limit).limit(limit + extra)
+		return db.execute(stmt).scalars().all()
+
+	@read_only
+	def get_feed_after(
+			self,
+			db: Session,
+			*,
+			limit: int,
+			id_: int,
+			created_at: datetime | None = None,
+			post_id: int | None = None
+	) -> List[Post]:
+		"""Keyset пагинация ленты. Возвращает посты, которые идут строго после (created_at, post_id)
+		в порядке (created_at DESC, id DESC). Без offset, поэтому глубокая страница стоит как первая."""
+		if settings.FEED_FROM_TIMELINE:
+			return timeline.get_after(db, owner_id=id_, limit=limit, created_at=created_at, post_id=post_id)
+		_subquery = self._feed_authors(id_)
+		stmt = select(self.model).join(_subquery, self.model.user_id == _subquery.c.id).options(*post_load_options())
+		if created_at is not None and post_id is not None:
+			stmt = stmt.where(tuple_(self.model.created_at, self.model.id) < tuple_(created_at, post_id))
+		stmt = stmt.order_by(self.model.created_at.desc(), self.model.id.desc()).limit(limit)
 		return db.execute(stmt).scalars().all()
 
+	@read_only
 	def count_feed_posts(self, db: Session, id_: int) -> int:
 		"""Функция считает количество постов в ленте, основываясь на подписках пользователя,
 		а также его собственные посты"""
-		_subquery = union(
-			select(following.c.follower_id.label("id")).where(following.c.followed_id == id_),
-			select(Users.id.label("id")).where(Users.id == id_)
-		).subquery()
+		if settings.FEED_FROM_TIMELINE:
+			return timeline.count(db, id_)
+		_subquery = self._feed_authors(id_)
 		stmt = select(func.count("*")).select_from(self.model).join(_subquery, self.model.user_id == _subquery.c.id)
 		return db.execute(stmt).scalar_one()
 
+	@read_only
+	def estimate_feed_posts(self, db: Session, id_: int) -> int:
+		"""Количество постов в ленте, закэшированное на PAGE_TOTAL_CACHE_TTL секунд"""
+		total = totals_cache.get(("feed", id_))
+		if total is None:
+			total = self.count_feed_posts(db, id_)
+			totals_cache.set(("feed", id_), total)
+		return total
+
 
 post = CRUDPost(Post)
 
@@ -0,0 +1,37 @@
+from typing import Dict, List, Tuple
+
+from sqlalchemy import select, delete, insert, Row
+from sqlalchemy.orm import Session
+
+from app.crud.base import CRUDBase
+from app.db.routing import read_only
+from app.models.suggestion import UserSuggestion
+from app.models.users import Users
+from app.schemas.suggestion import UserSuggestionOut
+
+
+class CRUDSuggestion(CRUDBase[UserSuggestion, UserSuggestionOut, UserSuggestionOut]):
+	@read_only
+	def get_for_user(self, db: Session, *, user_id: int, limit: int) -> List[Row]:
+		"""Рекомендации для user_id по убыванию score одним запросом по индексу (user_id, score DESC)"""
+		stmt = select(Users.id, Users.name, Users.surname, self.model.score).\
+			join(Users, Users.id == self.model.suggested_id).\
+			where(self.model.user_id == user_id).\
+			order_by(self.model.score.desc(), self.model.suggested_id).limit(limit)
+		return db.execute(stmt).all()
+
+	def replace(self, db: Session, *, suggestions: Dict[int, List[Tuple[int, int]]]) -> int:
+		"""Заменяем рекомендации пачки пользователей: {user_id: [(suggested_id, score), ...]}.
+		Старые строки удаляются и новые вставляются в одной транзакции."""
+		db.execute(delete(self.model).where(self.model.user_id.in_(list(suggestions))))
+		rows = [
+			{"user_id": user_id, "suggested_id": suggested_id, "score": score}
+			for user_id, items in suggestions.items() for suggested_id, score in items
+		]
+		if rows:
+			db.execute(insert(self.model), rows)
+		db.commit()
+		return len(rows)
+
+
+suggestion = CRUDSuggestion(UserSuggestion)
@@ -0,0 +1,215 @@
+import heapq
+from datetime import datetime
+from itertools import groupby
+from typing import List, Iterable
+
+from sqlalchemy.orm import Session
+from sqlalchemy import select, delete, func, literal, tuple_, union_all, true
+from sqlalchemy.dialects.postgresql import insert
+
+from app.crud.base import CRUDBase
+from app.db.routing import read_only
+from app.core.config import settings
+from app.models.timeline import Timeline
+from app.models.post import Post, post_load_options
+from app.models.users import Users, following
+from app.schemas.timeline import TimelineCreate
+
+
+def merge_newest_first(runs: Iterable[List[Post]], *, skip: int, limit: int) -> List[Post]:
+	"""k-way merge уже отсортированных по (created_at DESC, id DESC) списков постов.
+	Дубликаты (пост мог попасть и в timeline, и в поток знаменитости) пропускаются."""
+	merged = heapq.merge(*runs, key=lambda p: (p.created_at, p.id), reverse=True)
+	result = []
+	seen = set()
+	for db_post in merged:
+		if db_post.id in seen:
+			continue
+		seen.add(db_post.id)
+		if len(seen) > skip:
+			result.append(db_post)
+		if len(result) == limit:
+			break
+	return result
+
+
+class CRUDTimeline(CRUDBase[Timeline, TimelineCreate, TimelineCreate]):
+	"""Напоминание по таблице following: строка (follower_id=A, followed_id=B) означает, что B подписан на A.
+
+	Гибридная схема: посты обычных авторов раскладываются по лентам при записи, посты авторов, у которых
+	подписчиков не меньше CELEBRITY_FOLLOWER_THRESHOLD, подмешиваются в ленту при чтении."""
+
+	@staticmethod
+	def _follower_count(author_id):
+		"""Количество подписчиков автора из счетчика users.followers_count (подзапрос по первичному ключу)"""
+		return select(Users.followers_count).where(Users.id == author_id).scalar_subquery()
+
+	def is_celebrity(self, db: Session, *, author_id: int) -> bool:
+		"""Автор считается знаменитостью, если у него не меньше CELEBRITY_FOLLOWER_THRESHOLD подписчиков"""
+		count = db.execute(select(self._follower_count(author_id))).scalar_one()
+		return count >= settings.CELEBRITY_FOLLOWER_THRESHOLD
+
+	def _celebrities_followed(self, owner_id: int):
+		"""Знаменитости, на которых подписан owner_id"""
+		return select(following.c.follower_id.label("id")).where(
+			following.c.followed_id == owner_id,
+			self._follower_count(following.c.follower_id) >= settings.CELEBRITY_FOLLOWER_THRESHOLD
+		)
+
+	def _insert_from(self, db: Session, stmt) -> int:
+		"""Вставляем строки (owner_id, post_id, created_at) из select, дубликаты пропускаем"""
+		insert_stmt = insert(self.model).from_select(["owner_id", "post_id", "created_at"], stmt).\
+			on_conflict_do_nothing(index_elements=["owner_id", "post_id"])
+		result = db.execute(insert_stmt)
+		db.commit()
+		return result.rowcount
+
+	def fan_out(self, db: Session, *, post_id: int) -> int:
+		"""Раскладываем пост по лентам всех подписчиков автора и в ленту самого автора.
+		Посты знаменитостей попадают только в ленту автора."""
+		to_author = select(Post.user_id, Post.id, Post.created_at).where(Post.id == post_id)
+		author_id = db.execute(select(Post.user_id).where(Post.id == post_id)).scalar_one_or_none()
+		if author_id is None or self.is_celebrity(db, author_id=author_id):
+			return self._insert_from(db, to_author)
+		to_followers = select(following.c.followed_id, Post.id, Post.created_at).\
+			join(following, following.c.follower_id == Post.user_id).where(Post.id == post_id)
+		return self._insert_from(db, union_all(to_followers, to_author))
+
+	def add_author(self, db: Session, *, owner_id: int, author_id: int) -> int:
+		"""После подписки добавляем в ленту owner_id последние посты author_id"""
+		if self.is_celebrity(db, author_id=author_id):
+			return 0
+		stmt = select(literal(owner_id), Post.id, Post.created_at).where(Post.user_id == author_id).\
+			order_by(Post.created_at.desc()).limit(settings.TIMELINE_FOLLOW_BACKFILL_LIMIT)
+		return self._insert_from(db, stmt)
+
+	def add_author_to_followers(self, db: Session, *, author_id: int, batch_size: int = 1000) -> int:
+		"""Автор опустился ниже CELEBRITY_FOLLOWER_THRESHOLD: его посты больше не подмешиваются при чтении,
+		а написанные, пока он был знаменитостью, не раскладывались. Добавляем последние
+		TIMELINE_FOLLOW_BACKFILL_LIMIT его постов в ленты всех подписчиков, пачками по подписчикам."""
+		if self.is_celebrity(db, author_id=author_id):
+			return 0
+		latest = select(Post.id, Post.created_at).where(Post.user_id == author_id).\
+			order_by(Post.created_at.desc()).limit(settings.TIMELINE_FOLLOW_BACKFILL_LIMIT).subquery()
+		inserted = 0
+		last_id = 0
+		while True:
+			owner_ids = db.execute(
+				select(following.c.followed_id).
+				where(following.c.follower_id == author_id, following.c.followed_id > last_id).
+				order_by(following.c.followed_id).limit(batch_size)
+			).scalars().all()
+			if not owner_ids:
+				return inserted
+			stmt = select(following.c.followed_id, latest.c.id, latest.c.created_at).\
+				select_from(following.join(latest, true())).\
+				where(following.c.follower_id == author_id, following.c.followed_id.in_(owner_ids))
+			inserted += self._insert_from(db, stmt)
+			last_id = owner_ids[-1]
+
+	def remove_author(self, db: Session, *, owner_id: int, author_id: int) -> int:
+		"""После отписки удаляем из ленты owner_id все посты author_id"""
+		stmt = delete(self.model).where(
+			self.model.owner_id == owner_id,
+			self.model.post_id.in_(select(Post.id).where(Post.user_id == author_id))
+		)
+		result = db.execute(stmt)
+		db.commit()
+		return result.rowcount
+
+	def remove_post(self, db: Session, *, post_id: int) -> int:
+		"""Удаляем пост из всех лент. Обычно не нужно, строки удаляются каскадом вместе с постом."""
+		result = db.execute(delete(self.model).where(self.model.post_id == post_id))
+		db.commit()
+		return result.rowcount
+
+	def backfill(self, db: Session, *, batch_size: int = 1000) -> int:
+		"""Заполняем timeline по существующим подпискам и собственным постам. Идем пачками по owner_id,
+		чтобы не держать одну огромную транзакцию."""
+		inserted = 0
+		last_id = 0
+		while True:
+			owner_ids = db.execute(
+				select(Users.id).where(Users.id > last_id).order_by(Users.id).limit(batch_size)
+			).scalars().all()
+			if not owner_ids:
+				return inserted
+			from_followed = select(following.c.followed_id, Post.id, Post.created_at).\
+				join(following, following.c.follower_id == Post.user_id).\
+				where(
+					following.c.followed_id.in_(owner_ids),
+					self._follower_count(following.c.follower_id) < settings.CELEBRITY_FOLLOWER_THRESHOLD
+				)
+			own = select(Post.user_id, Post.id, Post.created_at).where(Post.user_id.in_(owner_ids))
+			inserted += self._insert_from(db, union_all(from_followed, own))
+			last_id = owner_ids[-1]
+
+	def _feed_stmt(self, owner_id: int):
+		return select(Post).join(self.model, self.model.post_id == Post.id).\
+			where(self.model.owner_id == owner_id).options(*post_load_options()).\
+			order_by(self.model.created_at.desc(), self.model.post_id.desc())
+
+	def _celebrity_runs(
+			self,
+			db: Session,
+			*,
+			owner_id: int,
+			limit: int,
+			created_at: datetime | None = None,
+			post_id: int | None = None
+	) -> List[List[Post]]:
+		"""Последние limit постов каждой знаменитости, на которую подписан owner_id. Один запрос с LATERAL,
+		каждый поток берется по индексу (user_id, created_at DESC, id DESC)."""
+		_celebrities = self._celebrities_followed(owner_id).subquery()
+		_latest = select(Post.id).where(Post.user_id == _celebrities.c.id)
+		if created_at is not None and post_id is not None:
+			_latest = _latest.where(tuple_(Post.created_at, Post.id) < tuple_(created_at, post_id))
+		_latest = _latest.order_by(Post.created_at.desc(), Post.id.desc()).limit(limit).lateral()
+		latest_ids = select(_latest.c.id).select_from(_celebrities).join(_latest, true())
+		stmt = select(Post).where(Post.id.in_(latest_ids)).\
+			options(*post_load_options()).order_by(Post.user_id, Post.created_at.desc(), Post.id.desc())
+		db_posts = db.execute(stmt).scalars().all()
+		return [list(run) for _, run in groupby(db_posts, key=lambda p: p.user_id)]
+
+	@read_only
+	def get_page(self, db: Session, *, owner_id: int, page: int, limit: int, extra: int = 0) -> List[Post]:
+		"""Посты из ленты owner_id, разбитые на страницы, вместе с постами знаменитостей"""
+		depth = page * limit + extra
+		own = db.execute(self._feed_stmt(owner_id).limit(depth)).scalars().all()
+		runs = self._celebrity_runs(db, owner_id=owner_id, limit=depth)
+		return merge_newest_first([own, *runs], skip=(page - 1) * limit, limit=limit + extra)
+
+	@read_only
+	def get_after(
+			self,
+			db: Session,
+			*,
+			owner_id: int,
+			limit: int,
+			created_at: datetime | None = None,
+			post_id: int | None = None
+	) -> List[Post]:
+		"""Keyset пагинация по ленте owner_id: range scan по индексу (owner_id, created_at, post_id)
+		плюс потоки знаменитостей после того же курсора"""
+		stmt = self._feed_stmt(owner_id)
+		if created_at is not None and post_id is not None:
+			stmt = stmt.where(tuple_(self.model.created_at, self.model.post_id) < tuple_(created_at, post_id))
+		own = db.execute(stmt.limit(limit)).scalars().all()
+		runs = self._celebrity_runs(db, owner_id=owner_id, limit=limit, created_at=created_at, post_id=post_id)
+		return merge_newest_first([own, *runs], skip=0, limit=limit)
+
+	@read_only
+	def count(self, db: Session, owner_id: int) -> int:
+		"""Количество постов в ленте owner_id вместе с постами знаменитостей. Строки timeline авторов,
+		которые стали знаменитостями после раскладки, не считаются: их посты уже посчитаны целиком по потоку."""
+		own = select(func.count("*")).select_from(self.model).join(Post, Post.id == self.model.post_id).\
+			where(
+				self.model.owner_id == owner_id,
+				Post.user_id.not_in(self._celebrities_followed(owner_id))
+			).scalar_subquery()
+		celebrity = select(func.count("*")).select_from(Post).\
+			where(Post.user_id.in_(self._celebrities_followed(owner_id))).scalar_subquery()
+		return db.execute(select(own + celebrity)).scalar_one()
+
+
+timeline = CRUDTimeline(Timeline)
@@ -1,19 +1,35 @@
-from typing import Any, Dict
+from typing import Any, Dict, List
 
-from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy.orm import Session, object_session, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import select, update, delete, exists, case, Row
+from sqlalchemy.dialects.postgresql import insert
 
 from fastapi import HTTPException, status
+from prometheus_client import Counter
 
 from app.crud.base import CRUDBase
+from app.db.routing import read_only, primary
 from app.models.users import Users
 from app.models.users import following
 from app.schemas.users import UserCreate, UserUpdate
 from app.schemas.exceptions import ErrorResponse
 from app.core.security import get_password_hash, verify_password
+from app.core.config import settings
+from app.utils.social_graph import social_graph
+from app.utils.cache import TTLCache
+
+# снимки колонок пользователей для get_current_user, ключ - id пользователя
+users_cache = TTLCache(maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL)
+users_cache_requests = Counter("user_cache_requests_total", "get_current_user cache lookups by result", ["result"])
+# колонки, которые читают эндпоинты; hashed_password в общий кэш не кладем, при обращении он грузится из бд
+USER_SNAPSHOT_COLUMNS = (
+	"id", "email", "name", "surname", "birth_date", "about_me", "followers_count", "following_count"
+)
 
 
 class CRUDUser(CRUDBase[Users, UserCreate, UserUpdate]):
+	@read_only
 	def get(self, db: Session, *, id_: Any) -> Users | None:
 		"""Возвращает юзера по его ID. После выполняет проверку, существует ли такой юзер.
 		Если db_user is None, то будет исключение."""
@@ -30,6 +46,29 @@ class CRUDUser(CRUDBase[Users, UserCreate, UserUpdate]):
 			)
 		return db_user
 
+	def get_cached(self, db: Session, *, id_: int) -> Users:
+		"""Пользователь из кэша снимков колонок USER_SNAPSHOT_COLUMNS. При попадании объект собирается
+		из снимка и привязывается к сессии через merge(load=False) без запроса в бд, связи и колонки не из
+		снимка при обращении грузятся как обычно. При промахе - обычный get и снимок кладется в кэш."""
+		snapshot = users_cache.get(id_)
+		if snapshot is None:
+			users_cache_requests.labels(result="miss").inc()
+			# снимок живет USER_CACHE_TTL, поэтому читаем с primary, а не с отстающей реплики
+			with primary(db):
+				db_user = self.get(db, id_=id_)
+			users_cache.set(id_, {key: getattr(db_user, key) for key in USER_SNAPSHOT_COLUMNS})
+			return db_user
+		users_cache_requests.labels(result="hit").inc()
+		db_user = self.model(**snapshot)
+		make_transient_to_detached(db_user)
+		return db.merge(db_user, load=False)
+
+	@staticmethod
+	def invalidate(*ids: int) -> None:
+		"""Убираем пользователей из кэша get_current_user после изменения"""
+		for id_ in ids:
+			users_cache.pop(id_)
+
 	def get_by_email(self, db: Session, *, email: str) -> Users:
 		"""Возвращаем объекта класса Users из бд по имэйлу"""
 		stmt = select(self.model).filter_by(email=email)
@@ -61,7 +100,15 @@ class CRUDUser(CRUDBase[Users, UserCreate, UserUpdate]):
 			hashed_password = get_password_hash(update_data['password'])
 			del update_data['password']
 			update_data['hashed_password'] = hashed_password
-		return super().update(db, db_obj=db_obj, obj_in=update_data)
+		db_obj = super().update(db, db_obj=db_obj, obj_in=update_data)
+		self.invalidate(db_obj.id)
+		return db_obj
+
+	def remove(self, db: Session, *, id_: int) -> Users:
+		"""Удаление пользователя из бд и из кэша"""
+		db_obj = super().remove(db, id_=id_)
+		self.invalidate(id_)
+		return db_obj
 
 	def authenticate(self, db: Session, *, email: str, password: str) -> Users | None:
 		"""Проверяем существует ли юзер и сравниваем предоставленный им пароль с хэшем в бд"""
@@ -74,36 +121,86 @@ class CRUDUser(CRUDBase[Users, UserCreate, UserUpdate]):
 
 	@staticmethod
 	def is_following(*, user_db: Users, user_to_follow: Users) -> bool:
-		"""Здесь получаем список подписок user_db - (select * from following where followed_id = user_db)
-		вернет все значения из follower_id которые подходят по условию. Далее проверяю если в колонке
-		follower_id есть значение которое равно user_to_follow.id, то счетчик count будет больше 0 и вернет True"""
-		return user_db.followed.filter(following.c.follower_id == user_to_follow.id).count() > 0
-
-	@classmethod
-	def follow(cls, db: Session, *, user_db: Users, user_to_follow: Users) -> Users | None:
-		"""user_db подписывается на user_to_follow. Точнее user_db.followed вернет список из пользователей,
-		на которых подписан user_db (select * from following where followed_id = user_db) вернет все значения
-		из follower_id которые подходят по условию. Команда user_db.followed.append(user_to_follow) добавит
-		пользователя follower в этот список"""
-		if not cls.is_following(user_db=user_db, user_to_follow=user_to_follow):
-			user_db.followed.append(user_to_follow)
-			db.commit()
-			return user_db
-		else:
-			return user_db
-
-	@classmethod
-	def unfollow(cls, db: Session, *, user_db: Users, user_to_follow: Users) -> Users | None:
-		"""user_db отписывается от user_to_follow. user_db.followed вернет список из пользователей,
-		на которых подписан user_db (select * from following where followed_id = user_db) вернет все значения
-		из follower_id которые подходят по условию. Команда user_db.followed.remove(user_to_follow) удалит
-		follower из этого списка."""
-		if cls.is_following(user_db=user_db, user_to_follow=user_to_follow):
-			user_db.followed.remove(user_to_follow)
-			db.commit()
-			return user_db
-		else:
-			return user_db
+		"""Подписан ли user_db на user_to_follow: один SELECT EXISTS по первичному ключу following
+		(follower_id=user_to_follow.id, followed_id=user_db.id), без загрузки списка подписок.
+		С SOCIAL_GRAPH_CACHE ответ берется из графа в памяти без запроса в бд."""
+		if settings.SOCIAL_GRAPH_CACHE:
+			return social_graph.is_following(user_db.id, user_to_follow.id)
+		stmt = select(exists().where(
+			following.c.follower_id == user_to_follow.id, following.c.followed_id == user_db.id
+		))
+		return object_session(user_db).execute(stmt).scalar()
+
+	def _change_follow_counts(self, db: Session, *, user_db: Users, user_to_follow: Users, delta: int) -> int:
+		"""Одним UPDATE меняем following_count у user_db и followers_count у user_to_follow на delta.
+		Возвращает новый followers_count у user_to_follow, посчитанный этим же UPDATE"""
+		stmt = update(self.model).where(self.model.id.in_([user_db.id, user_to_follow.id])).values(
+			following_count=case(
+				(self.model.id == user_db.id, self.model.following_count + delta), else_=self.model.following_count
+			),
+			followers_count=case(
+				(self.model.id == user_to_follow.id, self.model.followers_count + delta),
+				else_=self.model.followers_count
+			)
+		).returning(self.model.id, self.model.followers_count).execution_options(synchronize_session=False)
+		return dict(db.execute(stmt).all())[user_to_follow.id]
+
+	def follow(self, db: Session, *, user_db: Users, user_to_follow: Users) -> Users | None:
+		"""user_db подписывается на user_to_follow. Один INSERT ... ON CONFLICT DO NOTHING,
+		повторная подписка ничего не меняет. Счетчики меняются в той же транзакции, только если строка добавилась."""
+		stmt = insert(following).values(follower_id=user_to_follow.id, followed_id=user_db.id).\
+			on_conflict_do_nothing(index_elements=[following.c.follower_id, following.c.followed_id])
+		followers_count = None
+		if db.execute(stmt).rowcount:
+			followers_count = self._change_follow_counts(db, user_db=user_db, user_to_follow=user_to_follow, delta=1)
+		db.commit()
+		if followers_count is not None:
+			set_committed_value(user_to_follow, "followers_count", followers_count)
+		self.invalidate(user_db.id, user_to_follow.id)
+		if settings.SOCIAL_GRAPH_CACHE:
+			social_graph.follow(user_db.id, user_to_follow.id)
+		return user_db
+
+	def unfollow(self, db: Session, *, user_db: Users, user_to_follow: Users) -> Users | None:
+		"""user_db отписывается от user_to_follow. Один DELETE по первичному ключу following.
+		После отписки user_to_follow.followers_count - значение, которое вернул UPDATE счетчиков"""
+		stmt = delete(following).where(
+			following.c.follower_id == user_to_follow.id, following.c.followed_id == user_db.id
+		)
+		followers_count = None
+		if db.execute(stmt).rowcount:
+			followers_count = self._change_follow_counts(
+				db, user_db=user_db, user_to_follow=user_to_follow, delta=-1
+			)
+		db.commit()
+		if followers_count is not None:
+			set_committed_value(user_to_follow, "followers_count", followers_count)
+		self.invalidate(user_db.id, user_to_follow.id)
+		if settings.SOCIAL_GRAPH_CACHE:
+			social_graph.unfollow(user_db.id, user_to_follow.id)
+		return user_db
+
+	def _follow_list(self, db: Session, *, by, to, id_: int, limit: int, after_id: int | None) -> List[Row]:
+		"""Страница пользователей (id, name, surname) из following, где колонка by равна id_,
+		пользователи берутся из колонки to по возрастанию id. Идет по индексу, который начинается с (by, to)."""
+		stmt = select(self.model.id, self.model.name, self.model.surname).\
+			join(following, to == self.model.id).where(by == id_)
+		if after_id is not None:
+			stmt = stmt.where(to > after_id)
+		return db.execute(stmt.order_by(to).limit(limit)).all()
+
+	@read_only
+	def get_followers(self, db: Session, *, id_: int, limit: int, after_id: int | None = None) -> List[Row]:
+		"""Подписчики id_ после курсора after_id"""
+		return self._follow_list(
+			db, by=following.c.follower_id, to=following.c.followed_id, id_=id_, limit=limit, after_id=after_id
+		)
 
+	@read_only
+	def get_following(self, db: Session, *, id_: int, limit: int, after_id: int | None = None) -> List[Row]:
+		"""Пользователи, на которых подписан id_, после курсора after_id"""
+		return self._follow_list(
+			db, by=following.c.followed_id, to=following.c.follower_id, id_=id_, limit=limit, after_id=after_id
+		)
 
 user = CRUDUser(Users)
@@ -3,4 +3,6 @@ from app.models.users import Users
 from app.models.image import Image
 from app.models.post import Post
 from app.models.comment import Comment
-from app.models.likes import Likes
+from app.models.likes import Likes, LikeCount
+from app.models.timeline import Timeline
+from app.models.suggestion import UserSuggestion
@@ -0,0 +1,156 @@
+import logging
+import time
+from contextlib import contextmanager
+from functools import wraps
+from itertools import count
+from threading import Lock, Thread
+from typing import Callable, Iterator, List, TypeVar
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from prometheus_client import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable)
+
+routed_queries = Counter(
+	"db_routed_queries_total", "Read-only queries by target: replica or reason for primary", ["target"]
+)
+replica_lag = Gauge(
+	"db_replica_lag_seconds", "Replication lag from the last check, -1 if the replica is unreachable", ["replica"]
+)
+
+
+class ReplicaSet:
+	"""Реплики для чтения. Отставание каждой проверяется раз в check_interval секунд в фоновом потоке,
+	запросы получают только реплики с отставанием не больше max_lag. Пока первая проверка не прошла,
+	чтение идет на primary: запрос не ждет подключения к реплике."""
+
+	# на реплике - сколько секунд назад была применена последняя транзакция; 0, если все полученное применено
+	LAG_QUERY = text(
+		"SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+		"ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+	)
+
+	def __init__(self, engines: List[Engine], *, max_lag: float, check_interval: float) -> None:
+		self.engines = engines
+		self.max_lag = max_lag
+		self.check_interval = check_interval
+		# None - реплика недоступна или еще не проверялась
+		self._lags: List[float | None] = [None] * len(engines)
+		self._checked = False
+		self._next = count()
+		self._lock = Lock()
+		self._checker: Thread | None = None
+
+	def check(self) -> None:
+		"""Замеряем отставание всех реплик"""
+		lags = []
+		for i, engine in enumerate(self.engines):
+			try:
+				with engine.connect() as connection:
+					lag = float(connection.execute(self.LAG_QUERY).scalar_one())
+			except Exception as e:
+				logger.warning(f"Replica {engine.url.host} lag check failed", exc_info=e)
+				lag = None
+			replica_lag.labels(replica=str(i)).set(-1 if lag is None else lag)
+			lags.append(lag)
+		with self._lock:
+			self._lags = lags
+			self._checked = True
+
+	def _ensure_checker(self) -> None:
+		"""Запуск фоновой проверки. Поток создается при первом обращении, а не при импорте,
+		чтобы он был в каждом процессе после fork"""
+		if self._checker is None or not self._checker.is_alive():
+			with self._lock:
+				if self._checker is None or not self._checker.is_alive():
+					self._checker = Thread(target=self._check_periodically, name="replica-lag-check", daemon=True)
+					self._checker.start()
+
+	def _check_periodically(self) -> None:
+		if not self._checked:
+			self.check()
+		while True:
+			time.sleep(self.check_interval)
+			self.check()
+
+	def choose(self) -> Engine | None:
+		"""Следующая по кругу реплика с допустимым отставанием. None - читать нужно с primary"""
+		if not self.engines:
+			return None
+		self._ensure_checker()
+		with self._lock:
+			healthy = [e for e, lag in zip(self.engines, self._lags) if lag is not None and lag <= self.max_lag]
+		if not healthy:
+			return None
+		return healthy[next(self._next) % len(healthy)]
+
+
+class RoutingSession(Session):
+	"""Session, которая отправляет запросы из методов с @read_only на реплики. Все остальное, в том числе
+	flush и DML, идет на primary. Реплика выбирается один раз на сессию, чтобы в рамках запроса данные
+	не "откатывались назад" при переходе на более отстающую реплику. После первой записи сессия
+	закрепляется за primary до закрытия, чтобы в рамках запроса читать то, что только что записали."""
+
+	def __init__(self, *args, replicas: ReplicaSet | None = None, **kwargs) -> None:
+		super().__init__(*args, **kwargs)
+		self.replicas = replicas
+
+	def get_bind(self, mapper=None, clause=None, **kw):
+		if clause is not None and getattr(clause, "is_dml", False):
+			self.info["pinned_to_primary"] = True
+		if not self.info.get("read_only") or self.info.get("primary") or self.replicas is None:
+			return super().get_bind(mapper, clause=clause, **kw)
+		if self.info.get("pinned_to_primary"):
+			routed_queries.labels(target="primary_after_write").inc()
+			return super().get_bind(mapper, clause=clause, **kw)
+		if "replica" not in self.info:
+			self.info["replica"] = self.replicas.choose()
+		replica = self.info["replica"]
+		if replica is None:
+			routed_queries.labels(target="primary_lag").inc()
+			return super().get_bind(mapper, clause=clause, **kw)
+		routed_queries.labels(target="replica").inc()
+		return replica
+
+	def close(self) -> None:
+		super().close()
+		self.info.pop("pinned_to_primary", None)
+		self.info.pop("replica", None)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _pin_to_primary(session: Session, flush_context) -> None:
+	session.info["pinned_to_primary"] = True
+
+
+def read_only(method: F) -> F:
+	"""Метод CRUD только читает: его запросы можно отправить на реплику. Сессия - первый аргумент после self
+	или db=..."""
+
+	@wraps(method)
+	def wrapper(self, *args, **kwargs):
+		db: Session = kwargs["db"] if "db" in kwargs else args[0]
+		previous = db.info.get("read_only", False)
+		db.info["read_only"] = True
+		try:
+			return method(self, *args, **kwargs)
+		finally:
+			db.info["read_only"] = previous
+
+	return wrapper
+
+
+@contextmanager
+def primary(db: Session) -> Iterator[None]:
+	"""Все запросы внутри блока идут на primary, в том числе из методов с @read_only.
+	Нужно, когда прочитанное кладется в кэш и не должно быть отстающей копией."""
+	previous = db.info.get("primary", False)
+	db.info["primary"] = True
+	try:
+		yield
+	finally:
+		db.info["primary"] = previous
@@ -1,11 +1,107 @@
-from sqlalchemy import create_engine
+import time
+from typing import Any, Dict, Type
+
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+from prometheus_client import Counter, Gauge, Histogram
 
 from app.core.config import settings
+from app.db.routing import ReplicaSet, RoutingSession
+from app.utils import slow_queries
 
 SQLALCHEMY_DATABASE_URI = settings.SQLALCHEMY_DATABASE_URI
 
-engine = create_engine(SQLALCHEMY_DATABASE_URI)
+pool_checkout_seconds = Histogram(
+	"db_pool_checkout_seconds", "Time to get a connection from the pool, including waiting for a free one",
+	buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+)
+pool_timeouts = Counter("db_pool_timeouts_total", "Pool checkouts that failed after DB_POOL_TIMEOUT")
+pool_connections = Gauge("db_pool_connections", "Pool connections by state", ["engine", "state"])
+
+
+class CheckoutMetricsMixin:
+	"""Пул, который пишет время получения соединения (с ожиданием, если пул исчерпан) и таймауты"""
+
+	def connect(self):
+		start = time.perf_counter()
+		try:
+			return super().connect()
+		except exc.TimeoutError:
+			pool_timeouts.inc()
+			raise
+		finally:
+			pool_checkout_seconds.observe(time.perf_counter() - start)
+
+
+class InstrumentedQueuePool(CheckoutMetricsMixin, QueuePool):
+	pass
+
+
+class InstrumentedAsyncQueuePool(CheckoutMetricsMixin, AsyncAdaptedQueuePool):
+	pass
+
+
+def engine_options(poolclass: Type[QueuePool] = InstrumentedQueuePool) -> Dict[str, Any]:
+	"""Параметры пула из настроек. С DB_PGBOUNCER пулом занимается PgBouncer"""
+	if settings.DB_PGBOUNCER:
+		return {"poolclass": NullPool, "pool_pre_ping": settings.DB_POOL_PRE_PING}
+	return {
+		"poolclass": poolclass,
+		"pool_size": settings.DB_POOL_SIZE,
+		"max_overflow": settings.DB_MAX_OVERFLOW,
+		"pool_timeout": settings.DB_POOL_TIMEOUT,
+		"pool_recycle": settings.DB_POOL_RECYCLE,
+		"pool_pre_ping": settings.DB_POOL_PRE_PING
+	}
+
+
+def register_pool_metrics(pool, name: str) -> None:
+	"""Состояние пула в метриках, значения читаются в момент выдачи /metrics"""
+	if not isinstance(pool, QueuePool):
+		return
+	pool_connections.labels(engine=name, state="size").set_function(pool.size)
+	pool_connections.labels(engine=name, state="checked_out").set_function(pool.checkedout)
+	pool_connections.labels(engine=name, state="idle").set_function(pool.checkedin)
+	pool_connections.labels(engine=name, state="overflow").set_function(lambda: max(pool.overflow(), 0))
+
+
+engine = create_engine(SQLALCHEMY_DATABASE_URI, **engine_options())
+register_pool_metrics(engine.pool, "primary")
+
+replica_engines = [create_engine(uri, **engine_options()) for uri in settings.DB_REPLICA_URIS]
+for i, replica_engine in enumerate(replica_engines):
+	register_pool_metrics(replica_engine.pool, f"replica{i}")
+replicas = ReplicaSet(
+	replica_engines,
+	max_lag=settings.DB_REPLICA_MAX_LAG,
+	check_interval=settings.DB_REPLICA_LAG_CHECK_INTERVAL
+) if replica_engines else None
+
+slow_query_log = slow_queries.install()
+
+SessionLocal = sessionmaker(class_=RoutingSession, autoflush=False, bind=engine, replicas=replicas)
+
+
+def async_database_uri(uri: str) -> str:
+	"""postgresql:// или postgresql+psycopg2:// -> postgresql+asyncpg://"""
+	return make_url(uri).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
 
-SessionLocal = sessionmaker(autoflush=False, bind=engine)
+# асинхронный движок создается только с ASYNC_POST_ENDPOINTS, иначе asyncpg не нужен
+async_engine = None
+AsyncSessionLocal = None
+if settings.ASYNC_POST_ENDPOINTS:
+	from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 
+	async_uri = make_url(async_database_uri(SQLALCHEMY_DATABASE_URI))
+	async_options = engine_options(InstrumentedAsyncQueuePool)
+	if settings.DB_PGBOUNCER:
+		# asyncpg и диалект sqlalchemy кэшируют prepared statements, с PgBouncer в режиме transaction это ломается
+		async_uri = async_uri.update_query_dict({"prepared_statement_cache_size": "0"})
+		async_options.update(connect_args={"statement_cache_size": 0})
+	async_engine = create_async_engine(async_uri, **async_options)
+	register_pool_metrics(async_engine.pool, "async")
+	# expire_on_commit=False: после commit атрибуты не должны перечитываться неявным запросом
+	AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
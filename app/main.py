@@ -1,11 +1,16 @@
 import os
 
 from fastapi import FastAPI, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 from app.api.api_v1.api import api_router
 from app.core.config import settings
+from app.utils.like_counter import like_counts_buffer
+from app.core.security import password_pool
+from app.db.session import async_engine
+from app.utils.query_stats import query_stats_middleware
 
 app = FastAPI(title="Breads")
 
@@ -14,6 +19,25 @@ static_path = os.path.join(current_path, "../static")
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 app.mount("/static", StaticFiles(directory=static_path), name="static")
+if settings.QUERY_STATS_ENABLED:
+	app.middleware("http")(query_stats_middleware)
+
+
+@app.on_event("shutdown")
+def flush_like_counts() -> None:
+	"""Не теряем накопленные дельты счетчиков лайков при остановке"""
+	like_counts_buffer.flush()
+
+
+@app.on_event("shutdown")
+def shutdown_password_pool() -> None:
+	password_pool.shutdown()
+
+
+@app.on_event("shutdown")
+async def dispose_async_engine() -> None:
+	if async_engine is not None:
+		await async_engine.dispose()
 
 
 @app.get("/health", include_in_schema=True, status_code=status.HTTP_200_OK)
@@ -21,6 +45,12 @@ async def health() -> JSONResponse:
 	return JSONResponse({"message": "It worked!))))"})
 
 
+@app.get("/metrics", include_in_schema=False, status_code=status.HTTP_200_OK)
+def metrics() -> Response:
+	"""Метрики процесса в формате Prometheus. У каждого воркера свои значения"""
+	return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 if __name__ == '__main__':
 	import uvicorn
 	uvicorn.run(app, host=settings.SERVER_HOST, port=settings.SERVER_PORT, log_level="debug")
@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import TYPE_CHECKING, List
 
-from sqlalchemy import Text, DateTime, ForeignKey, String, Integer
+from sqlalchemy import Text, DateTime, ForeignKey, String, Integer, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy_utils import generic_relationship
 
@@ -12,6 +12,15 @@ if TYPE_CHECKING:
 
 class Comment(Base):
 	__tablename__ = "comment"
+	__table_args__ = (
+		# корневые комментарии сущности по порядку: WHERE commentable_type, commentable_id, parent_comment_id IS NULL
+		Index(
+			"ix_comment_commentable_type_commentable_id_parent_comment_id",
+			"commentable_type", "commentable_id", "parent_comment_id", "created_at", "id"
+		),
+		# ответы на комментарий: рекурсивный шаг WITH RECURSIVE и догрузка ответов по курсору
+		Index("ix_comment_parent_comment_id_created_at_id", "parent_comment_id", "created_at", "id"),
+	)
 
 	id: Mapped[int] = mapped_column(primary_key=True)
 	text: Mapped[str] = mapped_column(Text)
@@ -27,6 +36,8 @@ class Comment(Base):
 
 	# https://sqlalchemy-utils.readthedocs.io/en/latest/generic_relationship.html
 	commentable = generic_relationship(commentable_type, commentable_id)
+	# не колонка: курсор для догрузки ответов, если при выдаче ветки они были обрезаны
+	replies_cursor = None
 
 	def __repr__(self) -> str:
 		return f"id:{self.id}, type: {self.commentable_type}, commentable_id: {self.commentable_id}"
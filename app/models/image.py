@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import TYPE_CHECKING
 
-from sqlalchemy import String, ForeignKey
+from sqlalchemy import String, ForeignKey, Integer
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base_class import Base
@@ -18,6 +18,8 @@ class Image(Base):
 	upload_time: Mapped[datetime]
 	user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
 	post_id: Mapped[int | None] = mapped_column(ForeignKey("post.id"), index=True)
+	# денормализованный счетчик комментариев, меняется в CRUDComment.create/remove
+	comment_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
 	post: Mapped["Post"] = relationship(back_populates="images")
 
 	def __repr__(self):
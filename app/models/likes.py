@@ -1,4 +1,6 @@
-from sqlalchemy import ForeignKey, String, Integer
+from datetime import datetime
+
+from sqlalchemy import ForeignKey, String, Integer, Index
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy_utils import generic_relationship
 
@@ -7,6 +9,10 @@ from app.db.base_class import Base
 
 class Likes(Base):
 	__tablename__ = "likes"
+	__table_args__ = (
+		# один лайк от пользователя на сущность, на этот индекс опирается INSERT ... ON CONFLICT DO NOTHING
+		Index("ix_likes_entity_type_entity_id_user_id", "entity_type", "entity_id", "user_id", unique=True),
+	)
 
 	id: Mapped[int] = mapped_column(primary_key=True)
 	user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
@@ -17,3 +23,18 @@ class Likes(Base):
 
 	def __repr__(self) -> str:
 		return f"id: {self.id} - user: {self.user_id} - type: {self.entity_type}"
+
+
+class LikeCount(Base):
+	"""Денормализованный счетчик лайков сущности. Обновляется пачками через LikeCountAggregator,
+	расхождения исправляет периодическая задача reconcile_like_counts."""
+	__tablename__ = "like_counts"
+
+	entity_type: Mapped[str] = mapped_column(String(50), primary_key=True)
+	entity_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+	count: Mapped[int] = mapped_column(Integer, default=0)
+	# когда reconcile последний раз записал count (UTC); изменения до этого момента в count уже учтены
+	reconciled_at: Mapped[datetime | None]
+
+	def __repr__(self) -> str:
+		return f"type: {self.entity_type} - entity_id: {self.entity_id} - count: {self.count}"
@@ -1,8 +1,8 @@
 from datetime import datetime
 from typing import List, TYPE_CHECKING
 
-from sqlalchemy import ForeignKey, Text, DateTime
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import ForeignKey, Text, DateTime, Index, Integer
+from sqlalchemy.orm import Mapped, mapped_column, relationship, selectinload
 
 from app.db.base_class import Base
 
@@ -20,10 +20,29 @@ class Post(Base):
 	updated_at: Mapped[datetime | None]
 	user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
 	original_post_id: Mapped[int | None] = mapped_column(ForeignKey("post.id"))
+	# денормализованный счетчик комментариев, меняется в CRUDComment.create/remove
+	comment_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
 	author: Mapped["Users"] = relationship(back_populates="posts")
 	original_post: Mapped["Post"] = relationship(remote_side=[id])
-	images: Mapped[List["Image"]] = relationship(back_populates="post", lazy="dynamic", cascade="all, delete-orphan")
+	images: Mapped[List["Image"]] = relationship(back_populates="post", cascade="all, delete-orphan")
 
 	def __repr__(self) -> str:
 		return f"id: {self.id}, created: {self.created_at}, user_id: {self.user_id}"
 
+
+# на сколько уровней репостов подгружать original_post вместе со страницей постов
+REPOST_LOAD_DEPTH = 3
+
+
+def post_load_options(depth: int = REPOST_LOAD_DEPTH) -> list:
+	"""Опции загрузки для списков постов, которые сериализуются в PostDBOut. author, images и original_post
+	грузятся пачками через selectin (по запросу на связь и уровень), поэтому число запросов не зависит
+	от размера страницы."""
+	options = [selectinload(Post.author), selectinload(Post.images)]
+	if depth > 0:
+		options.append(selectinload(Post.original_post).options(*post_load_options(depth - 1)))
+	return options
+
+
+# индекс под keyset пагинацию ленты: (user_id, created_at DESC, id DESC)
+Index("ix_post_user_id_created_at_id", Post.user_id, Post.created_at.desc(), Post.id.desc())
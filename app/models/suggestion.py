@@ -0,0 +1,24 @@
+from sqlalchemy import ForeignKey, Integer, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base_class import Base
+
+
+class UserSuggestion(Base):
+	"""Предрассчитанные рекомендации "возможно, вы знакомы": top-k пользователей для user_id.
+	score - число людей, на которых подписан user_id и которые подписаны на suggested_id.
+	Пересчитывается пачками задачей compute_user_suggestions."""
+	__tablename__ = "user_suggestion"
+
+	user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+	suggested_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+	score: Mapped[int] = mapped_column(Integer)
+
+	def __repr__(self) -> str:
+		return f"user_id: {self.user_id}, suggested_id: {self.suggested_id}, score: {self.score}"
+
+
+Index(
+	"ix_user_suggestion_user_id_score_suggested_id",
+	UserSuggestion.user_id, UserSuggestion.score.desc(), UserSuggestion.suggested_id
+)
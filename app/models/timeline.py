@@ -0,0 +1,24 @@
+from datetime import datetime
+
+from sqlalchemy import ForeignKey, DateTime, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base_class import Base
+
+
+class Timeline(Base):
+	"""Материализованная лента: строка на каждый пост, который должен увидеть owner_id.
+	Заполняется при создании поста (fan-out on write), строки удаляются каскадом вместе с постом."""
+	__tablename__ = "timeline"
+
+	owner_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+	post_id: Mapped[int] = mapped_column(ForeignKey("post.id", ondelete="CASCADE"), primary_key=True, index=True)
+	created_at: Mapped[datetime] = mapped_column(DateTime)
+
+	def __repr__(self) -> str:
+		return f"owner_id: {self.owner_id}, post_id: {self.post_id}, created: {self.created_at}"
+
+
+Index(
+	"ix_timeline_owner_id_created_at_post_id", Timeline.owner_id, Timeline.created_at.desc(), Timeline.post_id.desc()
+)
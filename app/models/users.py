@@ -1,7 +1,7 @@
 from datetime import date
 from typing import List, TYPE_CHECKING
 
-from sqlalchemy import Column, Table, Integer, String, ForeignKey, Text
+from sqlalchemy import Column, Table, Integer, String, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship, backref, mapped_column, Mapped
 
 from app.db.base_class import Base
@@ -14,8 +14,10 @@ from app.models.likes import Likes
 # follower_id - следящий, followed_id - следуемый
 following = Table(
 	'following', Base.metadata,
-	Column('follower_id', Integer, ForeignKey('users.id')),
-	Column('followed_id', Integer, ForeignKey('users.id'))
+	Column('follower_id', Integer, ForeignKey('users.id'), primary_key=True),
+	Column('followed_id', Integer, ForeignKey('users.id'), primary_key=True),
+	# обратный индекс: выборки по followed_id (на кого подписан пользователь, лента)
+	Index('ix_following_followed_id_follower_id', 'followed_id', 'follower_id')
 )
 
 
@@ -29,6 +31,9 @@ class Users(Base):
 	birth_date: Mapped[date | None]
 	about_me: Mapped[str | None] = mapped_column(Text)
 	hashed_password: Mapped[str | None] = mapped_column(String(200))
+	# денормализованные счетчики: сколько подписчиков и на скольких подписан, меняются в follow/unfollow
+	followers_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+	following_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
 
 	# В документации sqlalchemy увидел что предпочтительнее использовать back_populates
 	# Надо подумать, возможно редактировать определение связи
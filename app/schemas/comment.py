@@ -39,6 +39,7 @@ class CommentDBOut(CommentDBCreate):
 # так как parent_comment и child_comments ссылались бы на себя
 class CommentDBOutWithComments(CommentDBOut):
 	child_comments: None | List["CommentDBOutWithComments"] = []
+	replies_cursor: str | None = None
 
 
 CommentDBOutWithComments.model_rebuild()
@@ -46,4 +47,5 @@ CommentDBOutWithComments.model_rebuild()
 
 class CommentsDBOut(BaseModel):
 	comments: List[CommentDBOutWithComments] | None = []
+	next_cursor: str | None = None
 
@@ -15,6 +15,7 @@ class ImageDB(BaseModel):
 
 class ImageDBOut(ImageDB):
 	id: int
+	comment_count: int = 0
 
 
 class ImagesDBOut(BaseModel):
@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from typing import List
+
+from pydantic import BaseModel, Field
 
 
 class LikeCreate(BaseModel):
@@ -18,3 +20,17 @@ class LikeDBOut(BaseModel):
 	user_id: int
 	entity_type: str
 	entity_id: int
+
+
+class LikesBatchIn(BaseModel):
+	post_ids: List[int] = Field(max_length=100)
+
+
+class LikeStatus(BaseModel):
+	post_id: int
+	count: int
+	liked: bool
+
+
+class LikesBatchOut(BaseModel):
+	items: List[LikeStatus]
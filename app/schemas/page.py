@@ -1,12 +1,28 @@
+from enum import Enum
+
 from pydantic import BaseModel
 from typing import List, TypeVar, Generic
 
 T = TypeVar("T")
 
 
+class TotalMode(str, Enum):
+	"""exact - точный count(*), estimate - закэшированный на время count, none - без total, только has_next"""
+	exact = "exact"
+	estimate = "estimate"
+	none = "none"
+
+
 class Page(BaseModel, Generic[T]):
 	items: List[T]
-	total: int
+	total: int | None = None
 	page: int
 	size: int
-	pages: int
+	pages: int | None = None
+	has_next: bool | None = None
+
+
+class CursorPage(BaseModel, Generic[T]):
+	items: List[T]
+	size: int
+	next_cursor: str | None = None
@@ -58,6 +58,7 @@ class PostDBOut(PostDBCreate):
 	author: UserOut | None = None
 	original_post: Optional["PostDBOut"] = None
 	images: List[ImageDBOut] | None = None
+	comment_count: int = 0
 
 
 class PostsDBOut(BaseModel):
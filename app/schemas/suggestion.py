@@ -0,0 +1,15 @@
+from typing import List
+
+from pydantic import BaseModel, ConfigDict
+
+from app.schemas.users import UserShort
+
+
+class UserSuggestionOut(UserShort):
+	score: int
+
+
+class UserSuggestionsOut(BaseModel):
+	model_config = ConfigDict(from_attributes=True)
+
+	items: List[UserSuggestionOut]
@@ -0,0 +1,11 @@
+from datetime import datetime
+
+from pydantic import BaseModel, ConfigDict
+
+
+class TimelineCreate(BaseModel):
+	model_config = ConfigDict(from_attributes=True)
+
+	owner_id: int
+	post_id: int
+	created_at: datetime
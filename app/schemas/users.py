@@ -3,6 +3,8 @@ from datetime import date
 
 from pydantic import BaseModel, EmailStr, ConfigDict
 
+from app.schemas.page import CursorPage
+
 
 class UserBase(BaseModel):
 	email: EmailStr | None = None
@@ -41,3 +43,15 @@ class UserOutWithFollowers(UserOut):
 
 class UserOutWithFollowed(UserOut):
 	followed: List[UserOut] | None = None
+
+
+class UserShort(BaseModel):
+	model_config = ConfigDict(from_attributes=True)
+
+	id: int
+	name: str | None = None
+	surname: str | None = None
+
+
+class UsersCursorPage(CursorPage[UserShort]):
+	total: int
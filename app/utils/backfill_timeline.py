@@ -0,0 +1,25 @@
+import logging
+
+from app.db.session import SessionLocal
+from app.crud.crud_timeline import timeline
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def backfill() -> int:
+	db = SessionLocal()
+	try:
+		return timeline.backfill(db)
+	finally:
+		db.close()
+
+
+def main() -> None:
+	logger.info('Backfilling timeline from existing follow edges')
+	inserted = backfill()
+	logger.info(f'Timeline backfilled, {inserted} rows inserted')
+
+
+if __name__ == '__main__':
+	main()
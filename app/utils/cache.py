@@ -0,0 +1,55 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Hashable
+
+
+class TTLCache:
+	"""Потокобезопасный LRU кэш с ограниченным размером и временем жизни записей (в секундах).
+	Живет в памяти процесса, у каждого воркера свой."""
+
+	def __init__(self, *, maxsize: int, ttl: float) -> None:
+		self.maxsize = maxsize
+		self.ttl = ttl
+		self.hits = 0
+		self.misses = 0
+		self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+		self._lock = Lock()
+
+	def get(self, key: Hashable, default: Any = None) -> Any:
+		"""Возвращает значение по ключу, просроченные записи удаляются"""
+		with self._lock:
+			item = self._data.get(key)
+			if item is None:
+				self.misses += 1
+				return default
+			expire_at, value = item
+			if expire_at <= time.monotonic():
+				del self._data[key]
+				self.misses += 1
+				return default
+			self._data.move_to_end(key)
+			self.hits += 1
+			return value
+
+	def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+		"""Кладет значение в кэш. ttl переопределяет время жизни по умолчанию для этой записи"""
+		expire_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+		with self._lock:
+			self._data[key] = (expire_at, value)
+			self._data.move_to_end(key)
+			while len(self._data) > self.maxsize:
+				self._data.popitem(last=False)
+
+	def pop(self, key: Hashable) -> Any:
+		"""Удаляет запись из кэша (инвалидация)"""
+		with self._lock:
+			item = self._data.pop(key, None)
+		return item[1] if item else None
+
+	def clear(self) -> None:
+		with self._lock:
+			self._data.clear()
+
+	def __len__(self) -> int:
+		return len(self._data)
@@ -0,0 +1,36 @@
+from celery.utils.log import get_task_logger
+from sqlalchemy import select, update, func
+from sqlalchemy.orm import Session
+
+from app.core.celery_app import celery
+from app.crud.crud_comment import COMMENTABLE_MODELS
+from app.db.session import SessionLocal
+from app.models.comment import Comment
+
+logger = get_task_logger(__name__)
+
+
+def reconcile(db: Session) -> int:
+	"""Пересчитываем comment_count по таблице comment. Обновляются только разошедшиеся счетчики,
+	возвращает их количество"""
+	fixed = 0
+	for commentable_type, model in COMMENTABLE_MODELS.items():
+		actual = select(func.count("*")).where(
+			Comment.commentable_type == commentable_type, Comment.commentable_id == model.id
+		).scalar_subquery()
+		stmt = update(model).where(model.comment_count != actual).values(comment_count=actual).\
+			execution_options(synchronize_session=False)
+		fixed += db.execute(stmt).rowcount
+	db.commit()
+	return fixed
+
+
+@celery.task
+def reconcile_comment_counts() -> None:
+	"""Периодическая сверка счетчиков комментариев"""
+	db = SessionLocal()
+	try:
+		fixed = reconcile(db)
+		logger.info(f"Comment counts reconciled, fixed: {fixed}")
+	finally:
+		db.close()
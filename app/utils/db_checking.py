@@ -19,12 +19,14 @@ seconds = 5
 	before=before_log(logger, logging.WARNING)
 )
 def init_db():
+	db = SessionLocal()
 	try:
-		db = SessionLocal()
 		db.execute(text("SELECT 1"))
 	except Exception as e:
 		logger.info(e)
 		raise e
+	finally:
+		db.close()
 
 
 def main():
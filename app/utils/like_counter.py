@@ -0,0 +1,197 @@
+import time
+from collections import defaultdict
+from datetime import datetime
+from threading import Lock, Thread
+from typing import Callable, Dict, List, Tuple
+
+from celery.utils.log import get_task_logger
+from sqlalchemy import select, update, func, exists, and_, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.celery_app import celery
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.likes import Likes, LikeCount
+
+logger = get_task_logger(__name__)
+
+EntityKey = Tuple[str, int]
+# изменение счетчика: когда произошло (UTC, по часам бд) и на сколько
+Change = Tuple[datetime, int]
+
+# advisory lock: лайки и flush берут его разделяемым, reconcile - эксклюзивным
+LIKE_COUNTS_LOCK = 7203561
+
+
+def db_utcnow():
+	"""Начало текущего запроса по часам бд (UTC). Им помечаются изменения счетчиков и reconciled_at,
+	чтобы сравнение не зависело от расхождения часов приложения и бд"""
+	return func.timezone("UTC", func.statement_timestamp())
+
+
+def hold_change_lock(db: Session) -> None:
+	"""Разделяемый advisory lock до конца транзакции лайка/анлайка. reconcile ждет, пока закоммитятся
+	уже начатые изменения, поэтому время изменения раньше reconciled_at ровно тогда, когда reconcile его видит"""
+	db.execute(select(func.pg_advisory_xact_lock_shared(LIKE_COUNTS_LOCK)))
+
+
+class LikeCountAggregator:
+	"""Write-behind буфер для счетчиков лайков. Лайк/анлайк копит изменение в памяти процесса, изменения
+	сбрасываются в like_counts одним INSERT ... ON CONFLICT DO UPDATE, когда набралось flush_size
+	изменений или прошло flush_interval секунд. У каждого изменения есть время: при flush изменения,
+	сделанные до reconciled_at счетчика, пропускаются - reconcile уже посчитал их по таблице likes.
+	Без flush_interval фонового потока нет, буфер сбрасывается только по размеру и явным flush."""
+
+	def __init__(
+			self,
+			*,
+			flush_size: int,
+			flush_interval: float | None,
+			session_factory: Callable[[], Session]
+	) -> None:
+		self.flush_size = flush_size
+		self.flush_interval = flush_interval
+		self._session_factory = session_factory
+		self._changes_by_key: Dict[EntityKey, List[Change]] = defaultdict(list)
+		self._changes = 0
+		self._lock = Lock()
+		self._flush_lock = Lock()
+		self._flusher: Thread | None = None
+
+	def add(self, key: EntityKey, delta: int, changed_at: datetime) -> None:
+		"""Копим изменение счетчика сущности. Вызывается после commit лайка/анлайка, changed_at - db_utcnow()
+		запроса, который его сделал. По достижении flush_size изменений сбрасываем буфер"""
+		with self._lock:
+			self._changes_by_key[key].append((changed_at, delta))
+			self._changes += 1
+			should_flush = self._changes >= self.flush_size
+		self._ensure_flusher()
+		if should_flush:
+			self.flush()
+
+	@staticmethod
+	def _sum_after(items: List[Change], reconciled_at: datetime | None) -> int:
+		return sum(delta for changed_at, delta in items if reconciled_at is None or changed_at > reconciled_at)
+
+	def pending(self, key: EntityKey, reconciled_at: datetime | None = None) -> int:
+		"""Дельта, которая еще не записана в бд, без изменений до reconciled_at счетчика"""
+		with self._lock:
+			return self._sum_after(self._changes_by_key.get(key, []), reconciled_at)
+
+	def _requeue(self, changes: Dict[EntityKey, List[Change]]) -> None:
+		with self._lock:
+			for key, items in changes.items():
+				self._changes_by_key[key][:0] = items
+
+	@staticmethod
+	def _deltas(
+			changes: Dict[EntityKey, List[Change]],
+			reconciled: Dict[EntityKey, datetime]
+	) -> Dict[EntityKey, int]:
+		"""Дельты без изменений, которые уже учтены reconcile"""
+		deltas = {}
+		for key, items in changes.items():
+			delta = LikeCountAggregator._sum_after(items, reconciled.get(key))
+			if delta:
+				deltas[key] = delta
+		return deltas
+
+	def flush(self) -> int:
+		"""Записываем накопленные дельты в like_counts одним запросом. Возвращает число обновленных счетчиков.
+		Если сейчас идет reconcile, то ничего не пишем, изменения остаются в буфере до следующего flush."""
+		with self._flush_lock:
+			with self._lock:
+				changes = self._changes_by_key
+				self._changes_by_key = defaultdict(list)
+				self._changes = 0
+			if not changes:
+				return 0
+			db = self._session_factory()
+			try:
+				if not db.execute(select(func.pg_try_advisory_xact_lock_shared(LIKE_COUNTS_LOCK))).scalar():
+					db.rollback()
+					self._requeue(changes)
+					return 0
+				reconciled = {
+					(t, i): reconciled_at for t, i, reconciled_at in db.execute(
+						select(LikeCount.entity_type, LikeCount.entity_id, LikeCount.reconciled_at).where(
+							LikeCount.reconciled_at.is_not(None),
+							tuple_(LikeCount.entity_type, LikeCount.entity_id).in_(list(changes))
+						)
+					)
+				}
+				deltas = self._deltas(changes, reconciled)
+				if deltas:
+					stmt = insert(LikeCount).values(
+						[{"entity_type": t, "entity_id": i, "count": delta} for (t, i), delta in deltas.items()]
+					)
+					stmt = stmt.on_conflict_do_update(
+						index_elements=[LikeCount.entity_type, LikeCount.entity_id],
+						set_={"count": LikeCount.count + stmt.excluded.count}
+					)
+					db.execute(stmt)
+				db.commit()
+			except Exception as e:
+				db.rollback()
+				logger.error("Like counts flush failed, deltas are kept in buffer", exc_info=e)
+				self._requeue(changes)
+				return 0
+			finally:
+				db.close()
+			return len(deltas)
+
+	def _ensure_flusher(self) -> None:
+		"""Фоновый поток, который сбрасывает буфер раз в flush_interval секунд"""
+		if self.flush_interval is None or self._flusher is not None and self._flusher.is_alive():
+			return
+		with self._lock:
+			if self._flusher is None or not self._flusher.is_alive():
+				self._flusher = Thread(target=self._flush_periodically, name="like-count-flusher", daemon=True)
+				self._flusher.start()
+
+	def _flush_periodically(self) -> None:
+		while True:
+			time.sleep(self.flush_interval)
+			self.flush()
+
+
+like_counts_buffer = LikeCountAggregator(
+	flush_size=settings.LIKE_COUNT_FLUSH_SIZE,
+	flush_interval=settings.LIKE_COUNT_FLUSH_INTERVAL,
+	session_factory=SessionLocal
+)
+
+
+def reconcile(db: Session) -> None:
+	"""Пересчитываем like_counts по таблице likes под эксклюзивным advisory lock: ждем начатые лайки и flush.
+	У каждого счетчика записываем reconciled_at - момент снимка likes. Изменения, которые в этот момент
+	еще лежат в буферах процессов, уже посчитаны здесь, и flush их пропустит по reconciled_at."""
+	db.execute(select(func.pg_advisory_xact_lock(LIKE_COUNTS_LOCK)))
+	# statement_timestamp() - начало запроса, с него же берется снимок данных в READ COMMITTED
+	snapshot_at = db_utcnow()
+	actual = select(Likes.entity_type, Likes.entity_id, func.count("*"), snapshot_at).\
+		group_by(Likes.entity_type, Likes.entity_id)
+	stmt = insert(LikeCount).from_select(["entity_type", "entity_id", "count", "reconciled_at"], actual)
+	stmt = stmt.on_conflict_do_update(
+		index_elements=[LikeCount.entity_type, LikeCount.entity_id],
+		set_={"count": stmt.excluded.count, "reconciled_at": stmt.excluded.reconciled_at}
+	)
+	db.execute(stmt)
+	has_likes = exists().where(
+		and_(Likes.entity_type == LikeCount.entity_type, Likes.entity_id == LikeCount.entity_id)
+	)
+	db.execute(update(LikeCount).where(~has_likes).values(count=0, reconciled_at=snapshot_at))
+	db.commit()
+
+
+@celery.task
+def reconcile_like_counts() -> None:
+	"""Периодическая сверка счетчиков лайков"""
+	like_counts_buffer.flush()
+	db = SessionLocal()
+	try:
+		reconcile(db)
+		logger.info("Like counts reconciled")
+	finally:
+		db.close()
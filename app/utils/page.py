@@ -1,5 +1,8 @@
+import base64
+import binascii
+from datetime import datetime
 from math import ceil
-from typing import Dict
+from typing import Dict, Tuple
 
 from fastapi import HTTPException, status
 
@@ -10,11 +13,17 @@ def page_dict(
 		*,
 		page: int,
 		size: int,
-		total_posts: int
-) -> Dict[str, int]:
-	"""Рассчитываем общее количество страниц, возвращаю словарь с ключами для модели"""
+		total_posts: int | None = None,
+		has_next: bool | None = None,
+		strict: bool = True
+) -> Dict[str, int | bool | None]:
+	"""Рассчитываем общее количество страниц, возвращаю словарь с ключами для модели.
+	Если total_posts не передан (total_mode=none), то возвращаем только has_next.
+	strict=False отключает проверку номера страницы, нужен когда total приблизительный."""
+	if total_posts is None:
+		return {"total": None, "page": page, "size": size, "pages": None, "has_next": has_next}
 	pages = ceil(total_posts / size)
-	if page > pages:
+	if strict and page > pages:
 		error_response = ErrorResponse(
 			loc="page",
 			msg="Page number is greater than possible.",
@@ -28,5 +37,46 @@ def page_dict(
 		"total": total_posts,
 		"page": page,
 		"size": size,
-		"pages": pages
+		"pages": pages,
+		"has_next": page < pages if has_next is None else has_next
 	}
+
+
+def encode_cursor(created_at: datetime, id_: int) -> str:
+	"""Упаковываем ключ (created_at, id) последнего элемента страницы в непрозрачную строку"""
+	raw = f"{created_at.isoformat()}|{id_}".encode()
+	return base64.urlsafe_b64encode(raw).decode()
+
+
+def _invalid_cursor() -> HTTPException:
+	error_response = ErrorResponse(
+		loc="cursor",
+		msg="Invalid cursor.",
+		type="value_error"
+	)
+	return HTTPException(
+		status_code=status.HTTP_400_BAD_REQUEST,
+		detail=[error_response.model_dump()]
+	)
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+	"""Распаковываем курсор обратно в (created_at, id). Если курсор битый, то будет исключение."""
+	try:
+		created_at, id_ = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+		return datetime.fromisoformat(created_at), int(id_)
+	except (binascii.Error, UnicodeDecodeError, ValueError):
+		raise _invalid_cursor()
+
+
+def encode_id_cursor(id_: int) -> str:
+	"""Курсор для списков, упорядоченных только по id"""
+	return base64.urlsafe_b64encode(str(id_).encode()).decode()
+
+
+def decode_id_cursor(cursor: str) -> int:
+	"""Распаковываем курсор из encode_id_cursor. Если курсор битый, то будет исключение."""
+	try:
+		return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+	except (binascii.Error, UnicodeDecodeError, ValueError):
+		raise _invalid_cursor()
@@ -0,0 +1,103 @@
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Tuple
+
+from fastapi import Request, Response
+from prometheus_client import Counter as CounterMetric, Histogram
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+queries_per_request = Histogram(
+	"db_queries_per_request", "SQL statements per request by endpoint", ["endpoint"],
+	buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500)
+)
+db_time_per_request = Histogram(
+	"db_time_per_request_seconds", "Time spent in SQL per request by endpoint", ["endpoint"]
+)
+n_plus_one_requests = CounterMetric(
+	"db_n_plus_one_requests_total", "Requests that repeated one statement more than N_PLUS_ONE_THRESHOLD times",
+	["endpoint"]
+)
+
+
+class QueryStats:
+	"""Запросы к бд в рамках одного http запроса: сколько, сколько времени и сколько раз повторялся
+	каждый текст запроса (параметры в тексте - плейсхолдеры, поэтому одинаковый текст = одна форма запроса)"""
+
+	def __init__(self, scope: dict | None = None) -> None:
+		self.scope = scope if scope is not None else {}
+		self.count = 0
+		self.duration = 0.0
+		self.shapes: Counter[str] = Counter()
+
+	def add(self, statement: str, duration: float) -> None:
+		self.count += 1
+		self.duration += duration
+		self.shapes[statement] += 1
+
+	@property
+	def endpoint(self) -> str:
+		"""Шаблон пути эндпоинта (/api/v1/post/{post_id}), а не сам путь, чтобы не плодить метки"""
+		route = self.scope.get("route")
+		if route is not None:
+			return f"{self.scope.get('method', '')} {route.path}"
+		return "unmatched"
+
+	def most_repeated(self) -> Tuple[str, int]:
+		"""Самый повторяющийся запрос и число повторов"""
+		if not self.shapes:
+			return "", 0
+		return self.shapes.most_common(1)[0]
+
+
+# статистика текущего запроса; None вне http запроса (celery, скрипты)
+current_query_stats: ContextVar[QueryStats | None] = ContextVar("current_query_stats", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+	conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+	duration = time.perf_counter() - conn.info["query_start"].pop()
+	stats = current_query_stats.get()
+	if stats is not None:
+		stats.add(statement, duration)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context) -> None:
+	# after_cursor_execute при ошибке не вызывается
+	if context.connection is not None and context.connection.info.get("query_start"):
+		context.connection.info["query_start"].pop()
+
+
+async def query_stats_middleware(request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
+	"""Считаем запросы к бд за http запрос. С DEBUG - заголовки X-DB-*, иначе метрики.
+	Если один запрос повторился больше N_PLUS_ONE_THRESHOLD раз, то пишем предупреждение (похоже на N+1)."""
+	stats = QueryStats(request.scope)
+	token = current_query_stats.set(stats)
+	try:
+		response = await call_next(request)
+	finally:
+		current_query_stats.reset(token)
+	statement, repeats = stats.most_repeated()
+	if repeats > settings.N_PLUS_ONE_THRESHOLD:
+		n_plus_one_requests.labels(endpoint=stats.endpoint).inc()
+		logger.warning(f"Possible N+1 in {stats.endpoint}: statement repeated {repeats} times: {statement[:300]}")
+	if settings.DEBUG:
+		response.headers["X-DB-Query-Count"] = str(stats.count)
+		response.headers["X-DB-Query-Time"] = f"{stats.duration * 1000:.1f}ms"
+		response.headers["X-DB-Query-Max-Repeats"] = str(repeats)
+	elif stats.count:
+		queries_per_request.labels(endpoint=stats.endpoint).observe(stats.count)
+		db_time_per_request.labels(endpoint=stats.endpoint).observe(stats.duration)
+	return response
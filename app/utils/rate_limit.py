@@ -0,0 +1,159 @@
+import ipaddress
+import math
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Annotated, List, Tuple
+
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import OAuth2PasswordRequestForm
+from prometheus_client import Counter
+
+from app.core.config import settings
+
+rate_limit_requests = Counter(
+	"rate_limit_requests_total", "Rate limited requests by limiter and result", ["limiter", "result"]
+)
+
+
+def parse_rate(rate: str) -> Tuple[int, float]:
+	"""'20/60' -> (20, 60.0): не больше 20 запросов подряд, корзина полностью восполняется за 60 секунд"""
+	capacity, period = rate.split("/")
+	return int(capacity), float(period)
+
+
+class InMemoryBackend:
+	"""Корзины в памяти процесса (у каждого воркера свои). Хранится не больше max_keys ключей,
+	давно не использованные вытесняются."""
+
+	def __init__(self, *, max_keys: int = 100000) -> None:
+		self.max_keys = max_keys
+		self._buckets: OrderedDict[str, Tuple[float, float]] = OrderedDict()
+		self._lock = Lock()
+
+	def take(self, key: str, *, capacity: int, period: float) -> float:
+		"""Забираем один токен из корзины key. Возвращает 0, если токен был, иначе сколько секунд ждать"""
+		rate = capacity / period
+		now = time.monotonic()
+		with self._lock:
+			tokens, updated = self._buckets.pop(key, (capacity, now))
+			tokens = min(capacity, tokens + (now - updated) * rate)
+			retry_after = 0.0
+			if tokens >= 1:
+				tokens -= 1
+			else:
+				retry_after = (1 - tokens) / rate
+			self._buckets[key] = (tokens, now)
+			if len(self._buckets) > self.max_keys:
+				self._buckets.popitem(last=False)
+			return retry_after
+
+
+class RedisBackend:
+	"""Корзины в Redis, общие для всех воркеров. Списание атомарно в Lua скрипте, время берется у Redis."""
+
+	SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local rate = capacity / period
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + (now - updated) * rate)
+local retry_after = 0
+if tokens >= 1 then
+	tokens = tokens - 1
+else
+	retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(period))
+return tostring(retry_after)
+"""
+
+	def __init__(self, url: str) -> None:
+		# redis нужен только с RATE_LIMIT_REDIS_URL
+		import redis
+		self._client = redis.Redis.from_url(url)
+		self._script = self._client.register_script(self.SCRIPT)
+
+	def take(self, key: str, *, capacity: int, period: float) -> float:
+		return float(self._script(keys=[f"rate_limit:{key}"], args=[capacity, period]))
+
+
+class RateLimiter:
+	"""Token bucket: capacity запросов подряд, дальше по одному запросу каждые period / capacity секунд"""
+
+	def __init__(self, name: str, rate: str, backend: InMemoryBackend | RedisBackend) -> None:
+		self.name = name
+		self.capacity, self.period = parse_rate(rate)
+		self.backend = backend
+
+	def hit(self, key: str) -> None:
+		"""Списываем запрос с корзины key. Если корзина пуста, то будет исключение 429 с Retry-After"""
+		if not settings.RATE_LIMIT_ENABLED:
+			return
+		retry_after = self.backend.take(f"{self.name}:{key}", capacity=self.capacity, period=self.period)
+		if retry_after <= 0:
+			rate_limit_requests.labels(limiter=self.name, result="allowed").inc()
+			return
+		rate_limit_requests.labels(limiter=self.name, result="limited").inc()
+		raise HTTPException(
+			status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+			detail="Too many requests, try again later",
+			headers={"Retry-After": str(math.ceil(retry_after))}
+		)
+
+
+backend = RedisBackend(settings.RATE_LIMIT_REDIS_URL) if settings.RATE_LIMIT_REDIS_URL else InMemoryBackend()
+login_ip_limiter = RateLimiter("login_ip", settings.RATE_LIMIT_LOGIN_IP, backend)
+login_account_limiter = RateLimiter("login_account", settings.RATE_LIMIT_LOGIN_ACCOUNT, backend)
+recovery_ip_limiter = RateLimiter("recovery_ip", settings.RATE_LIMIT_RECOVERY_IP, backend)
+recovery_account_limiter = RateLimiter("recovery_account", settings.RATE_LIMIT_RECOVERY_ACCOUNT, backend)
+
+
+def parse_networks(addresses: List[str]) -> List[ipaddress.IPv4Network | ipaddress.IPv6Network]:
+	"""'10.0.0.1', '10.0.0.0/8' -> подсети"""
+	return [ipaddress.ip_network(address.strip(), strict=False) for address in addresses]
+
+
+trusted_proxies = parse_networks(settings.RATE_LIMIT_TRUSTED_PROXIES)
+
+
+def _is_trusted(address: str, proxies: List[ipaddress.IPv4Network | ipaddress.IPv6Network]) -> bool:
+	try:
+		ip = ipaddress.ip_address(address)
+	except ValueError:
+		return False
+	return any(ip in network for network in proxies)
+
+
+def client_ip(request: Request, proxies: List[ipaddress.IPv4Network | ipaddress.IPv6Network]) -> str:
+	"""IP клиента для корзины. Если запрос пришел от доверенного proxy, то идем по X-Forwarded-For справа
+	налево и берем первый адрес не из proxies: левее него адреса мог подставить сам клиент"""
+	host = request.client.host if request.client else "unknown"
+	if not proxies or not _is_trusted(host, proxies):
+		return host
+	forwarded = [a.strip() for h in request.headers.getlist("x-forwarded-for") for a in h.split(",") if a.strip()]
+	for address in reversed(forwarded):
+		if not _is_trusted(address, proxies):
+			return address
+	return forwarded[0] if forwarded else host
+
+
+def _client_ip(request: Request) -> str:
+	return client_ip(request, trusted_proxies)
+
+
+def limit_login(request: Request, form_data: Annotated[OAuth2PasswordRequestForm, Depends()]) -> None:
+	"""Зависимость для /login: лимит по IP и по аккаунту до проверки пароля"""
+	login_ip_limiter.hit(_client_ip(request))
+	login_account_limiter.hit(form_data.username.lower())
+
+
+def limit_password_recovery(request: Request, email: str) -> None:
+	"""Зависимость для /password-recovery/{email}: лимит по IP и по адресу до отправки письма"""
+	recovery_ip_limiter.hit(_client_ip(request))
+	recovery_account_limiter.hit(email.lower())
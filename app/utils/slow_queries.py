@@ -0,0 +1,174 @@
+import json
+import logging
+import random
+import re
+import time
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from queue import Full, Queue
+from threading import Lock, Thread
+
+from prometheus_client import Counter
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.utils.query_stats import current_query_stats
+
+logger = logging.getLogger(__name__)
+
+slow_queries = Counter("db_slow_queries_total", "Statements slower than SLOW_QUERY_THRESHOLD by result", ["result"])
+
+
+# то, что меняет состояние при повторном выполнении: DML (в том числе в CTE), блокировки строк
+# (FOR UPDATE/NO KEY UPDATE/SHARE/KEY SHARE), advisory lock, последовательности и прочие функции с эффектами
+SIDE_EFFECTS = re.compile(
+	r"\b(INSERT|UPDATE|DELETE|MERGE|SHARE|NEXTVAL|SETVAL|SET_CONFIG|PG_\w*LOCK\w*|PG_NOTIFY|"
+	r"PG_CANCEL_BACKEND|PG_TERMINATE_BACKEND|LO_\w+|DBLINK\w*)\b",
+	re.IGNORECASE
+)
+
+
+def is_side_effect_free(statement: str, context) -> bool:
+	"""EXPLAIN ANALYZE выполняет запрос, поэтому повторять можно только чтение без эффектов. Проверка
+	по тексту консервативная: любое слово из SIDE_EFFECTS, даже внутри строки, - отказ"""
+	if context is not None and (context.isinsert or context.isupdate or context.isdelete):
+		return False
+	words = statement.lstrip().split(None, 1)
+	return bool(words) and words[0].upper() in ("SELECT", "WITH") and not SIDE_EFFECTS.search(statement)
+
+
+class SlowQueryLog:
+	"""Журнал медленных запросов: JSON строки в ротируемом файле. Обработчик запроса только кладет запись
+	в очередь, запись в файл и EXPLAIN делает фоновый поток. План снимается для доли sample_rate записей:
+	EXPLAIN без ANALYZE. EXPLAIN (ANALYZE, BUFFERS) - только с analyze и только для чтения без эффектов,
+	в read only транзакции."""
+
+	def __init__(
+			self,
+			*,
+			path: str,
+			threshold: float,
+			sample_rate: float,
+			explain_timeout_ms: int,
+			log_parameters: bool,
+			analyze: bool = False,
+			max_bytes: int,
+			backup_count: int,
+			queue_size: int = 1000
+	) -> None:
+		self.threshold = threshold
+		self.sample_rate = sample_rate
+		self.explain_timeout_ms = explain_timeout_ms
+		self.log_parameters = log_parameters
+		self.analyze = analyze
+		self._file_logger = logging.getLogger(f"{__name__}.file")
+		self._file_logger.propagate = False
+		self._file_logger.setLevel(logging.INFO)
+		self._handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count)
+		self._file_logger.addHandler(self._handler)
+		self._queue: Queue = Queue(maxsize=queue_size)
+		self._lock = Lock()
+		self._writer: Thread | None = None
+
+	def install(self) -> None:
+		"""Слушаем все движки"""
+		event.listen(Engine, "before_cursor_execute", self._before_cursor_execute)
+		event.listen(Engine, "after_cursor_execute", self._after_cursor_execute)
+		event.listen(Engine, "handle_error", self._handle_error)
+
+	def uninstall(self) -> None:
+		event.remove(Engine, "before_cursor_execute", self._before_cursor_execute)
+		event.remove(Engine, "after_cursor_execute", self._after_cursor_execute)
+		event.remove(Engine, "handle_error", self._handle_error)
+		self._file_logger.removeHandler(self._handler)
+		self._handler.close()
+
+	def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+		conn.info.setdefault("slow_query_start", []).append(time.perf_counter())
+
+	def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+		duration = time.perf_counter() - conn.info["slow_query_start"].pop()
+		if duration < self.threshold or conn.info.get("slow_query_explain"):
+			return
+		stats = current_query_stats.get()
+		entry = {
+			"time": datetime.now(timezone.utc).isoformat(),
+			"duration_ms": round(duration * 1000, 1),
+			"endpoint": stats.endpoint if stats is not None else None,
+			"statement": statement,
+			"parameters": parameters if self.log_parameters else None
+		}
+		explain = not executemany and conn.dialect.name == "postgresql" and random.random() < self.sample_rate
+		analyze = self.analyze and is_side_effect_free(statement, context)
+		self.record(entry, conn.engine if explain else None, analyze)
+
+	def _handle_error(self, context) -> None:
+		if context.connection is not None and context.connection.info.get("slow_query_start"):
+			context.connection.info["slow_query_start"].pop()
+
+	def record(self, entry: dict, engine: Engine | None = None, analyze: bool = False) -> None:
+		"""Ставим запись в очередь. Если очередь переполнена, то запись теряется, запрос не ждет"""
+		self._ensure_writer()
+		try:
+			self._queue.put_nowait((entry, engine, analyze))
+			slow_queries.labels(result="queued").inc()
+		except Full:
+			slow_queries.labels(result="dropped").inc()
+
+	def _ensure_writer(self) -> None:
+		if self._writer is not None and self._writer.is_alive():
+			return
+		with self._lock:
+			if self._writer is None or not self._writer.is_alive():
+				self._writer = Thread(target=self._write_forever, name="slow-query-log", daemon=True)
+				self._writer.start()
+
+	def _write_forever(self) -> None:
+		while True:
+			entry, engine, analyze = self._queue.get()
+			try:
+				if engine is not None:
+					entry["plan"] = self.explain(engine, entry["statement"], entry["parameters"], analyze=analyze)
+				self._file_logger.info(json.dumps(entry, default=str, ensure_ascii=False))
+			except Exception as e:
+				logger.error("Slow query log write failed", exc_info=e)
+			finally:
+				self._queue.task_done()
+
+	def explain(self, engine: Engine, statement: str, parameters, *, analyze: bool):
+		"""План запроса в JSON. Выполняется на отдельном соединении с statement_timeout, транзакция
+		откатывается. С analyze транзакция read only: запись в ней бд не даст сделать"""
+		options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+		with engine.connect() as connection:
+			connection.info["slow_query_explain"] = True
+			try:
+				if analyze:
+					connection.exec_driver_sql("SET TRANSACTION READ ONLY")
+				connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(self.explain_timeout_ms)}")
+				return connection.exec_driver_sql(f"EXPLAIN ({options}) {statement}", parameters or ()).scalar()
+			finally:
+				connection.rollback()
+				connection.info.pop("slow_query_explain", None)
+
+	def join(self) -> None:
+		"""Ждем, пока очередь будет записана"""
+		self._queue.join()
+
+
+def install() -> SlowQueryLog | None:
+	"""Включаем журнал медленных запросов, если задан SLOW_QUERY_LOG_FILE"""
+	if not settings.SLOW_QUERY_LOG_FILE:
+		return None
+	log = SlowQueryLog(
+		path=settings.SLOW_QUERY_LOG_FILE,
+		threshold=settings.SLOW_QUERY_THRESHOLD,
+		sample_rate=settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE,
+		explain_timeout_ms=settings.SLOW_QUERY_EXPLAIN_TIMEOUT_MS,
+		log_parameters=settings.SLOW_QUERY_LOG_PARAMETERS,
+		analyze=settings.SLOW_QUERY_EXPLAIN_ANALYZE,
+		max_bytes=settings.SLOW_QUERY_LOG_MAX_BYTES,
+		backup_count=settings.SLOW_QUERY_LOG_BACKUP_COUNT
+	)
+	log.install()
+	return log
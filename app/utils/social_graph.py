@@ -0,0 +1,219 @@
+import logging
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from threading import Lock, Thread
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+
+from prometheus_client import Gauge
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.users import following
+
+logger = logging.getLogger(__name__)
+
+Edge = Tuple[int, int]
+
+
+class CSRGraph:
+	"""Неизменяемый снимок графа подписок в CSR виде: sources - отсортированные id пользователей, у которых
+	есть подписки, targets[offsets[i]:offsets[i + 1]] - отсортированные id тех, на кого подписан sources[i].
+	Три плоских массива int вместо dict/set на каждого пользователя."""
+
+	def __init__(self, sources: array, offsets: array, targets: array) -> None:
+		self.sources = sources
+		self.offsets = offsets
+		self.targets = targets
+
+	@classmethod
+	def from_sorted_edges(cls, edges: Iterable[Edge]) -> "CSRGraph":
+		"""Строим граф за один проход по ребрам (кто, на кого), отсортированным по (кто, на кого)"""
+		sources, offsets, targets = array("i"), array("q", [0]), array("i")
+		last_source = last_target = None
+		for source, target in edges:
+			if source != last_source:
+				if last_source is not None:
+					offsets.append(len(targets))
+				sources.append(source)
+				last_source, last_target = source, None
+			if target != last_target:
+				targets.append(target)
+				last_target = target
+		if last_source is not None:
+			offsets.append(len(targets))
+		return cls(sources, offsets, targets)
+
+	def _range(self, user_id: int) -> Tuple[int, int]:
+		i = bisect_left(self.sources, user_id)
+		if i == len(self.sources) or self.sources[i] != user_id:
+			return 0, 0
+		return self.offsets[i], self.offsets[i + 1]
+
+	def following(self, user_id: int) -> array:
+		start, end = self._range(user_id)
+		return self.targets[start:end]
+
+	def is_following(self, user_id: int, other_id: int) -> bool:
+		start, end = self._range(user_id)
+		i = bisect_left(self.targets, other_id, start, end)
+		return i < end and self.targets[i] == other_id
+
+	@property
+	def edge_count(self) -> int:
+		return len(self.targets)
+
+	@property
+	def nbytes(self) -> int:
+		return sum(a.itemsize * len(a) for a in (self.sources, self.offsets, self.targets))
+
+
+class SocialGraphCache:
+	"""Кэш графа подписок в памяти воркера. Снимок CSRGraph плюс overlay из подписок/отписок, которые
+	пришли после снимка. follow/unfollow этого воркера сразу попадают в overlay. Остальные процессы
+	(другие воркеры uvicorn, celery) между собой не синхронизируются: чужая подписка/отписка видна
+	только после их refresh, то есть до refresh_interval секунд лента и is_following в них могут
+	быть устаревшими. Если такое отставание недопустимо, SOCIAL_GRAPH_CACHE нужно выключить."""
+
+	def __init__(self, *, refresh_interval: float, session_factory: Callable[[], Session]) -> None:
+		self.refresh_interval = refresh_interval
+		self._session_factory = session_factory
+		self._graph = CSRGraph.from_sorted_edges([])
+		self._added: Dict[int, Set[int]] = defaultdict(set)
+		self._removed: Dict[int, Set[int]] = defaultdict(set)
+		# события, пришедшие во время refresh; после загрузки снимка переносятся в новый overlay
+		self._pending: List[Tuple[Edge, bool]] | None = None
+		self._loaded = False
+		self._lock = Lock()
+		self._refresh_lock = Lock()
+		self._refresher: Thread | None = None
+
+	@staticmethod
+	def load_edges(db: Session) -> Iterable[Edge]:
+		"""Ребра (кто, на кого) из following. Строка (follower_id=A, followed_id=B) - B подписан на A,
+		порядок (followed_id, follower_id) совпадает с индексом ix_following_followed_id_follower_id"""
+		stmt = select(following.c.followed_id, following.c.follower_id).\
+			order_by(following.c.followed_id, following.c.follower_id).execution_options(yield_per=10000)
+		return db.execute(stmt)
+
+	def refresh(self, db: Session | None = None) -> None:
+		"""Загружаем новый снимок графа и заменяем им старый"""
+		with self._refresh_lock:
+			with self._lock:
+				self._pending = []
+			close = db is None
+			db = self._session_factory() if db is None else db
+			try:
+				graph = CSRGraph.from_sorted_edges(self.load_edges(db))
+			except Exception:
+				with self._lock:
+					self._pending = None
+				raise
+			finally:
+				if close:
+					db.close()
+			with self._lock:
+				pending, self._pending = self._pending, None
+				self._graph = graph
+				self._added, self._removed = defaultdict(set), defaultdict(set)
+				for (user_id, other_id), add in pending:
+					self._apply(user_id, other_id, add)
+				self._loaded = True
+
+	def _apply(self, user_id: int, other_id: int, add: bool) -> None:
+		if add:
+			self._removed[user_id].discard(other_id)
+			if not self._graph.is_following(user_id, other_id):
+				self._added[user_id].add(other_id)
+		else:
+			self._added[user_id].discard(other_id)
+			if self._graph.is_following(user_id, other_id):
+				self._removed[user_id].add(other_id)
+
+	def _event(self, user_id: int, other_id: int, add: bool) -> None:
+		with self._lock:
+			self._apply(user_id, other_id, add)
+			if self._pending is not None:
+				self._pending.append(((user_id, other_id), add))
+
+	def follow(self, user_id: int, other_id: int) -> None:
+		"""user_id подписался на other_id"""
+		self._event(user_id, other_id, True)
+
+	def unfollow(self, user_id: int, other_id: int) -> None:
+		"""user_id отписался от other_id"""
+		self._event(user_id, other_id, False)
+
+	def _ensure_loaded(self) -> None:
+		"""Первая загрузка снимка и запуск фонового обновления"""
+		if not self._loaded:
+			with self._refresh_lock:
+				loaded = self._loaded
+			if not loaded:
+				self.refresh()
+		if self._refresher is None or not self._refresher.is_alive():
+			with self._lock:
+				if self._refresher is None or not self._refresher.is_alive():
+					self._refresher = Thread(
+						target=self._refresh_periodically, name="social-graph-refresh", daemon=True
+					)
+					self._refresher.start()
+
+	def _refresh_periodically(self) -> None:
+		while True:
+			time.sleep(self.refresh_interval)
+			try:
+				self.refresh()
+			except Exception as e:
+				logger.error("Social graph refresh failed, keeping previous snapshot", exc_info=e)
+
+	def following(self, user_id: int) -> List[int]:
+		"""Отсортированные id пользователей, на которых подписан user_id"""
+		self._ensure_loaded()
+		with self._lock:
+			ids = self._graph.following(user_id)
+			added, removed = self._added.get(user_id), self._removed.get(user_id)
+			if not added and not removed:
+				return ids.tolist()
+			return sorted((set(ids) | added) - removed) if added else [i for i in ids if i not in removed]
+
+	def is_following(self, user_id: int, other_id: int) -> bool:
+		"""Подписан ли user_id на other_id"""
+		self._ensure_loaded()
+		with self._lock:
+			if other_id in self._added.get(user_id, ()):
+				return True
+			if other_id in self._removed.get(user_id, ()):
+				return False
+			return self._graph.is_following(user_id, other_id)
+
+	@property
+	def edge_count(self) -> int:
+		with self._lock:
+			added = sum(map(len, self._added.values()))
+			return self._graph.edge_count + added - sum(map(len, self._removed.values()))
+
+	@property
+	def nbytes(self) -> int:
+		"""Примерный объем памяти: массивы снимка плюс set'ы overlay"""
+		with self._lock:
+			overlay = sum(
+				sys.getsizeof(s) + 28 * len(s)
+				for d in (self._added, self._removed) for s in d.values()
+			)
+			return self._graph.nbytes + overlay
+
+
+social_graph = SocialGraphCache(
+	refresh_interval=settings.SOCIAL_GRAPH_REFRESH_INTERVAL,
+	session_factory=SessionLocal
+)
+
+graph_bytes = Gauge("social_graph_bytes", "Approximate memory used by the in-process follow graph")
+graph_bytes.set_function(lambda: social_graph.nbytes)
+graph_edges = Gauge("social_graph_edges", "Follow edges in the in-process follow graph")
+graph_edges.set_function(lambda: social_graph.edge_count)
@@ -0,0 +1,71 @@
+import heapq
+import random
+from collections import Counter
+from typing import List, Tuple
+
+from celery.utils.log import get_task_logger
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.celery_app import celery
+from app.core.config import settings
+from app.crud.crud_suggestion import suggestion
+from app.db.session import SessionLocal
+from app.models.users import Users
+from app.utils.social_graph import CSRGraph, SocialGraphCache
+
+logger = get_task_logger(__name__)
+
+
+def friends_of_friends(graph: CSRGraph, user_id: int, *, top_k: int, max_fanout: int) -> List[Tuple[int, int]]:
+	"""top_k пар (suggested_id, score): пользователи, на которых подписаны те, на кого подписан user_id.
+	score - число таких общих связей. Уже отслеживаемые и сам user_id исключаются. У каждого промежуточного
+	пользователя берется не больше max_fanout подписок, чтобы один "подписан на всех" не взорвал подсчет.
+	Подписки выбираются случайно, а не первые по id, иначе рекомендации смещаются к старым аккаунтам.
+	Выборка детерминирована для пары (user_id, middle_id), так что пересчет дает тот же результат."""
+	followed = graph.following(user_id)
+	if not followed:
+		return []
+	scores = Counter()
+	for middle_id in followed:
+		middle_following = graph.following(middle_id)
+		if len(middle_following) > max_fanout:
+			middle_following = random.Random(f"{user_id}:{middle_id}").sample(middle_following, max_fanout)
+		scores.update(middle_following)
+	exclude = set(followed)
+	exclude.add(user_id)
+	candidates = ((suggested_id, score) for suggested_id, score in scores.items() if suggested_id not in exclude)
+	return heapq.nlargest(top_k, candidates, key=lambda item: (item[1], -item[0]))
+
+
+def compute(db: Session, *, batch_size: int = 1000) -> int:
+	"""Пересчитываем рекомендации всех пользователей. Граф подписок загружается один раз в CSR виде,
+	дальше работа линейна по числу двухшаговых путей в графе, без запросов на каждого пользователя.
+	Результат пишется пачками по batch_size пользователей. Возвращает число записанных строк."""
+	graph = CSRGraph.from_sorted_edges(SocialGraphCache.load_edges(db))
+	written = 0
+	last_id = 0
+	while True:
+		user_ids = db.execute(
+			select(Users.id).where(Users.id > last_id).order_by(Users.id).limit(batch_size)
+		).scalars().all()
+		if not user_ids:
+			return written
+		written += suggestion.replace(db, suggestions={
+			user_id: friends_of_friends(
+				graph, user_id, top_k=settings.SUGGESTIONS_TOP_K, max_fanout=settings.SUGGESTIONS_MAX_FANOUT
+			)
+			for user_id in user_ids
+		})
+		last_id = user_ids[-1]
+
+
+@celery.task
+def compute_user_suggestions() -> None:
+	"""Периодический пересчет рекомендаций"""
+	db = SessionLocal()
+	try:
+		written = compute(db)
+		logger.info(f"User suggestions computed, {written} rows written")
+	finally:
+		db.close()
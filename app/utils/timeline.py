@@ -0,0 +1,50 @@
+from celery.utils.log import get_task_logger
+
+from app.core.celery_app import celery
+from app.crud.crud_timeline import timeline
+from app.db.session import SessionLocal
+
+
+logger = get_task_logger(__name__)
+
+
+@celery.task
+def fan_out_post(post_id: int) -> None:
+	"""Раскладываем новый пост по лентам подписчиков автора"""
+	db = SessionLocal()
+	try:
+		inserted = timeline.fan_out(db, post_id=post_id)
+		logger.info(f"post {post_id} fanned out to {inserted} timelines")
+	finally:
+		db.close()
+
+
+@celery.task
+def add_author_to_timeline(owner_id: int, author_id: int) -> None:
+	"""owner_id подписался на author_id - добавляем его последние посты в ленту"""
+	db = SessionLocal()
+	try:
+		timeline.add_author(db, owner_id=owner_id, author_id=author_id)
+	finally:
+		db.close()
+
+
+@celery.task
+def add_author_to_followers(author_id: int) -> None:
+	"""author_id перестал быть знаменитостью - раскладываем его последние посты по лентам подписчиков"""
+	db = SessionLocal()
+	try:
+		inserted = timeline.add_author_to_followers(db, author_id=author_id)
+		logger.info(f"author {author_id} backfilled into {inserted} timeline rows")
+	finally:
+		db.close()
+
+
+@celery.task
+def remove_author_from_timeline(owner_id: int, author_id: int) -> None:
+	"""owner_id отписался от author_id - убираем его посты из ленты"""
+	db = SessionLocal()
+	try:
+		timeline.remove_author(db, owner_id=owner_id, author_id=author_id)
+	finally:
+		db.close()
@@ -0,0 +1,55 @@
+"""Пропускная способность sync и async эндпоинтов под нагрузкой.
+
+Нужен запущенный сервер с ASYNC_POST_ENDPOINTS=true, заполненная бд и access token:
+	python -m benchmarks.async_endpoints --base-url http://localhost:8002/api/v1 --token ... --post-id 1
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+
+async def measure_rps(client: httpx.AsyncClient, url: str, *, requests: int, concurrency: int) -> float:
+	"""Запросов в секунду при concurrency одновременных клиентах, ошибки не считаются"""
+	queue = iter(range(requests))
+	ok = 0
+
+	async def worker() -> None:
+		nonlocal ok
+		for _ in queue:
+			response = await client.get(url)
+			ok += response.status_code == 200
+
+	start = time.perf_counter()
+	await asyncio.gather(*(worker() for _ in range(concurrency)))
+	return ok / (time.perf_counter() - start)
+
+
+async def run(args: argparse.Namespace) -> None:
+	headers = {"Authorization": f"Bearer {args.token}"}
+	limits = httpx.Limits(max_connections=args.concurrency)
+	paths = [
+		("feed", "/post/feed", "/async/post/feed"),
+		("post", f"/post/{args.post_id}", f"/async/post/{args.post_id}")
+	]
+	async with httpx.AsyncClient(base_url=args.base_url, headers=headers, limits=limits, timeout=60) as client:
+		print(f"{'endpoint':>10} {'sync rps':>10} {'async rps':>10}")
+		for name, sync_path, async_path in paths:
+			sync_rps = await measure_rps(client, sync_path, requests=args.requests, concurrency=args.concurrency)
+			async_rps = await measure_rps(client, async_path, requests=args.requests, concurrency=args.concurrency)
+			print(f"{name:>10} {sync_rps:>10.1f} {async_rps:>10.1f}")
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--base-url", default="http://localhost:8002/api/v1")
+	parser.add_argument("--token", required=True)
+	parser.add_argument("--post-id", type=int, required=True)
+	parser.add_argument("--requests", type=int, default=2000)
+	parser.add_argument("--concurrency", type=int, default=100)
+	asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,85 @@
+"""Загрузка ветки комментариев: старый путь (selectin по уровням) против WITH RECURSIVE.
+
+Запуск: python -m benchmarks.comment_thread --user-id 1 --comments 10000
+Создает пост с веткой из --comments комментариев (если не передан --post-id) и печатает время
+и количество запросов для обоих вариантов.
+"""
+import argparse
+import random
+import time
+
+from sqlalchemy import event, select
+
+from app.crud.crud_comment import comment
+from app.db.session import SessionLocal, engine
+from app.models.comment import Comment
+from app.models.post import Post
+from app.schemas.comment import CommentsDBOut
+
+
+def create_thread(*, user_id: int, size: int) -> int:
+	"""Пост и случайное дерево из size комментариев, каждый отвечает на один из предыдущих"""
+	db = SessionLocal()
+	try:
+		db_post = Post(content="benchmark thread", user_id=user_id)
+		db.add(db_post)
+		db.flush()
+		ids = []
+		for i in range(size):
+			parent_id = random.choice(ids) if ids and random.random() < 0.9 else None
+			db_comment = Comment(
+				text=f"comment {i}", user_id=user_id, parent_comment_id=parent_id,
+				commentable_type="Post", commentable_id=db_post.id
+			)
+			db.add(db_comment)
+			db.flush()
+			ids.append(db_comment.id)
+		db.commit()
+		return db_post.id
+	finally:
+		db.close()
+
+
+def measure(load) -> tuple[float, int]:
+	statements = []
+
+	def _count(*args) -> None:
+		statements.append(1)
+
+	db = SessionLocal()
+	event.listen(engine, "before_cursor_execute", _count)
+	try:
+		start = time.perf_counter()
+		CommentsDBOut.model_validate({"comments": load(db)})
+		return (time.perf_counter() - start) * 1000, len(statements)
+	finally:
+		event.remove(engine, "before_cursor_execute", _count)
+		db.close()
+
+
+def load_selectin(db, post_id: int):
+	"""Как было раньше: верхний уровень, остальное грузит lazy='selectin' по уровню за запрос"""
+	stmt = select(Comment).where(Comment.commentable_type == "Post", Comment.commentable_id == post_id,
+		Comment.parent_comment_id.is_(None))
+	return db.execute(stmt).scalars().all()
+
+
+def load_recursive(db, post_id: int):
+	return comment.get_object_comments(db, obj_to_comment=db.get(Post, post_id))
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--user-id", type=int, required=True)
+	parser.add_argument("--post-id", type=int)
+	parser.add_argument("--comments", type=int, default=10000)
+	args = parser.parse_args()
+
+	post_id = args.post_id or create_thread(user_id=args.user_id, size=args.comments)
+	for name, load in (("selectin", load_selectin), ("recursive cte", load_recursive)):
+		ms, statements = measure(lambda db: load(db, post_id))
+		print(f"{name:>14}: {ms:>10.2f} ms, {statements} statements")
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,50 @@
+"""Сравнение чтения ленты: join по following против материализованной таблицы timeline.
+
+Запуск (нужна заполненная бд, timeline заполняется через app.utils.backfill_timeline):
+	python -m benchmarks.feed_timeline --user-id 1 --pages 1 10 100
+"""
+import argparse
+import statistics
+import time
+
+from app.core.config import settings
+from app.crud.crud_post import post
+from app.db.session import SessionLocal
+
+
+def measure(*, user_id: int, page: int, size: int, repeat: int, from_timeline: bool) -> float:
+	"""Медиана времени (мс) чтения страницы ленты вместе с подсчетом total"""
+	settings.FEED_FROM_TIMELINE = from_timeline
+	db = SessionLocal()
+	timings = []
+	try:
+		for _ in range(repeat):
+			start = time.perf_counter()
+			post.get_all_feed(db, page=page, limit=size, id_=user_id)
+			post.count_feed_posts(db, user_id)
+			timings.append((time.perf_counter() - start) * 1000)
+			db.expunge_all()
+	finally:
+		db.close()
+	return statistics.median(timings)
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--user-id", type=int, required=True)
+	parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 100])
+	parser.add_argument("--size", type=int, default=10)
+	parser.add_argument("--repeat", type=int, default=20)
+	args = parser.parse_args()
+
+	print(f"{'page':>6} {'join, ms':>10} {'timeline, ms':>14}")
+	for page in args.pages:
+		join_ms = measure(user_id=args.user_id, page=page, size=args.size, repeat=args.repeat, from_timeline=False)
+		timeline_ms = measure(
+			user_id=args.user_id, page=page, size=args.size, repeat=args.repeat, from_timeline=True
+		)
+		print(f"{page:>6} {join_ms:>10.2f} {timeline_ms:>14.2f}")
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,35 @@
+"""Стоимость проверки access token на запрос: jwt.decode против verify_token с кэшем проверенных токенов.
+
+Бд не нужна:
+	python -m benchmarks.jwt_verify --repeat 100000
+"""
+import argparse
+import time
+
+from jose import jwt
+
+from app.core.config import settings
+from app.core.security import create_access_token, verify_token
+
+
+def measure_us(func, repeat: int) -> float:
+	"""Среднее время одного вызова в микросекундах"""
+	start = time.perf_counter()
+	for _ in range(repeat):
+		func()
+	return (time.perf_counter() - start) / repeat * 1_000_000
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--repeat", type=int, default=100_000)
+	args = parser.parse_args()
+
+	token = create_access_token(subject=1)
+	decode_us = measure_us(lambda: jwt.decode(token, settings.JWT_SECRET, settings.JWT_ALGORITHM), args.repeat)
+	cached_us = measure_us(lambda: verify_token(token), args.repeat)
+	print(f"jwt.decode: {decode_us:.2f} us, verify_token (cached): {cached_us:.2f} us, x{decode_us / cached_us:.1f}")
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,63 @@
+"""Граф подписок в памяти: CSR массивы против dict из set'ов на миллионе ребер.
+
+Бд не нужна, ребра генерируются случайно:
+	python -m benchmarks.social_graph --users 100000 --edges 1000000
+"""
+import argparse
+import random
+import statistics
+import time
+import tracemalloc
+
+from app.utils.social_graph import CSRGraph
+
+
+def measure_us(func, repeat: int) -> float:
+	"""Медиана времени одного вызова в микросекундах"""
+	timings = []
+	for _ in range(repeat):
+		start = time.perf_counter()
+		func()
+		timings.append((time.perf_counter() - start) * 1_000_000)
+	return statistics.median(timings)
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--users", type=int, default=100_000)
+	parser.add_argument("--edges", type=int, default=1_000_000)
+	parser.add_argument("--repeat", type=int, default=10_000)
+	parser.add_argument("--seed", type=int, default=0)
+	args = parser.parse_args()
+
+	rnd = random.Random(args.seed)
+	edges = sorted({(rnd.randint(1, args.users), rnd.randint(1, args.users)) for _ in range(args.edges)})
+	print(f"edges: {len(edges)}")
+
+	tracemalloc.start()
+	start = time.perf_counter()
+	graph = CSRGraph.from_sorted_edges(edges)
+	build_s = time.perf_counter() - start
+	_, csr_peak = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+
+	tracemalloc.start()
+	adjacency = {}
+	for source, target in edges:
+		adjacency.setdefault(source, set()).add(target)
+	dict_bytes, _ = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+
+	user_ids = [rnd.randint(1, args.users) for _ in range(args.repeat)]
+	pairs = [(rnd.randint(1, args.users), rnd.randint(1, args.users)) for _ in range(args.repeat)]
+	it_users, it_pairs = iter(user_ids * 2), iter(pairs * 2)
+
+	print(f"CSR build: {build_s:.2f} s, arrays: {graph.nbytes / 2 ** 20:.1f} MiB, "
+		f"peak while building: {csr_peak / 2 ** 20:.1f} MiB")
+	print(f"dict of sets: {dict_bytes / 2 ** 20:.1f} MiB")
+	print(f"following(x): {measure_us(lambda: graph.following(next(it_users)), args.repeat):.2f} us")
+	print(f"is_following(x, y): {measure_us(lambda: graph.is_following(*next(it_pairs)), args.repeat):.2f} us")
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,16 @@
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from tests.other_tools import get_random_email, get_random_password
+from tests.conftest import client, session
+
+
+def test_get_comments_unknown_image(client: TestClient) -> None:
+	email = get_random_email()
+	password = get_random_password()
+	client.post(f"{settings.API_V1_STR}/users/signup", json={"email": email, "password": password})
+	token = client.post(f"{settings.API_V1_STR}/login", data={"username": email, "password": password})
+	headers = {"Authorization": f"Bearer {token.json()['access_token']}"}
+	response = client.get(f"{settings.API_V1_STR}/image/{2 ** 31 - 1}/comments", headers=headers)
+	assert response.status_code == 404
+	assert response.json()["detail"][0]["loc"] == "image_id"
@@ -0,0 +1,62 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.crud.crud_user import user
+from app.crud.crud_post import post
+from app.schemas.post import PostDBCreate
+from tests.other_tools import get_random_email, get_random_password
+from tests.conftest import client, session
+
+
+@pytest.fixture(scope="module")
+def auth(client: TestClient, session) -> tuple:
+	"""Пользователь с тремя постами и заголовки с его токеном"""
+	email = get_random_email()
+	password = get_random_password()
+	response = client.post(f"{settings.API_V1_STR}/users/signup", json={"email": email, "password": password})
+	assert response.status_code == 201
+	token = client.post(f"{settings.API_V1_STR}/login", data={"username": email, "password": password})
+	headers = {"Authorization": f"Bearer {token.json()['access_token']}"}
+	db_user = user.get_by_email(session, email=email)
+	for i in range(3):
+		post.create(session, obj_in=PostDBCreate(content=f"post {i}", user_id=db_user.id))
+	return db_user, headers
+
+
+@pytest.mark.parametrize("total_mode", ["exact", "estimate", "none"])
+def test_get_user_posts_total_mode(client: TestClient, auth, total_mode) -> None:
+	db_user, headers = auth
+	response = client.get(
+		f"{settings.API_V1_STR}/post/get-posts/{db_user.id}",
+		params={"page": 1, "size": 2, "total_mode": total_mode},
+		headers=headers
+	)
+	assert response.status_code == 200
+	data = response.json()
+	assert len(data["items"]) == 2
+	if total_mode == "none":
+		assert data["total"] is None
+		assert data["has_next"] is True
+	else:
+		assert data["total"] == 3
+		assert data["pages"] == 2
+
+
+@pytest.mark.parametrize("total_mode", ["exact", "estimate", "none"])
+def test_get_feeds_total_mode(client: TestClient, auth, total_mode) -> None:
+	_, headers = auth
+	response = client.get(
+		f"{settings.API_V1_STR}/post/get-posts",
+		params={"page": 1, "size": 2, "total_mode": total_mode},
+		headers=headers
+	)
+	assert response.status_code == 200
+	data = response.json()
+	assert len(data["items"]) == 2
+	if total_mode == "none":
+		assert data["total"] is None
+		assert data["has_next"] is True
+	else:
+		assert data["total"] == 3
+		assert data["pages"] == 2
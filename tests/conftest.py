@@ -11,6 +11,8 @@ from app.core.config import settings
 from app.db.base import Base
 from app.main import app
 from app.api.deps import get_db
+from app.crud import crud_like
+from app.utils.like_counter import LikeCountAggregator
 
 Base: registry
 test_engine = create_engine(settings.SQLALCHEMY_DATABASE_URI_TEST)
@@ -35,3 +37,14 @@ def client(session) -> Generator:
 	with TestClient(app) as c:
 		yield c
 
+
+
+@pytest.fixture(scope="session", autouse=True)
+def like_buffer() -> Generator:
+	"""Буфер счетчиков лайков на тестовой бд и без фонового потока: сбрасывается только явным flush"""
+	buffer = LikeCountAggregator(
+		flush_size=settings.LIKE_COUNT_FLUSH_SIZE, flush_interval=None, session_factory=TestSessionLocal
+	)
+	with pytest.MonkeyPatch.context() as monkeypatch:
+		monkeypatch.setattr(crud_like, "like_counts_buffer", buffer)
+		yield buffer
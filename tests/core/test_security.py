@@ -1,11 +1,19 @@
 import pytest
+from fastapi import HTTPException
 from app.core.security import (
 	get_password_hash,
 	verify_password,
 	create_access_token,
 	create_password_reset_token,
-	verify_password_reset_token
+	verify_password_reset_token,
+	PasswordHashPool,
+	verify_token,
+	revoke_token,
+	revocation_checks,
+	token_cache,
+	_token_digest
 )
+from tests.other_tools import metric_value
 
 
 def test_get_password_hash() -> None:
@@ -41,3 +49,36 @@ def test_verify_password_reset_token(data: str, result: str) -> None:
 	res = verify_password_reset_token(token)
 	assert res == result
 
+
+def test_password_pool_rejects_when_full() -> None:
+	pool = PasswordHashPool(workers=0, queue_size=0)
+	assert pool.run("hash", str.upper, "lol") == "LOL"
+	pool._slots.acquire()
+	rejected = metric_value("password_hash_rejected_total", op="hash")
+	with pytest.raises(HTTPException) as exc:
+		pool.run("hash", str.upper, "lol")
+	assert exc.value.status_code == 503
+	assert exc.value.headers["Retry-After"] == "1"
+	assert metric_value("password_hash_rejected_total", op="hash") == rejected + 1
+
+
+def test_verify_token_cache() -> None:
+	token = create_access_token(subject=7)
+	hits = metric_value("token_cache_requests_total", result="hit")
+	assert verify_token(token) == 7
+	assert verify_token(token) == 7
+	assert metric_value("token_cache_requests_total", result="hit") == hits + 1
+
+	# запись в кэше с истекшим exp не принимается, даже если подпись уже проверена
+	token_cache.set(_token_digest(token), {"sub": "7", "exp": 0})
+	with pytest.raises(HTTPException):
+		verify_token(token)
+
+	revocation_checks.append(lambda claims: claims["sub"] == "7")
+	try:
+		with pytest.raises(HTTPException):
+			verify_token(token)
+	finally:
+		revocation_checks.clear()
+	revoke_token(token)
+	assert token_cache.get(_token_digest(token)) is None
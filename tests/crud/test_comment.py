@@ -0,0 +1,182 @@
+import json
+
+import pytest
+from sqlalchemy import select, text, update
+from sqlalchemy.orm import Session
+
+from tests.conftest import client, session
+from .conftest import create_user
+from app.models.users import Users
+from app.models.comment import Comment
+from app.models.likes import Likes
+from app.models.post import Post
+from app.schemas.comment import CommentDBCreate, CommentsDBOut
+from app.schemas.post import PostDBCreate
+from app.crud.crud_comment import comment
+from app.crud.crud_post import post
+from app.utils.page import decode_cursor
+from app.utils.comment_counter import reconcile
+
+
+def test_get_object_comments_tree(session: Session, create_user: Users) -> None:
+	db_post = post.create(session, obj_in=PostDBCreate(content="thread", user_id=create_user.id))
+	root = comment.create(session, obj_in=CommentDBCreate(text="root", user_id=create_user.id), obj_to_comment=db_post)
+	child = comment.create(
+		session, obj_in=CommentDBCreate(text="child", user_id=create_user.id, parent_comment_id=root.id),
+		obj_to_comment=db_post
+	)
+	grandchild = comment.create(
+		session, obj_in=CommentDBCreate(text="grandchild", user_id=create_user.id, parent_comment_id=child.id),
+		obj_to_comment=db_post
+	)
+
+	comments = comment.get_object_comments(session, obj_to_comment=db_post)
+	assert [c.id for c in comments] == [root.id]
+	out = CommentsDBOut.model_validate({"comments": comments})
+	assert out.comments[0].child_comments[0].child_comments[0].id == grandchild.id
+
+	comments = comment.get_object_comments(session, obj_to_comment=db_post, max_depth=1)
+	assert comments[0].child_comments[0].child_comments == []
+	# ветка обрезана по глубине, но курсор показывает, что ответы есть
+	assert comments[0].child_comments[0].replies_cursor is not None
+	assert comments[0].replies_cursor is None
+
+	db_comment = comment.get_thread(session, id_=child.id)
+	assert db_comment.parent_comment.id == root.id
+	assert [c.id for c in db_comment.child_comments] == [grandchild.id]
+
+
+def test_get_object_comments_page(session: Session, create_user: Users) -> None:
+	db_post = post.create(session, obj_in=PostDBCreate(content="paged thread", user_id=create_user.id))
+	roots = [
+		comment.create(session, obj_in=CommentDBCreate(text=f"root {i}", user_id=create_user.id), obj_to_comment=db_post)
+		for i in range(3)
+	]
+	replies = [
+		comment.create(
+			session, obj_in=CommentDBCreate(text=f"reply {i}", user_id=create_user.id, parent_comment_id=roots[0].id),
+			obj_to_comment=db_post
+		)
+		for i in range(3)
+	]
+
+	comments, next_cursor = comment.get_object_comments_page(session, obj_to_comment=db_post, limit=2, replies_limit=2)
+	assert [c.id for c in comments] == [roots[0].id, roots[1].id]
+	assert [c.id for c in comments[0].child_comments] == [replies[0].id, replies[1].id]
+	assert comments[0].replies_cursor is not None
+	assert comments[1].replies_cursor is None
+	assert next_cursor is not None
+
+	created_at, comment_id = decode_cursor(next_cursor)
+	comments, next_cursor = comment.get_object_comments_page(
+		session, obj_to_comment=db_post, limit=2, created_at=created_at, comment_id=comment_id
+	)
+	assert [c.id for c in comments] == [roots[2].id]
+	assert next_cursor is None
+
+	created_at, comment_id = decode_cursor(CommentsDBOut.model_validate(
+		{"comments": comment.get_object_comments_page(session, obj_to_comment=db_post, limit=1, replies_limit=2)[0]}
+	).comments[0].replies_cursor)
+	comments, next_cursor = comment.get_replies(
+		session, id_=roots[0].id, limit=10, created_at=created_at, comment_id=comment_id
+	)
+	assert [c.id for c in comments] == [replies[2].id]
+	assert next_cursor is None
+
+
+def test_replies_limit_prunes_walk(session: Session, create_user: Users) -> None:
+	db_post = post.create(session, obj_in=PostDBCreate(content="viral thread", user_id=create_user.id))
+	root = comment.create(session, obj_in=CommentDBCreate(text="root", user_id=create_user.id), obj_to_comment=db_post)
+	replies = [
+		comment.create(
+			session, obj_in=CommentDBCreate(text=f"reply {i}", user_id=create_user.id, parent_comment_id=root.id),
+			obj_to_comment=db_post
+		)
+		for i in range(3)
+	]
+	nested = [
+		comment.create(
+			session, obj_in=CommentDBCreate(text="nested", user_id=create_user.id, parent_comment_id=reply.id),
+			obj_to_comment=db_post
+		)
+		for reply in replies
+	]
+
+	# replies[1] - лишний ответ, по которому видно обрезку; под ним и под replies[2] ничего не читается
+	thread = comment._thread_cte("thread", [Comment.id == root.id], 5, replies_limit=1)
+	ids = set(session.execute(select(thread.c.id)).scalars())
+	assert ids == {root.id, replies[0].id, replies[1].id, nested[0].id}
+
+	db_comment = comment.get_thread(session, id_=root.id, replies_limit=1)
+	assert [c.id for c in db_comment.child_comments] == [replies[0].id]
+	assert db_comment.replies_cursor is not None
+
+
+def test_replies_limit_zero(session: Session, create_user: Users) -> None:
+	db_post = post.create(session, obj_in=PostDBCreate(content="collapsed thread", user_id=create_user.id))
+	roots = [
+		comment.create(session, obj_in=CommentDBCreate(text=f"root {i}", user_id=create_user.id), obj_to_comment=db_post)
+		for i in range(2)
+	]
+	reply = comment.create(
+		session, obj_in=CommentDBCreate(text="reply", user_id=create_user.id, parent_comment_id=roots[0].id),
+		obj_to_comment=db_post
+	)
+	comment.create(
+		session, obj_in=CommentDBCreate(text="under next root", user_id=create_user.id, parent_comment_id=roots[1].id),
+		obj_to_comment=db_post
+	)
+
+	comments, next_cursor = comment.get_object_comments_page(session, obj_to_comment=db_post, limit=1, replies_limit=0)
+	assert [c.id for c in comments] == [roots[0].id]
+	assert comments[0].child_comments == []
+	assert comments[0].replies_cursor is not None
+	assert next_cursor is not None
+	# корень раскрывается и при replies_limit=0: читается один ответ, по которому видна обрезка
+	thread = comment._thread_cte("thread", [Comment.id == roots[0].id], 5, replies_limit=0)
+	assert set(session.execute(select(thread.c.id)).scalars()) == {roots[0].id, reply.id}
+
+	created_at, comment_id = decode_cursor(comments[0].replies_cursor)
+	replies, _ = comment.get_replies(session, id_=roots[0].id, limit=10, created_at=created_at, comment_id=comment_id)
+	assert [c.id for c in replies] == [reply.id]
+
+
+def _explain(session: Session, stmt) -> str:
+	"""План запроса в JSON. seq scan выключен, иначе на маленьких тестовых таблицах планировщик
+	выбирает его независимо от индексов."""
+	sql = stmt.compile(dialect=session.bind.dialect, compile_kwargs={"literal_binds": True})
+	session.execute(text("SET LOCAL enable_seqscan = off"))
+	plan = session.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar_one()
+	session.rollback()
+	return json.dumps(plan)
+
+
+def test_generic_relationship_indexes(session: Session) -> None:
+	if session.bind.dialect.name != "postgresql":
+		pytest.skip("EXPLAIN checks need PostgreSQL")
+	roots = select(Comment.id).where(
+		Comment.commentable_type == "Post", Comment.commentable_id == 1, Comment.parent_comment_id.is_(None)
+	).order_by(Comment.created_at, Comment.id).limit(20)
+	assert "ix_comment_commentable_type_commentable_id_parent_comment_id" in _explain(session, roots)
+
+	replies = select(Comment.id).where(Comment.parent_comment_id == 1).order_by(Comment.created_at, Comment.id)
+	assert "ix_comment_parent_comment_id_created_at_id" in _explain(session, replies)
+
+	liked = select(Likes.id).where(Likes.entity_type == "Post", Likes.entity_id == 1, Likes.user_id == 1)
+	assert "ix_likes_entity_type_entity_id_user_id" in _explain(session, liked)
+
+
+def test_comment_count(session: Session, create_user: Users) -> None:
+	db_post = post.create(session, obj_in=PostDBCreate(content="counted", user_id=create_user.id))
+	assert db_post.comment_count == 0
+	first = comment.create(session, obj_in=CommentDBCreate(text="first", user_id=create_user.id), obj_to_comment=db_post)
+	comment.create(session, obj_in=CommentDBCreate(text="second", user_id=create_user.id), obj_to_comment=db_post)
+	assert db_post.comment_count == 2
+
+	comment.remove(session, id_=first.id)
+	assert db_post.comment_count == 1
+
+	session.execute(update(Post).where(Post.id == db_post.id).values(comment_count=42))
+	session.commit()
+	assert reconcile(session) >= 1
+	assert db_post.comment_count == 1
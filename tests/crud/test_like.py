@@ -0,0 +1,75 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from tests.conftest import client, session, like_buffer
+from .conftest import create_user, create_post
+from app.models.post import Post
+from app.models.users import Users
+from app.models.likes import LikeCount
+from app.schemas.like import LikeCreate
+from app.schemas.post import PostDBCreate
+from app.crud.crud_post import post
+from app.crud.crud_like import likes
+from app.utils.like_counter import LikeCountAggregator, reconcile
+
+
+def test_count_likes(
+		session: Session, like_buffer: LikeCountAggregator, create_user: Users, create_post: Post
+) -> None:
+	likes.create(session, obj_in=LikeCreate(user_id=create_user.id), obj_to_like=create_post)
+	assert likes.count_likes(session, obj_to_like=create_post) == 1
+	like_buffer.flush()
+	assert likes.count_likes(session, obj_to_like=create_post) == 1
+
+	likes.remove_like(session, obj_to_like=create_post, user_id=create_user.id)
+	assert likes.count_likes(session, obj_to_like=create_post) == 0
+	like_buffer.flush()
+	assert likes.count_likes(session, obj_to_like=create_post) == 0
+
+
+def test_reconcile_like_counts(
+		session: Session, like_buffer: LikeCountAggregator, create_user: Users, create_post: Post
+) -> None:
+	likes.create(session, obj_in=LikeCreate(user_id=create_user.id), obj_to_like=create_post)
+	like_buffer.flush()
+	session.execute(update(LikeCount).where(LikeCount.entity_id == create_post.id).values(count=42))
+	session.commit()
+	reconcile(session)
+	assert likes.count_likes(session, obj_to_like=create_post) == 1
+
+
+def test_reconcile_with_pending_deltas(
+		session: Session, like_buffer: LikeCountAggregator, create_user: Users
+) -> None:
+	db_post = post.create(session, obj_in=PostDBCreate(content="pending", user_id=create_user.id))
+	likes.create(session, obj_in=LikeCreate(user_id=create_user.id), obj_to_like=db_post)
+	# дельта этого лайка еще в буфере, когда проходит reconcile: ни чтение, ни flush не считают ее второй раз
+	reconcile(session)
+	assert likes.count_likes_by_key(session, entity_type="Post", entity_id=db_post.id) == 1
+	assert likes.count_likes_batch(session, entity_type="Post", entity_ids=[db_post.id]) == {db_post.id: 1}
+	like_buffer.flush()
+	session.expire_all()
+	assert session.get(LikeCount, ("Post", db_post.id)).count == 1
+	assert likes.count_likes_by_key(session, entity_type="Post", entity_id=db_post.id) == 1
+
+
+def test_likes_batch(session: Session, create_user: Users, create_post: Post) -> None:
+	other_post = post.create(session, obj_in=PostDBCreate(content="batch", user_id=create_user.id))
+	likes.create(session, obj_in=LikeCreate(user_id=create_user.id), obj_to_like=other_post)
+	post_ids = [create_post.id, other_post.id]
+	counts = likes.count_likes_batch(session, entity_type="Post", entity_ids=post_ids)
+	assert counts[other_post.id] == 1
+	liked = likes.liked_by_user(session, entity_type="Post", entity_ids=post_ids, user_id=create_user.id)
+	assert other_post.id in liked
+
+
+def test_duplicate_like(session: Session, create_user: Users) -> None:
+	db_post = post.create(session, obj_in=PostDBCreate(content="twice", user_id=create_user.id))
+	likes.create(session, obj_in=LikeCreate(user_id=create_user.id), obj_to_like=db_post)
+	with pytest.raises(HTTPException):
+		likes.create(session, obj_in=LikeCreate(user_id=create_user.id), obj_to_like=db_post)
+	likes.remove_like(session, obj_to_like=db_post, user_id=create_user.id)
+	with pytest.raises(HTTPException):
+		likes.remove_like(session, obj_to_like=db_post, user_id=create_user.id)
@@ -1,12 +1,19 @@
+import uuid
+from datetime import datetime
+
 import pytest
 
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 
 from fastapi import HTTPException
 
-from tests.conftest import client, session
+from tests.conftest import client, session, test_engine, TestSessionLocal
 from .conftest import create_user, create_post
-from app.models.post import Post
+from app.models.post import Post, REPOST_LOAD_DEPTH
+from app.models.image import Image
+from app.models.users import Users
+from app.schemas.post import PostDBCreate, PostDBOut
 from app.crud.crud_post import post
 
 
@@ -24,4 +31,49 @@ def test_get_exception(session: Session, create_post: Post) -> None:
 		db_post = post.get(session, id_=100)
 
 
+def test_get_feed_after(session: Session, create_user: Users) -> None:
+	for i in range(3):
+		post.create(session, obj_in=PostDBCreate(content=f"feed {i}", user_id=create_user.id))
+	first_page = post.get_feed_after(session, limit=2, id_=create_user.id)
+	assert len(first_page) == 2
+	last = first_page[-1]
+	second_page = post.get_feed_after(
+		session, limit=2, id_=create_user.id, created_at=last.created_at, post_id=last.id
+	)
+	assert second_page
+	assert not {p.id for p in first_page} & {p.id for p in second_page}
+	assert (second_page[0].created_at, second_page[0].id) < (last.created_at, last.id)
+
+
+def _count_page_statements(user_id: int, size: int) -> int:
+	statements = []
+
+	def _before_cursor_execute(conn, cursor, statement, *args) -> None:
+		statements.append(statement)
+
+	db = TestSessionLocal()
+	event.listen(test_engine, "before_cursor_execute", _before_cursor_execute)
+	try:
+		db_posts = post.get_page(db, page=1, limit=size, id_=user_id)
+		assert len(db_posts) == size
+		[PostDBOut.model_validate(p) for p in db_posts]
+	finally:
+		event.remove(test_engine, "before_cursor_execute", _before_cursor_execute)
+		db.close()
+	return len(statements)
+
+
+def test_get_page_statement_count(session: Session, create_user: Users) -> None:
+	original = post.create(session, obj_in=PostDBCreate(content="original", user_id=create_user.id))
+	for i in range(12):
+		db_post = post.create(
+			session, obj_in=PostDBCreate(content=f"repost {i}", user_id=create_user.id, original_post_id=original.id)
+		)
+		session.add(Image(name=f"{uuid.uuid4().hex}.png", upload_time=datetime.utcnow(), user_id=create_user.id,
+			post_id=db_post.id))
+	session.commit()
 
+	# страница + author/images/original_post на каждый уровень репостов, независимо от размера страницы
+	max_statements = 1 + 3 * (REPOST_LOAD_DEPTH + 1)
+	assert _count_page_statements(create_user.id, 2) <= max_statements
+	assert _count_page_statements(create_user.id, 10) <= max_statements
@@ -0,0 +1,76 @@
+from sqlalchemy.orm import Session
+
+from tests.other_tools import get_random_email, get_random_password
+from tests.conftest import client, session
+from app.schemas.users import UserCreate
+from app.schemas.post import PostDBCreate
+from app.crud.crud_user import user
+from app.crud.crud_post import post
+from app.crud.crud_timeline import timeline
+from app.core.config import settings
+
+
+def test_fan_out_and_unfollow(session: Session) -> None:
+	author = user.create(session, obj_in=UserCreate(email=get_random_email(), password=get_random_password()))
+	reader = user.create(session, obj_in=UserCreate(email=get_random_email(), password=get_random_password()))
+	user.follow(session, user_db=reader, user_to_follow=author)
+	db_post = post.create(session, obj_in=PostDBCreate(content="timeline", user_id=author.id))
+
+	timeline.fan_out(session, post_id=db_post.id)
+	assert db_post in timeline.get_page(session, owner_id=reader.id, page=1, limit=10)
+	assert db_post in timeline.get_page(session, owner_id=author.id, page=1, limit=10)
+
+	timeline.remove_author(session, owner_id=reader.id, author_id=author.id)
+	assert timeline.count(session, reader.id) == 0
+	assert timeline.count(session, author.id) == 1
+
+
+def test_celebrity_posts_merged_on_read(session: Session, monkeypatch) -> None:
+	monkeypatch.setattr(settings, "CELEBRITY_FOLLOWER_THRESHOLD", 1)
+	author = user.create(session, obj_in=UserCreate(email=get_random_email(), password=get_random_password()))
+	reader = user.create(session, obj_in=UserCreate(email=get_random_email(), password=get_random_password()))
+	user.follow(session, user_db=reader, user_to_follow=author)
+	db_post = post.create(session, obj_in=PostDBCreate(content="celebrity", user_id=author.id))
+
+	assert timeline.fan_out(session, post_id=db_post.id) == 1
+	assert db_post in timeline.get_page(session, owner_id=reader.id, page=1, limit=10)
+	assert db_post in timeline.get_after(session, owner_id=reader.id, limit=10)
+	assert timeline.count(session, reader.id) == 1
+
+
+def test_count_after_author_became_celebrity(session: Session, monkeypatch) -> None:
+	author = user.create(session, obj_in=UserCreate(email=get_random_email(), password=get_random_password()))
+	reader = user.create(session, obj_in=UserCreate(email=get_random_email(), password=get_random_password()))
+	user.follow(session, user_db=reader, user_to_follow=author)
+	db_post = post.create(session, obj_in=PostDBCreate(content="before threshold", user_id=author.id))
+	timeline.fan_out(session, post_id=db_post.id)
+	assert timeline.count(session, reader.id) == 1
+
+	# строка в ленте reader осталась, но пост теперь считается и через поток знаменитости
+	monkeypatch.setattr(settings, "CELEBRITY_FOLLOWER_THRESHOLD", 1)
+	post.create(session, obj_in=PostDBCreate(content="after threshold", user_id=author.id))
+	assert timeline.count(session, reader.id) == 2
+	assert len(timeline.get_page(session, owner_id=reader.id, page=1, limit=10)) == 2
+
+
+def test_author_drops_below_celebrity_threshold(session: Session, monkeypatch) -> None:
+	monkeypatch.setattr(settings, "CELEBRITY_FOLLOWER_THRESHOLD", 2)
+	author = user.create(session, obj_in=UserCreate(email=get_random_email(), password=get_random_password()))
+	readers = [
+		user.create(session, obj_in=UserCreate(email=get_random_email(), password=get_random_password()))
+		for _ in range(2)
+	]
+	for reader in readers:
+		user.follow(session, user_db=reader, user_to_follow=author)
+	assert author.followers_count == 2
+	db_post = post.create(session, obj_in=PostDBCreate(content="while celebrity", user_id=author.id))
+	assert timeline.fan_out(session, post_id=db_post.id) == 1
+	assert timeline.add_author_to_followers(session, author_id=author.id) == 0
+
+	user.unfollow(session, user_db=readers[1], user_to_follow=author)
+	assert author.followers_count == 1
+	# без раскладки пост пропал бы из ленты: автор больше не знаменитость и не подмешивается при чтении
+	assert timeline.add_author_to_followers(session, author_id=author.id) == 1
+	assert db_post in timeline.get_page(session, owner_id=readers[0].id, page=1, limit=10)
+	assert timeline.count(session, readers[0].id) == 1
+	assert timeline.count(session, readers[1].id) == 0
@@ -6,7 +6,7 @@ from tests.other_tools import get_random_email, get_random_password
 from tests.conftest import client, session
 from .conftest import create_user
 from app.schemas.users import UserCreate, UserUpdate
-from app.crud.crud_user import user
+from app.crud.crud_user import user, users_cache
 from app.core.security import verify_password
 from app.models.users import Users
 
@@ -132,6 +132,8 @@ def test_follow(session: Session) -> None:
 	assert user.is_following(user_db=user_1, user_to_follow=user_2)
 	assert user_2 in user_1.followed.all()
 	assert user_1 in user_2.followers.all()
+	user.follow(session, user_db=user_1, user_to_follow=user_2)
+	assert user_1.followed.count() == 1
 
 
 def test_unfollow(session: Session) -> None:
@@ -151,3 +153,42 @@ def test_unfollow(session: Session) -> None:
 	assert not user.is_following(user_db=user_2, user_to_follow=user_1)
 	assert user_1 not in user_2.followed.all()
 
+
+def test_follow_lists(session: Session) -> None:
+	author = user.create(session, obj_in=UserCreate(email=get_random_email(), password=get_random_password()))
+	readers = [
+		user.create(session, obj_in=UserCreate(email=get_random_email(), password=get_random_password()))
+		for _ in range(3)
+	]
+	for reader in readers:
+		user.follow(session, user_db=reader, user_to_follow=author)
+	user.follow(session, user_db=readers[0], user_to_follow=author)
+	assert author.followers_count == 3
+	assert readers[0].following_count == 1
+
+	first = user.get_followers(session, id_=author.id, limit=2)
+	assert [u.id for u in first] == [r.id for r in readers[:2]]
+	rest = user.get_followers(session, id_=author.id, limit=2, after_id=first[-1].id)
+	assert [u.id for u in rest] == [readers[2].id]
+	assert [u.id for u in user.get_following(session, id_=readers[0].id, limit=10)] == [author.id]
+
+	user.unfollow(session, user_db=readers[0], user_to_follow=author)
+	user.unfollow(session, user_db=readers[0], user_to_follow=author)
+	assert author.followers_count == 2
+	assert readers[0].following_count == 0
+
+
+def test_get_cached(session: Session) -> None:
+	db_user = user.create(session, obj_in=UserCreate(email=get_random_email(), password=get_random_password()))
+	users_cache.pop(db_user.id)
+	assert user.get_cached(session, id_=db_user.id) is db_user
+	session.expunge(db_user)
+	cached = user.get_cached(session, id_=db_user.id)
+	assert "hashed_password" not in users_cache.get(db_user.id)
+	assert cached.email == db_user.email
+	assert cached in session
+	assert cached.hashed_password == db_user.hashed_password
+
+	user.update(session, db_obj=cached, obj_in={"name": "Cached"})
+	assert users_cache.get(db_user.id) is None
+	assert user.get_cached(session, id_=db_user.id).name == "Cached"
@@ -1,6 +1,8 @@
 import string
 import random
 
+from prometheus_client import REGISTRY
+
 
 def get_random_string() -> str:
 	return ''.join(random.choices(string.ascii_lowercase, k=10))
@@ -12,3 +14,8 @@ def get_random_email() -> str:
 
 def get_random_password() -> str:
 	return get_random_string()
+
+
+def metric_value(name: str, **labels: str) -> float:
+	"""Значение сэмпла метрики из реестра prometheus_client, 0 - если его еще нет"""
+	return REGISTRY.get_sample_value(name, labels) or 0
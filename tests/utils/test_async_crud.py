@@ -0,0 +1,53 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import HTTPException
+from pydantic import BaseModel, ConfigDict
+from pytest_mock import MockFixture
+
+from app.api import deps
+from app.crud.async_crud import AsyncCRUD
+from app.db.session import async_database_uri
+
+
+class Item(BaseModel):
+	model_config = ConfigDict(from_attributes=True)
+
+	id: int
+
+
+class FakeAsyncSession:
+	def __init__(self) -> None:
+		self.sync_session = MagicMock()
+
+	async def run_sync(self, fn, *args, **kwargs):
+		return fn(self.sync_session, *args, **kwargs)
+
+
+def test_async_crud_runs_sync_method() -> None:
+	crud = MagicMock()
+	crud.get_page.return_value = [MagicMock(id=1), MagicMock(id=2)]
+	db = FakeAsyncSession()
+	result = asyncio.run(AsyncCRUD(crud).get_page(db, page=1, out=Item))
+	crud.get_page.assert_called_once_with(db.sync_session, page=1)
+	assert result == [Item(id=1), Item(id=2)]
+
+
+def test_async_database_uri() -> None:
+	assert async_database_uri("postgresql://u:p@h:5432/db") == "postgresql+asyncpg://u:p@h:5432/db"
+	assert async_database_uri("postgresql+psycopg2://u:p@h/db") == "postgresql+asyncpg://u:p@h/db"
+
+
+def test_current_user_async_missing_user(mocker: MockFixture) -> None:
+	mocker.patch.object(deps, "verify_token", return_value=1)
+	mocker.patch.object(deps.user, "get_cached", side_effect=HTTPException(status_code=400))
+	with pytest.raises(HTTPException) as e:
+		asyncio.run(deps.get_current_user_async(FakeAsyncSession(), "token"))
+	assert e.value.status_code == 401
+
+
+def test_async_db_without_engine(mocker: MockFixture) -> None:
+	mocker.patch.object(deps.db_session, "AsyncSessionLocal", None)
+	with pytest.raises(RuntimeError, match="ASYNC_POST_ENDPOINTS"):
+		asyncio.run(deps.get_async_db().__anext__())
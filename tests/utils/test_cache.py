@@ -0,0 +1,25 @@
+import time
+
+from app.utils.cache import TTLCache
+
+
+def test_ttl_cache_expire() -> None:
+	cache = TTLCache(maxsize=10, ttl=60)
+	cache.set("a", 1)
+	cache.set("b", 2, ttl=0.01)
+	time.sleep(0.02)
+	assert cache.get("a") == 1
+	assert cache.get("b") is None
+	assert cache.hits == 1 and cache.misses == 1
+
+
+def test_ttl_cache_lru() -> None:
+	cache = TTLCache(maxsize=2, ttl=60)
+	cache.set("a", 1)
+	cache.set("b", 2)
+	cache.get("a")
+	cache.set("c", 3)
+	assert cache.get("b") is None
+	assert cache.get("a") == 1
+	assert cache.pop("c") == 3
+	assert len(cache) == 1
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+from sqlalchemy import Insert
+
+from app.utils.like_counter import LikeCountAggregator
+
+
+def _inserts(db: MagicMock) -> list:
+	return [c.args[0] for c in db.execute.call_args_list if isinstance(c.args[0], Insert)]
+
+
+def test_pending_until_flush() -> None:
+	db = MagicMock()
+	buffer = LikeCountAggregator(flush_size=10, flush_interval=60, session_factory=lambda: db)
+	buffer.add(("Post", 1), 1, datetime.utcnow())
+	buffer.add(("Post", 1), 1, datetime.utcnow())
+	buffer.add(("Post", 2), -1, datetime.utcnow())
+	assert buffer.pending(("Post", 1)) == 2
+	assert buffer.pending(("Post", 2)) == -1
+	assert buffer.flush() == 2
+	assert len(_inserts(db)) == 1
+	db.commit.assert_called_once()
+	assert buffer.pending(("Post", 1)) == 0
+
+
+def test_flush_by_size() -> None:
+	db = MagicMock()
+	buffer = LikeCountAggregator(flush_size=2, flush_interval=60, session_factory=lambda: db)
+	buffer.add(("Post", 1), 1, datetime.utcnow())
+	db.execute.assert_not_called()
+	buffer.add(("Post", 1), -1, datetime.utcnow())
+	# лайк и анлайк взаимно погасились, писать нечего
+	assert _inserts(db) == []
+	assert buffer.pending(("Post", 1)) == 0
+
+
+def test_failed_flush_keeps_deltas() -> None:
+	db = MagicMock()
+	db.execute.side_effect = RuntimeError("db is down")
+	buffer = LikeCountAggregator(flush_size=10, flush_interval=60, session_factory=lambda: db)
+	buffer.add(("Post", 1), 1, datetime.utcnow())
+	assert buffer.flush() == 0
+	db.rollback.assert_called_once()
+	assert buffer.pending(("Post", 1)) == 1
+
+
+def test_flush_waits_for_reconcile() -> None:
+	db = MagicMock()
+	db.execute.return_value.scalar.return_value = False
+	buffer = LikeCountAggregator(flush_size=10, flush_interval=60, session_factory=lambda: db)
+	buffer.add(("Post", 1), 1, datetime.utcnow())
+	assert buffer.flush() == 0
+	assert _inserts(db) == []
+	assert buffer.pending(("Post", 1)) == 1
+
+
+def test_deltas_skip_reconciled_changes() -> None:
+	now = datetime.utcnow()
+	changes = {
+		("Post", 1): [(now - timedelta(seconds=2), 1), (now, -1)],
+		("Post", 2): [(now - timedelta(seconds=2), 1)],
+		("Post", 3): [(now, 1)]
+	}
+	reconciled = {("Post", 1): now - timedelta(seconds=1), ("Post", 2): now - timedelta(seconds=1)}
+	# лайк до reconcile уже посчитан, анлайк после - нет
+	assert LikeCountAggregator._deltas(changes, reconciled) == {("Post", 1): -1, ("Post", 3): 1}
+
+
+def test_pending_skips_reconciled_changes() -> None:
+	buffer = LikeCountAggregator(flush_size=10, flush_interval=None, session_factory=MagicMock)
+	now = datetime.utcnow()
+	buffer.add(("Post", 1), 1, now - timedelta(seconds=2))
+	buffer.add(("Post", 1), 1, now)
+	assert buffer.pending(("Post", 1)) == 2
+	assert buffer.pending(("Post", 1), now - timedelta(seconds=1)) == 1
+	assert buffer._flusher is None
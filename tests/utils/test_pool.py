@@ -0,0 +1,32 @@
+import pytest
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+
+from app.core.config import settings
+from app.db.session import (
+	InstrumentedQueuePool, InstrumentedAsyncQueuePool, engine_options
+)
+from tests.other_tools import metric_value
+
+
+def test_instrumented_pool() -> None:
+	engine = create_engine("sqlite://", poolclass=InstrumentedQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.05)
+	checkouts = metric_value("db_pool_checkout_seconds_count")
+	timeouts = metric_value("db_pool_timeouts_total")
+	with engine.connect() as connection:
+		connection.execute(text("SELECT 1"))
+		assert engine.pool.checkedout() == 1
+		with pytest.raises(exc.TimeoutError):
+			engine.connect()
+	assert metric_value("db_pool_timeouts_total") == timeouts + 1
+	assert metric_value("db_pool_checkout_seconds_count") == checkouts + 2
+	assert engine.pool.checkedout() == 0
+	engine.dispose()
+
+
+def test_pool_options(monkeypatch) -> None:
+	monkeypatch.setattr(settings, "DB_PGBOUNCER", False)
+	assert engine_options(InstrumentedAsyncQueuePool)["poolclass"] is InstrumentedAsyncQueuePool
+	assert issubclass(InstrumentedAsyncQueuePool, AsyncAdaptedQueuePool)
+	monkeypatch.setattr(settings, "DB_PGBOUNCER", True)
+	assert engine_options(InstrumentedAsyncQueuePool)["poolclass"] is NullPool
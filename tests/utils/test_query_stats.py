@@ -0,0 +1,33 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.core.config import settings
+from app.utils.query_stats import query_stats_middleware
+from tests.other_tools import metric_value
+
+engine = create_engine("sqlite://")
+app = FastAPI()
+app.middleware("http")(query_stats_middleware)
+
+
+@app.get("/items/{count}")
+def items(count: int) -> dict:
+	with engine.connect() as connection:
+		connection.execute(text("SELECT 1"))
+		for i in range(count):
+			connection.execute(text("SELECT :i"), {"i": i})
+	return {}
+
+
+def test_query_stats_headers(monkeypatch) -> None:
+	monkeypatch.setattr(settings, "DEBUG", True)
+	monkeypatch.setattr(settings, "N_PLUS_ONE_THRESHOLD", 10)
+	with TestClient(app) as client:
+		response = client.get("/items/3")
+		assert response.headers["X-DB-Query-Count"] == "4"
+		assert response.headers["X-DB-Query-Max-Repeats"] == "3"
+		assert metric_value("db_n_plus_one_requests_total", endpoint="GET /items/{count}") == 0
+		response = client.get("/items/11")
+		assert response.headers["X-DB-Query-Count"] == "12"
+		assert metric_value("db_n_plus_one_requests_total", endpoint="GET /items/{count}") == 1
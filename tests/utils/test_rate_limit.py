@@ -0,0 +1,45 @@
+import pytest
+from fastapi import HTTPException
+
+from starlette.requests import Request
+
+from app.utils.rate_limit import InMemoryBackend, RateLimiter, parse_rate, client_ip, parse_networks
+from tests.other_tools import metric_value
+
+
+def test_parse_rate() -> None:
+	assert parse_rate("20/60") == (20, 60.0)
+
+
+def test_token_bucket() -> None:
+	backend = InMemoryBackend()
+	assert backend.take("a", capacity=2, period=60) == 0
+	assert backend.take("a", capacity=2, period=60) == 0
+	assert 29 < backend.take("a", capacity=2, period=60) <= 30
+	assert backend.take("b", capacity=2, period=60) == 0
+
+
+def test_limiter_returns_429() -> None:
+	limiter = RateLimiter("test", "1/10", InMemoryBackend())
+	limiter.hit("1.2.3.4")
+	with pytest.raises(HTTPException) as exc:
+		limiter.hit("1.2.3.4")
+	assert exc.value.status_code == 429
+	assert exc.value.headers["Retry-After"] == "10"
+	assert metric_value("rate_limit_requests_total", limiter="test", result="limited") == 1
+
+
+def _request(host: str, forwarded: str | None = None) -> Request:
+	headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+	return Request({"type": "http", "client": (host, 1234), "headers": headers})
+
+
+def test_client_ip_behind_proxy() -> None:
+	proxies = parse_networks(["10.0.0.0/8"])
+	assert client_ip(_request("10.0.0.2", "1.2.3.4"), []) == "10.0.0.2"
+	assert client_ip(_request("10.0.0.2", "1.2.3.4"), proxies) == "1.2.3.4"
+	# адрес слева подставил клиент, доверяем только тому, что дописали наши proxy
+	assert client_ip(_request("10.0.0.2", "6.6.6.6, 1.2.3.4, 10.0.0.3"), proxies) == "1.2.3.4"
+	# X-Forwarded-For от клиента напрямую игнорируется
+	assert client_ip(_request("5.6.7.8", "1.2.3.4"), proxies) == "5.6.7.8"
+	assert client_ip(_request("10.0.0.2"), proxies) == "10.0.0.2"
@@ -0,0 +1,75 @@
+from threading import Event
+
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, insert, text
+
+from app.db.routing import ReplicaSet, RoutingSession, read_only, primary
+
+
+metadata = MetaData()
+numbers = Table("numbers", metadata, Column("id", Integer))
+
+
+class Reader:
+	@read_only
+	def read(self, db):
+		return db.get_bind()
+
+	def write(self, db):
+		db.execute(insert(numbers).values(id=1))
+
+
+def test_routing_session() -> None:
+	primary_engine, replica_engine = create_engine("sqlite://"), create_engine("sqlite://")
+	metadata.create_all(primary_engine)
+	replicas = ReplicaSet([replica_engine], max_lag=1, check_interval=3600)
+	replicas.LAG_QUERY = text("SELECT 0.5")
+	replicas.check()
+	db = RoutingSession(bind=primary_engine, replicas=replicas)
+	reader = Reader()
+	assert reader.read(db) is replica_engine
+	assert db.get_bind() is primary_engine
+	with primary(db):
+		assert reader.read(db) is primary_engine
+	# после записи чтение остается на primary до закрытия сессии
+	reader.write(db)
+	assert reader.read(db) is primary_engine
+	db.close()
+	assert reader.read(db) is replica_engine
+	db.close()
+	# отставание больше max_lag
+	replicas.LAG_QUERY = text("SELECT 3")
+	replicas.check()
+	assert reader.read(db) is primary_engine
+	db.close()
+
+
+class BlockedReplicaSet(ReplicaSet):
+	"""Проверка отставания ждет release, как при недоступной реплике"""
+
+	def __init__(self, *args, **kwargs) -> None:
+		super().__init__(*args, **kwargs)
+		self.release = Event()
+
+	def check(self) -> None:
+		self.release.wait()
+		super().check()
+
+
+def test_replica_per_session() -> None:
+	primary_engine = create_engine("sqlite://")
+	replica_engines = [create_engine("sqlite://"), create_engine("sqlite://")]
+	replicas = BlockedReplicaSet(replica_engines, max_lag=1, check_interval=3600)
+	replicas.LAG_QUERY = text("SELECT 0")
+	db = RoutingSession(bind=primary_engine, replicas=replicas)
+	reader = Reader()
+	# запрос не ждет первую проверку отставания и читает с primary
+	assert reader.read(db) is primary_engine
+	db.close()
+	replicas.release.set()
+	replicas.check()
+	chosen = reader.read(db)
+	assert chosen in replica_engines
+	assert all(reader.read(db) is chosen for _ in range(3))
+	db.close()
+	assert reader.read(db) is not chosen
+	db.close()
@@ -0,0 +1,42 @@
+import json
+
+from sqlalchemy import create_engine, text
+
+from app.utils.query_stats import QueryStats, current_query_stats
+from app.utils.slow_queries import SlowQueryLog, is_side_effect_free
+
+
+def test_is_side_effect_free() -> None:
+	assert is_side_effect_free("SELECT 1", None)
+	assert is_side_effect_free("  with t as (select 1) select * from t", None)
+	assert not is_side_effect_free("UPDATE post SET title = 'a'", None)
+	assert not is_side_effect_free("SELECT * FROM post FOR UPDATE", None)
+	assert not is_side_effect_free("SELECT * FROM post FOR NO KEY UPDATE", None)
+	assert not is_side_effect_free("SELECT * FROM post FOR KEY SHARE", None)
+	assert not is_side_effect_free("SELECT pg_advisory_xact_lock(7203561)", None)
+	assert not is_side_effect_free("SELECT pg_try_advisory_xact_lock_shared(7203561)", None)
+	assert not is_side_effect_free("SELECT nextval('post_id_seq')", None)
+	assert not is_side_effect_free("WITH d AS (DELETE FROM post RETURNING id) SELECT * FROM d", None)
+
+
+def test_slow_query_log(tmp_path) -> None:
+	path = tmp_path / "slow.log"
+	log = SlowQueryLog(
+		path=str(path), threshold=0, sample_rate=1, explain_timeout_ms=1000, log_parameters=True,
+		max_bytes=1024 * 1024, backup_count=1
+	)
+	engine = create_engine("sqlite://")
+	log.install()
+	token = current_query_stats.set(QueryStats())
+	try:
+		with engine.connect() as connection:
+			connection.execute(text("SELECT :x"), {"x": 42})
+		log.join()
+	finally:
+		current_query_stats.reset(token)
+		log.uninstall()
+	entries = [json.loads(line) for line in path.read_text().splitlines()]
+	entry = next(e for e in entries if e["statement"] == "SELECT ?")
+	assert entry["parameters"] == [42]
+	assert entry["endpoint"] == "unmatched"
+	assert "plan" not in entry
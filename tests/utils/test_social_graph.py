@@ -0,0 +1,42 @@
+from unittest.mock import MagicMock
+
+from prometheus_client import generate_latest
+from app.utils.social_graph import CSRGraph, SocialGraphCache, social_graph
+from tests.other_tools import metric_value
+
+
+def test_csr_graph() -> None:
+	graph = CSRGraph.from_sorted_edges([(1, 2), (1, 3), (1, 3), (4, 1)])
+	assert graph.following(1).tolist() == [2, 3]
+	assert graph.following(2).tolist() == []
+	assert graph.is_following(4, 1)
+	assert not graph.is_following(1, 4)
+	assert graph.edge_count == 3
+	assert graph.nbytes == 2 * 4 + 3 * 8 + 3 * 4
+
+
+def test_overlay_survives_refresh() -> None:
+	cache = SocialGraphCache(refresh_interval=60, session_factory=MagicMock)
+
+	def load_edges(db):
+		# подписка, которая пришла, пока грузился снимок, не должна потеряться
+		cache.follow(2, 1)
+		return iter([(1, 2), (1, 3)])
+
+	cache.load_edges = load_edges
+	cache.refresh(MagicMock())
+	assert cache.is_following(2, 1)
+	assert cache.following(1) == [2, 3]
+
+	cache.unfollow(1, 2)
+	cache.follow(1, 5)
+	assert cache.following(1) == [3, 5]
+	assert not cache.is_following(1, 2)
+	assert cache.edge_count == 3
+	assert cache.nbytes > 0
+
+
+def test_graph_metrics() -> None:
+	assert metric_value("social_graph_bytes") == social_graph.nbytes
+	assert metric_value("social_graph_edges") == social_graph.edge_count
+	assert b"# TYPE social_graph_bytes gauge" in generate_latest()
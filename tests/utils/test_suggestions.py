@@ -0,0 +1,24 @@
+from app.utils.social_graph import CSRGraph
+from app.utils.suggestions import friends_of_friends
+
+
+def test_friends_of_friends() -> None:
+	# 1 подписан на 2 и 3, оба подписаны на 4, на 5 подписан только 3, на 2 пользователь 1 уже подписан
+	graph = CSRGraph.from_sorted_edges([(1, 2), (1, 3), (2, 1), (2, 4), (3, 2), (3, 4), (3, 5)])
+	assert friends_of_friends(graph, 1, top_k=10, max_fanout=100) == [(4, 2), (5, 1)]
+	assert friends_of_friends(graph, 1, top_k=1, max_fanout=100) == [(4, 2)]
+	assert friends_of_friends(graph, 1, top_k=10, max_fanout=3) == [(4, 2), (5, 1)]
+	assert friends_of_friends(graph, 4, top_k=10, max_fanout=100) == []
+
+
+def test_friends_of_friends_fanout_sample() -> None:
+	# 1..20 подписаны на 100, тот подписан на 101..200; из подписок 100 берется по 5 штук
+	edges = [(user_id, 100) for user_id in range(1, 21)] + [(100, followed_id) for followed_id in range(101, 201)]
+	graph = CSRGraph.from_sorted_edges(edges)
+	suggested = [friends_of_friends(graph, user_id, top_k=10, max_fanout=5) for user_id in range(1, 21)]
+	assert all(len(items) == 5 and all(score == 1 for _, score in items) for items in suggested)
+	assert suggested[0] == friends_of_friends(graph, 1, top_k=10, max_fanout=5)
+	# выборка не сводится к пяти самым старым аккаунтам
+	suggested_ids = {suggested_id for items in suggested for suggested_id, _ in items}
+	assert suggested_ids != set(range(101, 106))
+	assert max(suggested_ids) > 150